@@ -0,0 +1,635 @@
+#! python3  # noqa E265
+
+"""
+ZIP archive writer.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import copy
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import AbstractContextManager, ExitStack, contextmanager
+from functools import partial
+from itertools import chain
+from tempfile import TemporaryFile
+from types import TracebackType
+from typing import BinaryIO, NamedTuple
+
+# package
+from qgispluginci.cache import FileCache
+from qgispluginci.compression import (
+    CompressionMethod,
+    CompressionPolicy,
+    CompressionReport,
+)
+from qgispluginci.tracing import span
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# members smaller than this are compressed faster than they are read from the cache
+CACHE_MIN_SIZE = 4096
+# CRC and uncompressed size stored before the compressed data of a cache entry
+CACHE_HEADER = struct.Struct("<IQ")
+# size of the chunks copied when streaming a member, bounds the memory used by large files
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class CompressedData(NamedTuple):
+    data: bytes
+    crc: int
+    file_size: int
+    compress_type: int = zipfile.ZIP_DEFLATED
+    cpu_time: float = 0.0
+
+
+class CompressedStream(NamedTuple):
+    """The compressed content of a streamed member, in a file: a cache entry or a temporary file."""
+
+    file: BinaryIO
+    # position of the compressed data in the file
+    offset: int
+    crc: int
+    file_size: int
+    compress_size: int
+    compress_type: int
+    cpu_time: float = 0.0
+
+
+class ArchiveMember(NamedTuple):
+    """A member written in an archive, as listed in reports."""
+
+    name: str
+    origin: str
+    file_size: int
+    compress_size: int
+    compress_type: int
+    crc: int
+    cpu_time: float
+
+
+def compress(
+    data: bytes, compress_type: int = zipfile.ZIP_DEFLATED, level: int | None = None
+) -> CompressedData:
+    """
+    Compress the content of a member the same way zipfile.ZipFile.writestr does.
+    zlib releases the GIL, so this can run concurrently in threads.
+    """
+    crc = zlib.crc32(data)
+    if compress_type == zipfile.ZIP_STORED:
+        return CompressedData(data, crc, len(data), compress_type)
+    if compress_type != zipfile.ZIP_DEFLATED:
+        raise _unsupported_compression(compress_type)
+    compressor = _deflater(level)
+    return CompressedData(
+        compressor.compress(data) + compressor.flush(), crc, len(data), compress_type
+    )
+
+
+def compress_cached(
+    data: bytes,
+    compress_type: int,
+    cache: FileCache | None,
+    level: int | None = None,
+) -> CompressedData:
+    """
+    Compress the content of a member, reusing the compressed data from the cache.
+    The cache key is the hash of the content and of the compression settings.
+    """
+    if (
+        cache is None
+        or compress_type == zipfile.ZIP_STORED
+        or len(data) < CACHE_MIN_SIZE
+    ):
+        return compress(data, compress_type, level)
+
+    key = _cache_key(compress_type, level, b"data:", data)
+
+    entry = cache.get(key)
+    if entry is not None:
+        crc, file_size = CACHE_HEADER.unpack_from(entry)
+        if file_size == len(data) and crc == zlib.crc32(data):
+            return CompressedData(
+                entry[CACHE_HEADER.size :], crc, file_size, compress_type
+            )
+        logger.warning(f"Ignoring corrupted compression cache entry {key}")
+
+    compressed = compress(data, compress_type, level)
+    cache.put(
+        key,
+        CACHE_HEADER.pack(compressed.crc, compressed.file_size) + compressed.data,
+    )
+    return compressed
+
+
+class ArchiveWriter:
+    """
+    Write members into a ZIP archive.
+
+    Members are compressed in a pool of threads when more than one job is given,
+    while this single writer assembles the archive in the order members were added.
+    The output is byte-identical whatever the number of jobs.
+    With a fixed date, the output only depends on the members added, not on the build host.
+    """
+
+    def __init__(
+        self,
+        archive_name: str,
+        jobs: int = 1,
+        compression: int = zipfile.ZIP_DEFLATED,
+        cache: FileCache | None = None,
+        date_time: tuple[int, int, int, int, int, int] | None = None,
+        policy: CompressionPolicy | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        archive_name:
+            The path of the ZIP archive to create
+
+        jobs:
+            The number of compression threads. 0 uses the number of CPUs.
+
+        compression:
+            The ZIP compression method, used for all members if no policy is given
+
+        cache:
+            If given, compressed members are stored in and read from this cache,
+            so that unchanged content is not compressed again
+
+        date_time:
+            If given, the date of all members. Their permissions and host system are also
+            normalised, so that archives are reproducible.
+
+        policy:
+            If given, chooses the compression method and level of each member
+        """
+        self.archive_name = archive_name
+        self.jobs = jobs or os.cpu_count() or 1
+        self.compression = compression
+        self.cache = cache
+        self.date_time = date_time
+        self.policy = policy
+        self.report = CompressionReport()
+        self.members: list[ArchiveMember] = []
+        self._zf = zipfile.ZipFile(file=archive_name, mode="w", compression=compression)
+        self._executor = ThreadPoolExecutor(self.jobs) if self.jobs > 1 else None
+        # keep a bounded window of members being compressed to cap memory
+        self._pending: deque[tuple[zipfile.ZipInfo, Future, str]] = deque()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        if exc_type is not None:
+            for _, future, _ in self._pending:
+                future.cancel()
+            self._pending.clear()
+        self.close()
+
+    def add(self, info: zipfile.ZipInfo, data: bytes, origin: str = ""):
+        """
+        Add a member, its compression type is set from the archive.
+        The origin of the member (e.g. `git tree`) is only used in reports.
+        """
+        self.add_compressed(info, self.compress_async(info.filename, data), origin)
+
+    def compress_async(self, name: str, data: bytes) -> Future:
+        """
+        Compress the content of a member as it would be in this archive,
+        in the pool of threads if there is one.
+        """
+        if self._executor is None:
+            future = Future()
+            future.set_result(self._compress(name, data))
+            return future
+        return self._executor.submit(self._compress, name, data)
+
+    def add_compressed(
+        self, info: zipfile.ZipInfo, compressed: Future, origin: str = ""
+    ) -> None:
+        """
+        Add a member compressed by compress_async, possibly by another writer:
+        the same compressed content can be shared by several archives.
+        """
+        self._prepare(info)
+        self._pending.append((info, compressed, origin))
+        while len(self._pending) > (4 * self.jobs if self._executor else 0):
+            self._write_next()
+
+    def add_stream(
+        self,
+        info: zipfile.ZipInfo,
+        open_stream: Callable[[], AbstractContextManager[BinaryIO]],
+        size: int,
+        origin: str = "",
+        key: str | None = None,
+    ) -> None:
+        """
+        Add a member read from a stream, copied and compressed in chunks,
+        so that the memory used does not depend on its size.
+        The member is written as ZipFile.writestr would, ZIP64 extensions are used when needed.
+
+        If a key identifying the content is given (e.g. the SHA of a git blob),
+        the compressed data is stored in and read from the cache, see compress_stream.
+        """
+        if key is not None and self.cache is not None:
+            with self.compress_stream(info.filename, open_stream, key) as compressed:
+                self.add_compressed_stream(info, compressed, origin)
+            return
+
+        self._prepare(info)
+        # keep the order of the members
+        while self._pending:
+            self._write_next()
+        start = time.thread_time()
+        with open_stream() as stream:
+            head = stream.read(STREAM_CHUNK_SIZE)
+            info.compress_type, info._compresslevel = self._choose(info.filename, head)
+            info.file_size = size
+            if not info.external_attr:
+                info.external_attr = 0o600 << 16  # permissions: ?rw-------
+            # same heuristic as ZipFile._open_to_write, the size must be known before writing
+            zip64 = size * 1.05 > zipfile.ZIP64_LIMIT
+            with self._zf.open(info, mode="w", force_zip64=zip64) as dest:
+                dest.write(head)
+                shutil.copyfileobj(stream, dest, STREAM_CHUNK_SIZE)
+        cpu_time = time.thread_time() - start
+        self.report.add(info.compress_type, size, info.compress_size, cpu_time)
+        self.members.append(
+            ArchiveMember(
+                info.filename,
+                origin,
+                info.file_size,
+                info.compress_size,
+                info.compress_type,
+                info.CRC,
+                cpu_time,
+            )
+        )
+
+    @contextmanager
+    def compress_stream(
+        self,
+        name: str,
+        open_stream: Callable[[], AbstractContextManager[BinaryIO]],
+        key: str | None = None,
+    ) -> Iterator[CompressedStream]:
+        """
+        Compress a member read from a stream as it would be in this archive, into a file,
+        so that the compressed data can be copied into several archives.
+
+        If a key identifying the content is given (e.g. the SHA of a git blob),
+        the compressed data is stored in and read from the cache.
+        The stream is read anyway to check the cache entry, which is much faster than
+        compressing it. A corrupted entry is dropped and the stream is opened again.
+        Otherwise, the data is compressed into a temporary file.
+        """
+        start = time.thread_time()
+        with ExitStack() as stack:
+            stream = stack.enter_context(open_stream())
+            head = stream.read(STREAM_CHUNK_SIZE)
+            compress_type, level = self._choose(name, head)
+            if compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise _unsupported_compression(compress_type)
+            chunks = chain([head], _read_chunks(stream))
+            cache_key = (
+                _cache_key(compress_type, level, b"stream:", key)
+                if key is not None
+                and self.cache is not None
+                and compress_type == zipfile.ZIP_DEFLATED
+                else None
+            )
+            entry = self.cache.open(cache_key) if cache_key is not None else None
+            if entry is not None:
+                with entry:
+                    crc, file_size = CACHE_HEADER.unpack(entry.read(CACHE_HEADER.size))
+                    if _checksum(chunks) == (crc, file_size):
+                        compressed = CompressedStream(
+                            entry,
+                            CACHE_HEADER.size,
+                            crc,
+                            file_size,
+                            os.fstat(entry.fileno()).st_size - CACHE_HEADER.size,
+                            compress_type,
+                            time.thread_time() - start,
+                        )
+                        self.report.add(
+                            compress_type,
+                            file_size,
+                            compressed.compress_size,
+                            compressed.cpu_time,
+                        )
+                        yield compressed
+                        return
+                logger.warning(
+                    f"Ignoring corrupted compression cache entry {cache_key}"
+                )
+                self.cache.remove(cache_key)
+                # the stream was read to check the entry
+                stack.close()
+                stream = stack.enter_context(open_stream())
+                chunks = _read_chunks(stream)
+
+            spooled = stack.enter_context(
+                self.cache.spool(cache_key)
+                if cache_key is not None
+                else TemporaryFile()
+            )
+            spooled.write(CACHE_HEADER.pack(0, 0))
+            compressor = (
+                _deflater(level) if compress_type == zipfile.ZIP_DEFLATED else None
+            )
+            crc = file_size = 0
+            for chunk in chunks:
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                spooled.write(compressor.compress(chunk) if compressor else chunk)
+            if compressor is not None:
+                spooled.write(compressor.flush())
+            compress_size = spooled.tell() - CACHE_HEADER.size
+            spooled.seek(0)
+            spooled.write(CACHE_HEADER.pack(crc, file_size))
+            cpu_time = time.thread_time() - start
+            self.report.add(compress_type, file_size, compress_size, cpu_time)
+            yield CompressedStream(
+                spooled,
+                CACHE_HEADER.size,
+                crc,
+                file_size,
+                compress_size,
+                compress_type,
+                cpu_time,
+            )
+
+    def add_compressed_stream(
+        self, info: zipfile.ZipInfo, compressed: CompressedStream, origin: str = ""
+    ) -> None:
+        """
+        Add a member compressed by compress_stream, possibly by another writer:
+        the same compressed content can be copied into several archives.
+        """
+        self._prepare(info)
+        # keep the order of the members
+        while self._pending:
+            self._write_next()
+        info.compress_type = compressed.compress_type
+        info.file_size = compressed.file_size
+        info.compress_size = compressed.compress_size
+        info.CRC = compressed.crc
+        compressed.file.seek(compressed.offset)
+        self._write_raw(info, compressed.file)
+        self.members.append(
+            ArchiveMember(
+                info.filename,
+                origin,
+                info.file_size,
+                info.compress_size,
+                info.compress_type,
+                info.CRC,
+                compressed.cpu_time,
+            )
+        )
+
+    def close(self):
+        with span("close archive", "archive", archive=self.archive_name) as stage:
+            try:
+                while self._pending:
+                    self._write_next()
+            finally:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                self._zf.close()
+                stage.add("members", len(self.members))
+                stage.add("bytes", os.path.getsize(self.archive_name))
+            if self.report.deflated or self.report.stored:
+                logger.info(f"Compression: {self.report}")
+            if self.cache is not None:
+                logger.debug(
+                    f"Compression cache: {self.cache.hits} hits, {self.cache.misses} misses"
+                )
+                self.cache.evict()
+
+    def _prepare(self, info: zipfile.ZipInfo) -> None:
+        info.compress_type = self.compression
+        if self.date_time is None:
+            return
+        info.date_time = self.date_time
+        # as written on UNIX, whatever the platform building the archive
+        info.create_system = 3
+        mode = info.external_attr >> 16
+        if stat.S_ISDIR(mode):
+            mode = stat.S_IFDIR | 0o755
+        elif mode & 0o111:
+            mode = stat.S_IFREG | 0o755
+        else:
+            mode = stat.S_IFREG | 0o644
+        info.external_attr = mode << 16
+
+    def _choose(self, name: str, data: bytes) -> CompressionMethod:
+        if self.policy is None:
+            return CompressionMethod(self.compression, None)
+        return self.policy.choose(name, data)
+
+    def _compress(self, name: str, data: bytes) -> CompressedData:
+        """Compress a member as chosen by the policy, run by the compression threads."""
+        start = time.thread_time()
+        compress_type, level = self._choose(name, data)
+        compressed = compress_cached(data, compress_type, self.cache, level)
+        cpu_time = time.thread_time() - start
+        self.report.add(
+            compress_type, compressed.file_size, len(compressed.data), cpu_time
+        )
+        return compressed._replace(cpu_time=cpu_time)
+
+    def _write_next(self) -> None:
+        info, future, origin = self._pending.popleft()
+        self._write(info, future.result(), origin)
+
+    def _write(
+        self, info: zipfile.ZipInfo, compressed: CompressedData, origin: str = ""
+    ) -> None:
+        """Write an already compressed member."""
+        info.compress_type = compressed.compress_type
+        info.file_size = compressed.file_size
+        info.compress_size = len(compressed.data)
+        info.CRC = compressed.crc
+        self._write_raw(info, compressed.data)
+        self.members.append(
+            ArchiveMember(
+                info.filename,
+                origin,
+                info.file_size,
+                info.compress_size,
+                info.compress_type,
+                info.CRC,
+                compressed.cpu_time,
+            )
+        )
+
+    def _write_raw(self, info: zipfile.ZipInfo, data: bytes | BinaryIO) -> None:
+        """
+        Write a member from its compressed data, its CRC and sizes being already set.
+        This mirrors what ZipFile.writestr does on a seekable file,
+        without recompressing the data.
+        """
+        zf = self._zf
+        with zf._lock:
+            if zf._writing:
+                raise ValueError(
+                    "Can't write to ZIP archive while an open writing handle exists."
+                )
+            info.flag_bits = 0x00
+            if not info.external_attr:
+                info.external_attr = 0o600 << 16  # permissions: ?rw-------
+
+            # same heuristic as ZipFile._open_to_write
+            zip64 = info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+            if info.compress_size > zipfile.ZIP64_LIMIT:
+                zip64 = True
+
+            zf.fp.seek(zf.start_dir)
+            info.header_offset = zf.fp.tell()
+            zf._writecheck(info)
+            zf._didModify = True
+            zf.fp.write(info.FileHeader(zip64))
+            if isinstance(data, bytes):
+                zf.fp.write(data)
+            else:
+                shutil.copyfileobj(data, zf.fp, STREAM_CHUNK_SIZE)
+            zf.start_dir = zf.fp.tell()
+            zf.filelist.append(info)
+            zf.NameToInfo[info.filename] = info
+
+
+class ArchiveSet:
+    """
+    Write the same members into several archives, e.g. variants of a plugin
+    which only differ by a few members.
+    A content shared by several archives is compressed once, by the first writer.
+    """
+
+    def __init__(self, writers: list[ArchiveWriter]):
+        self.writers = writers
+
+    def __enter__(self) -> "ArchiveSet":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        for writer in self.writers:
+            writer.__exit__(exc_type, exc_value, traceback)
+
+    def add(self, info: zipfile.ZipInfo, data: bytes, origin: str = "") -> None:
+        """Add a member with the same content in all the archives."""
+        self.add_variants(info, [data] * len(self.writers), origin)
+
+    def add_variants(
+        self, info: zipfile.ZipInfo, data: list[bytes], origin: str = ""
+    ) -> None:
+        """Add a member with a content for each archive."""
+        compressed: list[tuple[bytes, Future]] = []
+        for writer, content in zip(self.writers, data, strict=True):
+            future = next(
+                (f for other, f in compressed if other is content or other == content),
+                None,
+            )
+            if future is None:
+                future = self.writers[0].compress_async(info.filename, content)
+                compressed.append((content, future))
+            writer.add_compressed(copy.copy(info), future, origin)
+
+    def add_stream(
+        self,
+        info: zipfile.ZipInfo,
+        open_stream: Callable[[], AbstractContextManager[BinaryIO]],
+        size: int,
+        origin: str = "",
+        key: str | None = None,
+    ) -> None:
+        """
+        Add a large member to all the archives.
+        It is compressed once by the first writer, and copied into each archive.
+        """
+        if len(self.writers) == 1:
+            self.writers[0].add_stream(info, open_stream, size, origin, key)
+            return
+        with self.writers[0].compress_stream(
+            info.filename, open_stream, key
+        ) as compressed:
+            for writer in self.writers:
+                writer.add_compressed_stream(copy.copy(info), compressed, origin)
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _deflater(level: int | None) -> "zlib._Compress":
+    """A raw deflate compressor, as used by ZipFile."""
+    return zlib.compressobj(
+        zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15
+    )
+
+
+def _unsupported_compression(compress_type: int) -> ValueError:
+    """Only the stored and deflated members are compressed by the writer itself."""
+    name = zipfile.compressor_names.get(compress_type, "unknown")
+    return ValueError(f"Unsupported compression type: {compress_type} ({name})")
+
+
+def _read_chunks(stream: BinaryIO) -> Iterator[bytes]:
+    return iter(partial(stream.read, STREAM_CHUNK_SIZE), b"")
+
+
+def _checksum(chunks: Iterable[bytes]) -> tuple[int, int]:
+    """The CRC and the size of a content read in chunks."""
+    crc = size = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+    return crc, size
+
+
+def _cache_key(
+    compress_type: int, level: int | None, kind: bytes, content: bytes | str
+) -> str:
+    """The key of a compressed content in the cache, also depending on the zlib version."""
+    digest = hashlib.sha256(
+        f"{compress_type}:{level}:{zlib.ZLIB_RUNTIME_VERSION}:".encode() + kind
+    )
+    digest.update(content.encode() if isinstance(content, str) else content)
+    return digest.hexdigest()
@@ -0,0 +1,160 @@
+#! python3  # noqa E265
+
+"""
+On-disk cache shared between builds.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import os
+import stat
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import mkstemp
+from typing import BinaryIO
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# in megabytes
+DEFAULT_CACHE_MAX_SIZE = 512
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class FileCache:
+    """
+    A content-addressed cache storing one file per key, capped in size.
+    The least recently used entries are evicted first.
+
+    Entries may be removed at any time by another cache sharing the directory,
+    a vanished entry is a miss.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_size: int = DEFAULT_CACHE_MAX_SIZE,
+        root: Path | str | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        path:
+            The cache directory, created if needed
+
+        max_size:
+            The maximum size of the cache in megabytes
+
+        root:
+            If given, a parent directory of the cache shared with other caches,
+            the size cap applying to all the entries under it
+        """
+        self.path = Path(path)
+        self.root = Path(root) if root is not None else self.path
+        self.max_size = max_size * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entry_path(key)
+        try:
+            value = entry.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self._touch(entry)
+        self.hits += 1
+        return value
+
+    def open(self, key: str) -> BinaryIO | None:
+        """Open an entry to read it in chunks, None if it is not in the cache."""
+        entry = self._entry_path(key)
+        try:
+            fh = entry.open("rb")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self._touch(entry)
+        self.hits += 1
+        return fh
+
+    def put(self, key: str, value: bytes) -> None:
+        try:
+            with self.spool(key) as fh:
+                fh.write(value)
+        except OSError as exc:
+            logger.warning(f"Could not write cache entry {key}: {exc}")
+
+    @contextmanager
+    def spool(self, key: str) -> Iterator[BinaryIO]:
+        """
+        Write an entry in chunks, in a temporary file which can also be read back.
+        The entry is stored once the block exits without error.
+        """
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # write and rename, so that a concurrent reader never sees a partial entry
+        handle, tmp_file = mkstemp(dir=entry.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(handle, "w+b") as fh:
+                yield fh
+        except BaseException:
+            Path(tmp_file).unlink(missing_ok=True)
+            raise
+        try:
+            os.replace(tmp_file, entry)
+        except OSError as exc:
+            Path(tmp_file).unlink(missing_ok=True)
+            logger.warning(f"Could not write cache entry {entry}: {exc}")
+
+    def remove(self, key: str) -> None:
+        self._entry_path(key).unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits its size cap."""
+        entries = []
+        for entry in self.root.glob("**/*"):
+            if entry.name.startswith(".tmp-"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                # removed meanwhile, e.g. by a concurrent eviction
+                continue
+            if stat.S_ISREG(st.st_mode):
+                entries.append((st.st_mtime, st.st_size, entry))
+        total_size = sum(size for _, size, _ in entries)
+        if total_size <= self.max_size:
+            return
+        entries.sort()
+        for _, size, entry in entries:
+            entry.unlink(missing_ok=True)
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+        logger.debug(f"Cache {self.root} evicted down to {total_size} bytes")
+
+    @staticmethod
+    def _touch(entry: Path) -> None:
+        # the modification time is used to evict the least recently used entries
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            # evicted meanwhile, the content already read is still valid
+            pass
+
+    def _entry_path(self, key: str) -> Path:
+        return self.path / key[:2] / key
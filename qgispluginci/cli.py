@@ -3,9 +3,19 @@ import argparse
 import logging
 from importlib.metadata import version
 
+from qgispluginci.cache import DEFAULT_CACHE_MAX_SIZE
 from qgispluginci.changelog import ChangelogParser
+from qgispluginci.compression import COMPRESSION_PROFILES
+from qgispluginci.http import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRIES,
+    HttpSession,
+)
+from qgispluginci.monorepo import package_plugins
 from qgispluginci.parameters import Parameters
 from qgispluginci.release import release
+from qgispluginci.tracing import span, tracing
 from qgispluginci.translation import Translation
 
 
@@ -64,7 +74,7 @@ def cli():
         "--allow-uncommitted-changes",
         action="store_true",
         help="If omitted, uncommitted changes are not allowed before packaging. If specified and some changes are "
-        "detected, a hard reset on a stash create will be used to revert changes made by qgis-plugin-ci.",
+        "detected, they are included in the archive.",
     )
     package_parser.add_argument(
         "-d",
@@ -78,6 +88,66 @@ def cli():
         action="append",
         help="An additional asset path to add. Can be specified multiple times.",
     )
+    package_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of threads used to compress the archive. 0 uses the number of CPUs.",
+    )
+    package_parser.add_argument(
+        "--cache-dir",
+        help="If specified, compressed files and compiled resources are cached in this directory and reused by later builds.",
+    )
+    package_parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=DEFAULT_CACHE_MAX_SIZE,
+        help="Size cap of the cache in megabytes. The least recently used entries are evicted first.",
+    )
+    package_parser.add_argument(
+        "--raise-min-version",
+        help="If specified, the qgisMinimumVersion of the metadata is replaced by this version.",
+    )
+    package_parser.add_argument(
+        "--variant",
+        action="append",
+        default=[],
+        help="An additional archive to create in the same pass, with different metadata: "
+        "'experimental', 'qgis-min=X.Y' or both comma separated. Can be specified multiple times.",
+    )
+    package_parser.add_argument(
+        "--trace",
+        metavar="TRACE_PATH",
+        help="If specified, the duration of each stage (git, submodules, resources, "
+        "translations, uploads…) is written to this path in the Chrome trace event format, "
+        "to be opened in https://ui.perfetto.dev or chrome://tracing.",
+    )
+    package_parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Profile the memory: print the peak memory of each stage (Python allocations "
+        "and resident memory) and the top allocation sites. Slows the packaging down.",
+    )
+    package_parser.add_argument(
+        "--report",
+        metavar="REPORT_PATH",
+        help="If specified, a JSON report of the composition of the archive is written to "
+        "this path and a summary of the largest and duplicated members is printed.",
+    )
+    package_parser.add_argument(
+        "--compression-profile",
+        choices=list(COMPRESSION_PROFILES),
+        help="The compression of the archive: fast (for development packages), default or "
+        "max (highest level, for releases). Overrides the one of the configuration.",
+    )
+    package_parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        default=False,
+        help="Build a reproducible archive: dates are taken from the last commit "
+        "(or SOURCE_DATE_EPOCH) and permissions are normalised.",
+    )
 
     # changelog
     changelog_parser = subparsers.add_parser(
@@ -120,7 +190,7 @@ def cli():
         "--allow-uncommitted-changes",
         action="store_true",
         help="If omitted, uncommitted changes are not allowed before releasing. If specified and some changes are "
-        "detected, a hard reset on a stash create will be used to revert changes made by qgis-plugin-ci.",
+        "detected, they are included in the archive.",
     )
     release_parser.add_argument(
         "-d",
@@ -134,6 +204,66 @@ def cli():
         action="append",
         help="An additional asset path to add. Can be specified multiple times.",
     )
+    release_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of threads used to compress the archive. 0 uses the number of CPUs.",
+    )
+    release_parser.add_argument(
+        "--cache-dir",
+        help="If specified, compressed files and compiled resources are cached in this directory and reused by later builds.",
+    )
+    release_parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=DEFAULT_CACHE_MAX_SIZE,
+        help="Size cap of the cache in megabytes. The least recently used entries are evicted first.",
+    )
+    release_parser.add_argument(
+        "--raise-min-version",
+        help="If specified, the qgisMinimumVersion of the metadata is replaced by this version.",
+    )
+    release_parser.add_argument(
+        "--variant",
+        action="append",
+        default=[],
+        help="An additional archive to create in the same pass, with different metadata: "
+        "'experimental', 'qgis-min=X.Y' or both comma separated. Can be specified multiple times.",
+    )
+    release_parser.add_argument(
+        "--trace",
+        metavar="TRACE_PATH",
+        help="If specified, the duration of each stage (git, submodules, resources, "
+        "translations, uploads…) is written to this path in the Chrome trace event format, "
+        "to be opened in https://ui.perfetto.dev or chrome://tracing.",
+    )
+    release_parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Profile the memory: print the peak memory of each stage (Python allocations "
+        "and resident memory) and the top allocation sites. Slows the packaging down.",
+    )
+    release_parser.add_argument(
+        "--report",
+        metavar="REPORT_PATH",
+        help="If specified, a JSON report of the composition of the archive is written to "
+        "this path and a summary of the largest and duplicated members is printed.",
+    )
+    release_parser.add_argument(
+        "--compression-profile",
+        choices=list(COMPRESSION_PROFILES),
+        help="The compression of the archive: fast (for development packages), default or "
+        "max (highest level, for releases). Overrides the one of the configuration.",
+    )
+    release_parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        default=False,
+        help="Build a reproducible archive: dates are taken from the last commit "
+        "(or SOURCE_DATE_EPOCH) and permissions are normalised.",
+    )
     release_parser.add_argument(
         "--alternative-repo-url",
         help="The URL of the endpoint to publish the plugin (defaults to plugins.qgis.org)",
@@ -150,6 +280,35 @@ def cli():
         "--osgeo-password",
         help="The OSGeo password to publish the plugin. Incompatible with QGIS token.",
     )
+    release_parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=DEFAULT_CONNECT_TIMEOUT,
+        help="Seconds to wait for a connection to the QGIS plugins repository.",
+    )
+    release_parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=DEFAULT_READ_TIMEOUT,
+        help="Seconds to wait for a response of the QGIS plugins repository.",
+    )
+    release_parser.add_argument(
+        "--http-retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Number of retries of a request to the QGIS plugins repository failing "
+        "with a connection error, a timeout or a temporary error (429, 5xx), "
+        "with an exponential backoff. The upload is only retried if it was not "
+        "processed (connection refused, 429, 503).",
+    )
+    release_parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="If specified, no request to the QGIS plugins repository is sent or retried "
+        "after this time from the start of the release, so that the upload does not hang "
+        "until the CI job times out. The other stages (Transifex, GitHub) are not bounded.",
+    )
 
     # pull-translation
     pull_tr_parser = subparsers.add_parser(
@@ -213,48 +372,128 @@ def cli():
     # Configuration file is now required
     parameters = Parameters.make_from(args=args)
 
-    # PACKAGE
-    if args.command == "package":
-        release(
-            parameters,
-            release_version=args.release_version,
-            tx_api_token=args.transifex_token,
-            allow_uncommitted_changes=args.allow_uncommitted_changes,
-            plugin_repo_url=args.plugin_repo_url,
-            disable_submodule_update=args.disable_submodule_update,
-            asset_paths=args.asset_path,
+    # monorepo: several plugins in the configuration
+    if parameters.plugins and args.command == "release":
+        logger.error(
+            "The release command does not support a configuration with several plugins, "
+            "as a release publishes a single plugin: package them with the package command."
         )
+        return 1
+    if parameters.plugins and args.command in ("pull-translation", "push-translation"):
+        resources = [
+            (plugin.transifex_project, plugin.transifex_resource)
+            for plugin in parameters.plugins
+        ]
+        if len(set(resources)) < len(resources):
+            logger.error(
+                "Each plugin must have its own Transifex resource to be translated, "
+                "set transifex_resource (or project_slug) for each of them."
+            )
+            return 1
+
+    # PACKAGE
+    if args.command == "package" and parameters.plugins:
+        if args.plugin_repo_url:
+            logger.error(
+                "--plugin-repo-url is not supported with several plugins, "
+                "as they would write the same plugins.xml file."
+            )
+            return 1
+        with (
+            tracing(args.trace, args.profile_memory),
+            span(args.command, version=args.release_version),
+        ):
+            package_plugins(
+                parameters.plugins,
+                release_version=args.release_version,
+                tx_api_token=args.transifex_token,
+                allow_uncommitted_changes=args.allow_uncommitted_changes,
+                disable_submodule_update=args.disable_submodule_update,
+                asset_paths=args.asset_path,
+                jobs=args.jobs,
+                cache_dir=args.cache_dir,
+                cache_max_size=args.cache_max_size,
+                reproducible=args.reproducible,
+                compression_profile=args.compression_profile,
+                raise_min_version=args.raise_min_version,
+                variants=args.variant,
+                report_path=args.report,
+            )
+
+    elif args.command == "package":
+        with (
+            tracing(args.trace, args.profile_memory),
+            span(args.command, version=args.release_version),
+        ):
+            release(
+                parameters,
+                release_version=args.release_version,
+                tx_api_token=args.transifex_token,
+                allow_uncommitted_changes=args.allow_uncommitted_changes,
+                plugin_repo_url=args.plugin_repo_url,
+                disable_submodule_update=args.disable_submodule_update,
+                asset_paths=args.asset_path,
+                jobs=args.jobs,
+                cache_dir=args.cache_dir,
+                cache_max_size=args.cache_max_size,
+                reproducible=args.reproducible,
+                compression_profile=args.compression_profile,
+                raise_min_version=args.raise_min_version,
+                variants=args.variant,
+                report_path=args.report,
+            )
 
     # RELEASE
     elif args.command == "release":
-        release(
-            parameters,
-            release_version=args.release_version,
-            release_tag=args.release_tag,
-            tx_api_token=args.transifex_token,
-            github_token=args.github_token,
-            upload_plugin_repo_github=args.create_plugin_repo,
-            alternative_repo_url=args.alternative_repo_url,
-            qgis_token=args.qgis_token,
-            osgeo_username=args.osgeo_username,
-            osgeo_password=args.osgeo_password,
-            allow_uncommitted_changes=args.allow_uncommitted_changes,
-            disable_submodule_update=args.disable_submodule_update,
-            asset_paths=args.asset_path,
-        )
+        with (
+            tracing(args.trace, args.profile_memory),
+            span(args.command, version=args.release_version),
+            HttpSession(
+                connect_timeout=args.connect_timeout,
+                read_timeout=args.read_timeout,
+                retries=args.http_retries,
+                deadline=args.deadline,
+            ) as http_session,
+        ):
+            release(
+                parameters,
+                release_version=args.release_version,
+                release_tag=args.release_tag,
+                tx_api_token=args.transifex_token,
+                github_token=args.github_token,
+                upload_plugin_repo_github=args.create_plugin_repo,
+                alternative_repo_url=args.alternative_repo_url,
+                qgis_token=args.qgis_token,
+                osgeo_username=args.osgeo_username,
+                osgeo_password=args.osgeo_password,
+                allow_uncommitted_changes=args.allow_uncommitted_changes,
+                disable_submodule_update=args.disable_submodule_update,
+                asset_paths=args.asset_path,
+                jobs=args.jobs,
+                cache_dir=args.cache_dir,
+                cache_max_size=args.cache_max_size,
+                reproducible=args.reproducible,
+                compression_profile=args.compression_profile,
+                raise_min_version=args.raise_min_version,
+                variants=args.variant,
+                report_path=args.report,
+                http_session=http_session,
+            )
 
     # TRANSLATION PULL
     elif args.command == "pull-translation":
-        t = Translation(parameters, args.transifex_token)
-        t.pull()
-        if args.compile:
-            t.compile_strings()
+        for plugin_parameters in parameters.plugins or [parameters]:
+            t = Translation(plugin_parameters, args.transifex_token)
+            t.pull()
+            if args.compile:
+                t.compile_strings()
 
     # TRANSLATION PUSH
     elif args.command == "push-translation":
-        t = Translation(parameters, args.transifex_token)
-        t.update_strings()
-        t.push()
+        for plugin_parameters in parameters.plugins or [parameters]:
+            t = Translation(plugin_parameters, args.transifex_token)
+            t.update_strings()
+            t.push()
 
     else:
         logger.error(f"Unsupported command {args.command}")
@@ -0,0 +1,177 @@
+#! python3  # noqa E265
+
+"""
+Compression policy of the members of the plugin archive.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import posixpath
+import threading
+import zipfile
+import zlib
+from collections.abc import Iterable
+from typing import NamedTuple
+
+# package
+from qgispluginci.utils import convert_octets
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# deflate level of each profile
+COMPRESSION_PROFILES = {
+    "fast": 1,
+    "default": zlib.Z_DEFAULT_COMPRESSION,
+    "max": 9,
+}
+
+# formats which are already compressed
+DEFAULT_STORED_EXTENSIONS = frozenset(
+    {
+        ".7z",
+        ".bz2",
+        ".gif",
+        ".gpkg",
+        ".gz",
+        ".jpeg",
+        ".jpg",
+        ".mp3",
+        ".mp4",
+        ".png",
+        ".qm",
+        ".webp",
+        ".whl",
+        ".xz",
+        ".zip",
+    }
+)
+
+# members smaller than this are not sampled, compressing them costs nothing
+SAMPLE_MIN_SIZE = 64 * 1024
+# size of the samples taken at the start, in the middle and at the end of a member
+SAMPLE_SIZE = 16 * 1024
+# members whose samples do not compress below this ratio are stored
+SAMPLE_MAX_RATIO = 0.95
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class CompressionMethod(NamedTuple):
+    compress_type: int
+    level: int | None
+
+
+STORED = CompressionMethod(zipfile.ZIP_STORED, None)
+
+
+class CompressionPolicy:
+    """
+    Choose how each member is compressed:
+    members with an already compressed format, by their extension or by sampling
+    their content, are stored while the others are deflated at the level of the profile.
+    """
+
+    def __init__(
+        self,
+        profile: str = "default",
+        stored_extensions: Iterable[str] = DEFAULT_STORED_EXTENSIONS,
+        sample: bool = True,
+    ):
+        """
+        Parameters
+        ----------
+        profile:
+            One of COMPRESSION_PROFILES: `fast`, `default` or `max`
+
+        stored_extensions:
+            Extensions of the members which are stored without compression
+
+        sample:
+            If True, large members are stored if samples of their content do not compress
+        """
+        if profile not in COMPRESSION_PROFILES:
+            raise ValueError(
+                f"Unknown compression profile '{profile}', "
+                f"expected one of: {', '.join(COMPRESSION_PROFILES)}"
+            )
+        self.profile = profile
+        self.stored_extensions = frozenset(
+            ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+            for ext in stored_extensions
+        )
+        self.sample = sample
+        self.deflated = CompressionMethod(
+            zipfile.ZIP_DEFLATED, COMPRESSION_PROFILES[profile]
+        )
+
+    def choose(self, name: str, data: bytes) -> CompressionMethod:
+        """
+        The compression of a member.
+        For a member streamed in chunks, data is the first chunk.
+        """
+        if posixpath.splitext(name)[1].lower() in self.stored_extensions:
+            return STORED
+        if self.sample and len(data) >= SAMPLE_MIN_SIZE and _incompressible(data):
+            return STORED
+        return self.deflated
+
+
+class CompressionReport:
+    """Statistics of the compression of an archive, updated from the compression threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.deflated = 0
+        self.stored = 0
+        self.cpu_time = 0.0
+        self.file_size = 0
+        self.compress_size = 0
+
+    def add(
+        self, compress_type: int, file_size: int, compress_size: int, cpu_time: float
+    ) -> None:
+        with self._lock:
+            if compress_type == zipfile.ZIP_STORED:
+                self.stored += 1
+            else:
+                self.deflated += 1
+            self.cpu_time += cpu_time
+            self.file_size += file_size
+            self.compress_size += compress_size
+
+    def __str__(self) -> str:
+        saved = self.file_size - self.compress_size
+        return (
+            f"{self.deflated} members deflated and {self.stored} stored, "
+            f"{self.cpu_time:.2f} s of CPU time spent to save {convert_octets(max(saved, 0))} "
+            f"({convert_octets(self.file_size)} to {convert_octets(self.compress_size)})"
+        )
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _incompressible(data: bytes) -> bool:
+    """Estimate the entropy of the content by compressing samples at the fastest level."""
+    middle = (len(data) - SAMPLE_SIZE) // 2
+    samples = (
+        data[:SAMPLE_SIZE],
+        data[middle : middle + SAMPLE_SIZE],
+        data[-SAMPLE_SIZE:],
+    )
+    compressed = sum(len(zlib.compress(sample, 1)) for sample in samples)
+    return compressed >= SAMPLE_MAX_RATIO * sum(len(sample) for sample in samples)
@@ -1,3 +1,7 @@
+# 3rd party
+import requests
+
+
 class BuiltResourceInSources(Exception):
     pass
 
@@ -14,6 +18,10 @@ class GithubReleaseNotFound(Exception):
     pass
 
 
+class HttpDeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
 class MissingChangelog(Exception):
     pass
 
@@ -0,0 +1,160 @@
+#! python3  # noqa E265
+
+"""
+Git information stamped in the plugin metadata.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import os
+import sys
+from typing import NamedTuple
+
+# 3rd party
+import git
+
+# package
+from qgispluginci.cache import FileCache
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# precomputed commit number, e.g. for shallow clones on CI
+COMMIT_NUMBER_ENV_VAR = "QGIS_PLUGIN_CI_COMMIT_NUMBER"
+# build date of reproducible builds, see https://reproducible-builds.org/specs/source-date-epoch/
+SOURCE_DATE_EPOCH_ENV_VAR = "SOURCE_DATE_EPOCH"
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class GitSnapshot(NamedTuple):
+    """The git state of a build, read once and shared by the builds of several plugins."""
+
+    treeish: str
+    commit_sha1: str
+    commit_number: int
+    source_date_epoch: int
+
+
+class GitMetadata:
+    """
+    Provide the commit SHA1, number and date of HEAD, computed once.
+    The commit number is cached by HEAD SHA1 so that later builds do not walk the history.
+    """
+
+    def __init__(self, repo: git.Repo, cache: FileCache | None = None):
+        """
+        Parameters
+        ----------
+        repo:
+            The repository
+
+        cache:
+            If given, commit numbers are stored in this cache
+        """
+        self.repo = repo
+        self.cache = cache
+        self._commit_sha1 = None
+        self._commit_number = None
+
+    @property
+    def commit_sha1(self) -> str:
+        if self._commit_sha1 is None:
+            self._commit_sha1 = self.repo.head.object.hexsha
+        return self._commit_sha1
+
+    @property
+    def treeish(self) -> str:
+        """
+        The tree to package: a stash commit including the uncommitted changes if any,
+        HEAD otherwise. Creating it does not modify the working tree.
+        """
+        try:
+            treeish = self.repo.git.stash("create")
+        except git.exc.GitCommandError:
+            treeish = None
+        return treeish or "HEAD"
+
+    def snapshot(self) -> GitSnapshot:
+        return GitSnapshot(
+            treeish=self.treeish,
+            commit_sha1=self.commit_sha1,
+            commit_number=self.commit_number,
+            source_date_epoch=self.source_date_epoch,
+        )
+
+    @property
+    def source_date_epoch(self) -> int:
+        """
+        The date of reproducible builds, as a UNIX timestamp:
+        SOURCE_DATE_EPOCH if set, otherwise the committer date of HEAD.
+        """
+        if os.environ.get(SOURCE_DATE_EPOCH_ENV_VAR):
+            return _read_env_integer(SOURCE_DATE_EPOCH_ENV_VAR)
+        return self.repo.head.object.committed_date
+
+    @property
+    def commit_number(self) -> int:
+        if self._commit_number is None:
+            self._commit_number = self._compute_commit_number()
+        return self._commit_number
+
+    def _compute_commit_number(self) -> int:
+        if os.environ.get(COMMIT_NUMBER_ENV_VAR):
+            logger.debug(f"Commit number read from {COMMIT_NUMBER_ENV_VAR}")
+            return _read_env_integer(COMMIT_NUMBER_ENV_VAR)
+
+        cache_key = f"commit-number-{self.commit_sha1}"
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return int(cached)
+
+        count = int(self.repo.git.rev_list("--count", self.commit_sha1))
+
+        if self.repo.git.rev_parse("--is-shallow-repository") == "true":
+            # the history is truncated, the count only reflects the depth of the clone
+            logger.warning(
+                f"The repository is a shallow clone, the commit number ({count}) is the "
+                "depth of the fetched history. Fetch the full history (e.g. `fetch-depth: 0` "
+                f"on GitHub Actions) or set it with the {COMMIT_NUMBER_ENV_VAR} environment variable."
+            )
+            # not cached, as it changes when the clone is deepened
+            return count
+
+        if self.cache is not None:
+            self.cache.put(cache_key, str(count).encode())
+        return count
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _read_env_integer(name: str) -> int:
+    """Read a non-negative integer from an environment variable, exit if it is not one."""
+    value = os.environ[name]
+    try:
+        number = int(value)
+        if number < 0:
+            raise ValueError(f"{number} is negative")
+    except ValueError as exc:
+        logger.error(
+            f"The environment variable {name} must be a non-negative integer, "
+            f"got: {value!r}",
+            exc_info=exc,
+        )
+        sys.exit(1)
+    return number
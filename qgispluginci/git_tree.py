@@ -0,0 +1,478 @@
+#! python3  # noqa E265
+
+"""
+Read files of a git tree directly from the object database.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import os
+import posixpath
+import queue
+import stat
+import subprocess
+import tarfile
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import BinaryIO, NamedTuple
+
+# 3rd party
+import git
+
+# package
+from qgispluginci.tracing import span
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+GIT_MODE_SYMLINK = 0o120000
+GIT_MODE_SUBMODULE = 0o160000
+
+# attributes with which git converts the content of a file when it is archived (or checked out)
+CONVERSION_ATTRIBUTES = (
+    "text",
+    "eol",
+    "crlf",
+    "ident",
+    "filter",
+    "working-tree-encoding",
+)
+
+# files read ahead from each submodule, bounds the memory used while they wait to be archived
+SUBMODULE_QUEUE_SIZE = 64
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class TreeEntry(NamedTuple):
+    path: str
+    mode: int
+    sha: str
+    size: int
+
+
+class LargeBlob(NamedTuple):
+    """A blob which is not read in memory, but streamed from its own git process."""
+
+    working_dir: str
+    sha: str
+    size: int
+
+    @contextmanager
+    def open(self) -> Iterator[BinaryIO]:
+        process = subprocess.Popen(
+            ["git", "cat-file", "blob", self.sha],
+            cwd=self.working_dir,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            yield process.stdout
+        finally:
+            process.stdout.close()
+            return_code = process.wait()
+        if return_code != 0:
+            raise subprocess.CalledProcessError(
+                return_code, ["git", "cat-file", "blob", self.sha]
+            )
+
+    def read(self) -> bytes:
+        with self.open() as stream:
+            return stream.read()
+
+
+class TreeAttributes(NamedTuple):
+    """The paths of a tree whose content is not archived as stored in the object database."""
+
+    # not archived at all
+    ignored: set[str]
+    # archived with their placeholders expanded (export-subst)
+    substituted: set[str]
+    # archived after a conversion: end of lines, ident, filters…
+    converted: set[str]
+
+
+class TreeFile(NamedTuple):
+    name: str
+    mode: int
+    data: bytes | LargeBlob
+
+    @property
+    def size(self) -> int:
+        return self.data.size if isinstance(self.data, LargeBlob) else len(self.data)
+
+
+class ArchivedFiles:
+    """
+    Read files as written by git archive, from its tar stream, for the files whose content
+    is converted by git: the conversions and the attributes are then exactly those of git.
+    Files must be read in the order of the tree, which is the order of the archive.
+    """
+
+    def __init__(self, repo: git.Repo, treeish: str, path: str | None = None):
+        """
+        Parameters
+        ----------
+        repo:
+            The repository
+
+        treeish:
+            The tree, commit or stash to archive
+
+        path:
+            Only archive the files below this path
+        """
+        self._process = subprocess.Popen(
+            [
+                "git",
+                "archive",
+                "--format=tar",
+                treeish,
+                *(["--", path] if path else []),
+            ],
+            cwd=repo.working_dir,
+            stdout=subprocess.PIPE,
+        )
+        self._tar = tarfile.open(fileobj=self._process.stdout, mode="r|")
+        self._members = iter(self._tar)
+
+    def read(self, path: str) -> bytes:
+        """Read a file of the archive, skipping the ones before it."""
+        for member in self._members:
+            if member.isfile() and member.name == path:
+                return self._tar.extractfile(member).read()
+        raise ValueError(f"{path} is not in the archive of the tree")
+
+    def close(self) -> None:
+        self._tar.close()
+        self._process.stdout.close()
+        # stopped early if the rest of the archive is not needed
+        self._process.kill()
+        self._process.wait()
+
+
+def list_tree(
+    repo: git.Repo,
+    treeish: str,
+    path: str | None = None,
+    env: dict[str, str] | None = None,
+) -> tuple[list[TreeEntry], TreeAttributes]:
+    """
+    List the blobs of a tree recursively, in the order used by git archive,
+    and the attributes changing how they are archived.
+    Submodules are not listed and paths set as export-ignore in .gitattributes are skipped.
+    The environment given by `tree_environment` saves reading the tree into an index again.
+    """
+    args = ["-r", "-z", "-l", treeish]
+    if path:
+        args += ["--", path]
+    entries = []
+    for record in repo.git.ls_tree(*args).split("\0"):
+        if not record:
+            continue
+        info, entry_path = record.split("\t", 1)
+        mode, obj_type, sha, size = info.split()
+        if obj_type != "blob":
+            continue
+        entries.append(TreeEntry(entry_path, int(mode, 8), sha, int(size)))
+
+    if env is None:
+        with tree_environment(repo, treeish) as env:
+            attributes = _tree_attributes(repo, env, [entry.path for entry in entries])
+    else:
+        attributes = _tree_attributes(repo, env, [entry.path for entry in entries])
+    return [
+        entry for entry in entries if entry.path not in attributes.ignored
+    ], attributes
+
+
+def iter_tree_files(
+    repo: git.Repo,
+    treeish: str,
+    path: str | None = None,
+    prefix: str = "",
+    stream_min_size: int | None = None,
+) -> Iterator[TreeFile]:
+    """
+    Yield the files of a tree read from the object database, as git archive would.
+    No checkout is involved: the working tree and the index are left untouched.
+
+    Files converted by git (end of lines, ident, filters, export-subst) are read from
+    git archive, in memory whatever their size: only the files archived as stored
+    are streamed, their size being known.
+
+    Parameters
+    ----------
+    repo:
+        The repository
+
+    treeish:
+        The tree, commit or stash to read
+
+    path:
+        Only read the files below this path
+
+    prefix:
+        Prepended to the names of the files, e.g. the path of a submodule
+
+    stream_min_size:
+        If given, blobs of this size or larger are not read but given as LargeBlob,
+        so that they can be streamed in chunks
+    """
+    with tree_environment(repo, treeish) as env:
+        entries, attributes = list_tree(repo, treeish, path, env)
+        by_path = {entry.path: entry for entry in entries}
+        reader = None
+        try:
+            for entry in entries:
+                name = f"{prefix}{entry.path}"
+                # links are archived as links by git, the target is read as stored
+                converted = entry.mode != GIT_MODE_SYMLINK and (
+                    entry.path in attributes.converted
+                    or entry.path in attributes.substituted
+                )
+                if entry.mode == GIT_MODE_SYMLINK:
+                    entry = _resolve_symlink(repo, treeish, entry, by_path)
+                    if entry is None:
+                        continue
+                mode = _file_mode(entry.mode)
+                if converted:
+                    reader = reader or ArchivedFiles(repo, treeish, path)
+                    yield TreeFile(name, mode, reader.read(entry.path))
+                elif stream_min_size is not None and entry.size >= stream_min_size:
+                    yield TreeFile(
+                        name, mode, LargeBlob(repo.working_dir, entry.sha, entry.size)
+                    )
+                else:
+                    yield TreeFile(name, mode, read_blob(repo, entry.sha))
+        finally:
+            if reader is not None:
+                reader.close()
+
+
+def iter_submodules_files(
+    submodules: list[git.Submodule],
+    workers: int = 4,
+    stream_min_size: int | None = None,
+) -> Iterator[TreeFile]:
+    """
+    Yield the files of the HEAD of submodules, as iter_tree_files does.
+    Large blobs are given as LargeBlob if stream_min_size is set.
+    Submodules are read concurrently by a bounded pool of threads,
+    while files are yielded in the order of the submodules.
+    """
+    if not submodules:
+        return
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=SUBMODULE_QUEUE_SIZE) for _ in submodules]
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(submodules))))
+    try:
+        for submodule, files in zip(submodules, queues, strict=True):
+            executor.submit(_read_submodule, submodule, files, stop, stream_min_size)
+        for files in queues:
+            while (item := files.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _read_submodule(
+    submodule: git.Submodule,
+    files: queue.Queue,
+    stop: threading.Event,
+    stream_min_size: int | None = None,
+) -> None:
+    """Read the files of a submodule into a queue, ended by None or an exception."""
+
+    def put(item: TreeFile | BaseException | None) -> None:
+        while not stop.is_set():
+            try:
+                files.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    try:
+        sub_repo = submodule.module()
+        logger.info(f"Archive submodule from git tree: {sub_repo}")
+        # includes the time waiting for the archive to consume the queue
+        with span(f"submodule {submodule.path}", "git") as stage:
+            try:
+                for file in iter_tree_files(
+                    sub_repo,
+                    "HEAD",
+                    prefix=f"{submodule.path}/",
+                    stream_min_size=stream_min_size,
+                ):
+                    if stop.is_set():
+                        return
+                    put(file)
+                    stage.add("files")
+                    stage.add("bytes", file.size)
+            finally:
+                # stop the persistent git processes of the submodule
+                sub_repo.close()
+        put(None)
+    except Exception as exc:
+        put(exc)
+
+
+def read_blob(repo: git.Repo, sha: str) -> bytes:
+    """Read a blob through the persistent `git cat-file --batch` process of the repository."""
+    _, _, _, stream = repo.git.stream_object_data(sha)
+    return stream.read()
+
+
+def _file_mode(git_mode: int) -> int:
+    # permissions of a checkout with the usual umask (022), as in the archives built
+    # from the working tree, rather than the group writable ones of git archive (002)
+    if git_mode & 0o111:
+        return stat.S_IFREG | 0o755
+    return stat.S_IFREG | 0o644
+
+
+def _resolve_symlink(
+    repo: git.Repo, treeish: str, entry: TreeEntry, entries: dict[str, TreeEntry]
+) -> TreeEntry | None:
+    """Resolve a link to the file it targets in the tree, links are followed as in the archive."""
+    seen = set()
+    while entry.mode == GIT_MODE_SYMLINK and entry.path not in seen:
+        seen.add(entry.path)
+        target = read_blob(repo, entry.sha).decode()
+        target_path = posixpath.normpath(
+            posixpath.join(posixpath.dirname(entry.path), target)
+        )
+        target_entry = entries.get(target_path) or _tree_entry(
+            repo, treeish, target_path
+        )
+        if target_entry is None:
+            logger.warning(f"Skipping unresolved symbolic link: {entry.path}")
+            return None
+        entry = TreeEntry(
+            entry.path, target_entry.mode, target_entry.sha, target_entry.size
+        )
+    if entry.mode == GIT_MODE_SYMLINK:
+        logger.warning(f"Skipping symbolic link loop: {entry.path}")
+        return None
+    return entry
+
+
+def _tree_entry(repo: git.Repo, treeish: str, path: str) -> TreeEntry | None:
+    """Look up a blob anywhere in the tree, e.g. a link target outside of the plugin."""
+    if path.startswith(("/", "../")):
+        return None
+    record = repo.git.ls_tree("-z", "-l", treeish, "--", path).rstrip("\0")
+    if not record:
+        return None
+    info, entry_path = record.split("\t", 1)
+    mode, obj_type, sha, size = info.split()
+    if obj_type != "blob" or entry_path != path:
+        return None
+    return TreeEntry(entry_path, int(mode, 8), sha, int(size))
+
+
+@contextmanager
+def tree_environment(repo: git.Repo, treeish: str) -> Iterator[dict[str, str]]:
+    """
+    The environment of git commands reading the attributes of a tree, as git archive does,
+    instead of the .gitattributes files of the working tree: an index filled from the tree
+    and an empty working tree, both temporary (--attr-source needs git 2.40).
+    Commands are run from the working tree given as GIT_WORK_TREE.
+    """
+    with TemporaryDirectory() as tmp_dir:
+        work_tree = os.path.join(tmp_dir, "work_tree")
+        os.mkdir(work_tree)
+        env = {
+            **os.environ,
+            "GIT_DIR": os.path.abspath(repo.git_dir),
+            "GIT_INDEX_FILE": os.path.join(tmp_dir, "index"),
+            "GIT_WORK_TREE": work_tree,
+        }
+        subprocess.run(
+            ["git", "read-tree", treeish],
+            cwd=work_tree,
+            env=env,
+            capture_output=True,
+            check=True,
+        )
+        yield env
+
+
+def _tree_attributes(
+    repo: git.Repo, env: dict[str, str], paths: list[str]
+) -> TreeAttributes:
+    """
+    Read the attributes of the paths changing how git archive writes them.
+    A path is ignored if the path itself or one of its parent directories is set
+    as export-ignore.
+    """
+    if not paths:
+        return TreeAttributes(set(), set(), set())
+    candidates = set(paths)
+    for path in paths:
+        candidates.update(str(parent) for parent in Path(path).parents)
+    candidates.discard(".")
+
+    output = subprocess.run(
+        [
+            "git",
+            "check-attr",
+            "--cached",
+            "--stdin",
+            "-z",
+            "export-ignore",
+            "export-subst",
+            *CONVERSION_ATTRIBUTES,
+        ],
+        input="\0".join(sorted(candidates)).encode(),
+        cwd=env["GIT_WORK_TREE"],
+        env=env,
+        capture_output=True,
+        check=True,
+    ).stdout.decode()
+    values: dict[str, dict[str, str]] = {}
+    fields = output.split("\0")
+    for i in range(0, len(fields) - 2, 3):
+        attr_path, attribute, value = fields[i : i + 3]
+        values.setdefault(attr_path, {})[attribute] = value
+
+    # as in a checkout, core.autocrlf converts the end of lines of all the text files
+    autocrlf = repo.git.config("--type=bool", "--default=false", "core.autocrlf")
+    ignored = {
+        path for path, attrs in values.items() if attrs["export-ignore"] == "set"
+    }
+    substituted = set()
+    converted = set()
+    for path in paths:
+        attrs = values[path]
+        if path in ignored or any(
+            str(parent) in ignored for parent in Path(path).parents
+        ):
+            ignored.add(path)
+        elif attrs["export-subst"] == "set":
+            substituted.add(path)
+        elif any(
+            attrs[attribute] not in ("unspecified", "unset")
+            for attribute in CONVERSION_ATTRIBUTES
+        ) or (autocrlf == "true" and attrs["text"] != "unset"):
+            converted.add(path)
+    return TreeAttributes(
+        {path for path in paths if path in ignored}, substituted, converted
+    )
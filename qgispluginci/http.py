@@ -0,0 +1,363 @@
+#! python3  # noqa E265
+
+"""
+HTTP transport of the uploads to the QGIS plugins repository: a pool of connections,
+connect and read timeouts, retries with exponential backoff and jitter,
+and a deadline after which no request is sent.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import random
+import time
+import xmlrpc.client
+from collections.abc import Callable, Sequence
+from typing import Any
+from urllib.parse import urlsplit
+
+# 3rd party
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# package
+from qgispluginci.exceptions import HttpDeadlineExceeded
+from qgispluginci.streaming import StreamedBody
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# seconds
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 120.0
+# attempts after the first one
+DEFAULT_RETRIES = 4
+# the n-th retry waits a random time up to min(BACKOFF_MAX, BACKOFF_FACTOR * 2**n) seconds
+BACKOFF_FACTOR = 1.0
+BACKOFF_MAX = 30.0
+# connections kept open per host
+POOL_SIZE = 4
+
+# responses worth trying again: throttled, or the server (or its proxy) is unavailable
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# responses telling that the request was not processed: any request can be sent again
+NOT_PROCESSED_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"})
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class Deadline:
+    """A point in time after which no request is sent nor waited for."""
+
+    def __init__(self, seconds: float | None = None):
+        """
+        Parameters
+        ----------
+        seconds:
+            Time from now, None for no deadline
+        """
+        self.seconds = seconds
+        self._end = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> float | None:
+        """Seconds left, None if there is no deadline."""
+        if self._end is None:
+            return None
+        return max(0.0, self._end - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+
+class HttpSession:
+    """
+    A requests session with a pool of connections, timeouts and retries.
+
+    Requests are retried on connection errors, timeouts and the RETRY_STATUSES,
+    when they are idempotent (see IDEMPOTENT_METHODS) or flagged as safely retryable.
+    Other requests (e.g. an upload, which may have been processed before failing)
+    are only retried when they were not processed: they could not even connect,
+    or the server answered with one of the NOT_PROCESSED_STATUSES.
+    Every wait (connection, response, backoff) is shortened to end before the deadline,
+    so that the requests of this session cannot hang past it.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        deadline: float | None = None,
+        pool_size: int = POOL_SIZE,
+    ):
+        """
+        Parameters
+        ----------
+        connect_timeout:
+            Seconds to wait for a connection to be established
+
+        read_timeout:
+            Seconds to wait for the server between two bytes of the response
+
+        retries:
+            Number of retries of a failed request
+
+        deadline:
+            Seconds from now after which no request is sent, None for no limit
+
+        pool_size:
+            Number of connections kept open per host
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(0, retries)
+        self.deadline = Deadline(deadline)
+        self._session = requests.Session()
+        # the retries are handled here, with the deadline
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def __enter__(self) -> "HttpSession":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._session.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        retry: bool | None = None,
+        payload: Callable[[], dict[str, Any]] | None = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        Send a request, retrying it on transient failures.
+        The last response is returned whatever its status, errors are raised.
+
+        Parameters
+        ----------
+        method:
+            The HTTP method
+
+        url:
+            The URL
+
+        retry:
+            If the request can be sent again after any failure.
+            If None, only idempotent methods are. The others are only retried
+            when they were not processed.
+
+        payload:
+            Called before each attempt, returns more arguments for requests
+            (e.g. `data` or `files`), so that a body read from a file is read again
+
+        kwargs:
+            Arguments for requests.Session.request
+        """
+        method = method.upper()
+        retryable = method in IDEMPOTENT_METHODS if retry is None else retry
+        attempt = 0
+        while True:
+            try:
+                response = self._session.request(
+                    method,
+                    url,
+                    timeout=self._timeout(method, url),
+                    **kwargs,
+                    **(payload() if payload is not None else {}),
+                )
+            except HttpDeadlineExceeded:
+                raise
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as exc:
+                if attempt >= self.retries or not (retryable or _not_sent(exc)):
+                    raise
+                reason = str(exc)
+                retry_after = None
+            else:
+                retry_statuses = RETRY_STATUSES if retryable else NOT_PROCESSED_STATUSES
+                if (
+                    response.status_code not in retry_statuses
+                    or attempt >= self.retries
+                ):
+                    return response
+                reason = f"HTTP {response.status_code}"
+                retry_after = _retry_after(response)
+                response.close()
+
+            delay = self._backoff(attempt, retry_after)
+            remaining = self.deadline.remaining()
+            if remaining is not None and delay >= remaining:
+                raise HttpDeadlineExceeded(
+                    f"{method} {url} failed ({reason}) and the deadline of "
+                    f"{self.deadline.seconds}s leaves no time to retry"
+                )
+            attempt += 1
+            logger.warning(
+                f"{method} {url} failed ({reason}), "
+                f"retry {attempt}/{self.retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _timeout(self, method: str, url: str) -> tuple[float, float]:
+        """The (connect, read) timeouts of the next attempt, within the deadline."""
+        remaining = self.deadline.remaining()
+        if remaining is None:
+            return self.connect_timeout, self.read_timeout
+        if remaining == 0.0:
+            raise HttpDeadlineExceeded(
+                f"{method} {url} not sent, "
+                f"the deadline of {self.deadline.seconds}s has passed"
+            )
+        return min(self.connect_timeout, remaining), min(self.read_timeout, remaining)
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: float | None) -> float:
+        """Exponential backoff with full jitter, or the delay asked by the server."""
+        if retry_after is not None:
+            return min(retry_after, BACKOFF_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_FACTOR * 2**attempt))
+
+
+class SessionTransport(xmlrpc.client.Transport):
+    """XML-RPC transport sending the calls through an HttpSession."""
+
+    def __init__(
+        self,
+        session: HttpSession,
+        scheme: str = "https",
+        headers: Sequence[tuple[str, str]] = (),
+        retry: bool | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        session:
+            The session sending the requests
+
+        scheme:
+            The scheme of the server URL
+
+        headers:
+            Headers added to each call
+
+        retry:
+            If the calls can be sent again after any failure (they are POST requests),
+            if None they are only retried when they were not processed
+        """
+        super().__init__(headers=headers)
+        self.session = session
+        self.scheme = scheme
+        self.retry = retry
+
+    def call(
+        self, url: str, request_body: bytes | StreamedBody, verbose: bool = False
+    ) -> Any:
+        """
+        Send a call already marshalled, e.g. streamed from a file, and return its result
+        as ServerProxy does.
+
+        Parameters
+        ----------
+        url:
+            The URL of the server
+
+        request_body:
+            The methodCall document
+
+        verbose:
+            If the call is logged
+        """
+        parts = urlsplit(url)
+        result = self.request(
+            parts.netloc, parts.path or "/RPC2", request_body, verbose=verbose
+        )
+        return result[0] if len(result) == 1 else result
+
+    def request(
+        self,
+        host: str,
+        handler: str,
+        request_body: bytes | StreamedBody,
+        verbose: bool = False,
+    ) -> tuple[Any, ...]:
+        server, extra_headers, _ = self.get_host_info(host)
+        headers = {
+            "Content-Type": "text/xml",
+            "User-Agent": self.user_agent,
+            **dict(self._headers),
+            **dict(extra_headers),
+        }
+        if verbose:
+            logger.debug(f"XML-RPC call on {server}{handler}")
+        if isinstance(request_body, StreamedBody):
+            # read again from the start when the call is retried
+            body = {"payload": lambda: {"data": request_body.rewind()}}
+        else:
+            body = {"data": request_body}
+        response = self.session.post(
+            f"{self.scheme}://{server}{handler}",
+            headers=headers,
+            retry=self.retry,
+            **body,
+        )
+        if response.status_code != 200:
+            raise xmlrpc.client.ProtocolError(
+                host + handler,
+                response.status_code,
+                response.reason,
+                dict(response.headers),
+            )
+        parser, unmarshaller = self.getparser()
+        parser.feed(response.content)
+        parser.close()
+        return unmarshaller.close()
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _not_sent(exc: requests.exceptions.RequestException) -> bool:
+    """If the request failed before anything was sent: it could not connect."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    """The delay in seconds of the Retry-After header, if any."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
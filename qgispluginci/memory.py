@@ -0,0 +1,182 @@
+#! python3  # noqa E265
+
+"""
+Memory profiling of the traced stages: peak of the Python allocations (tracemalloc)
+and peak resident memory (sampled), per span.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import itertools
+import logging
+import os
+import threading
+import tracemalloc
+from typing import Any
+
+# package
+from qgispluginci.utils import convert_octets
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# seconds between two readings of the resident memory
+RSS_SAMPLING_INTERVAL = 0.02
+# a snapshot of the allocations is taken again when more memory than this factor times
+# the previous snapshot is allocated at the end of a span
+SNAPSHOT_GROWTH = 1.25
+# allocation sites listed in the report
+TOP_ALLOCATIONS = 10
+# name of the trace event holding the top allocation sites
+TOP_ALLOCATIONS_EVENT = "top allocations"
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class MemoryProfiler:
+    """
+    Measure the peak memory of nested spans, from any thread.
+
+    The tracemalloc peak is process wide: a span gets the peak reached while it was open,
+    including by other threads. The resident memory is read every RSS_SAMPLING_INTERVAL,
+    on Linux only, and kept as a running maximum for each open span.
+    A snapshot of the allocations is taken when a span ends with SNAPSHOT_GROWTH times
+    more memory allocated than at the previous snapshot, to list the top allocation sites.
+    """
+
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self._snapshot_size = 0
+        # running peaks of the open spans, by token
+        self._peak_traced: dict[int, int] = {}
+        self._peak_rss: dict[int, int] = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def start(self) -> None:
+        tracemalloc.start(self.frames)
+        if current_rss() is not None:
+            self._sampler = threading.Thread(
+                target=self._sample, name="rss sampler", daemon=True
+            )
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        tracemalloc.stop()
+
+    def enter(self) -> int:
+        """Start measuring a span, returns the token to give to `exit`."""
+        rss = current_rss()
+        with self._lock:
+            self._propagate_peak()
+            token = next(self._tokens)
+            self._peak_traced[token] = tracemalloc.get_traced_memory()[0]
+            if rss is not None:
+                self._peak_rss[token] = rss
+        return token
+
+    def exit(self, token: int) -> dict[str, int]:
+        """The peak memory of a span since `enter` returned this token."""
+        with self._lock:
+            self._propagate_peak()
+            memory = {"peak_traced": self._peak_traced.pop(token)}
+            peak_rss = self._peak_rss.pop(token, None)
+            current = tracemalloc.get_traced_memory()[0]
+            take_snapshot = current > self._snapshot_size * SNAPSHOT_GROWTH
+            if take_snapshot:
+                self._snapshot_size = current
+        if take_snapshot:
+            # out of the lock, as listing all the allocations takes a while
+            snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                if current >= self._snapshot_size:
+                    self.snapshot = snapshot
+        end_rss = current_rss()
+        if end_rss is not None:
+            memory["peak_rss"] = max(peak_rss or 0, end_rss)
+        return memory
+
+    def top_allocations(self, count: int = TOP_ALLOCATIONS) -> dict[str, int]:
+        """Size allocated by line, at the heaviest snapshot taken at the end of a span."""
+        if self.snapshot is None:
+            return {}
+        snapshot = self.snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            )
+        )
+        return {
+            f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}": stat.size
+            for stat in snapshot.statistics("lineno")[:count]
+        }
+
+    def _propagate_peak(self) -> None:
+        """Record the peak since the last call in all the open spans, and reset it."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for token, value in self._peak_traced.items():
+            self._peak_traced[token] = max(value, peak)
+        tracemalloc.reset_peak()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(RSS_SAMPLING_INTERVAL):
+            rss = current_rss()
+            with self._lock:
+                for token, value in self._peak_rss.items():
+                    self._peak_rss[token] = max(value, rss)
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def current_rss() -> int | None:
+    """Resident memory of the process in bytes, None if it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def memory_report(events: list[dict[str, Any]]) -> str:
+    """Peak memory per span and top allocation sites, from the events of a trace."""
+    spans = [e for e in events if e["ph"] == "X" and "peak_traced" in e["args"]]
+    processes = {e["pid"] for e in spans}
+    name_width = max((len(e["name"]) for e in spans), default=5)
+    lines = [
+        f"{'Stage':<{name_width}}  {'Time':>9}  {'Peak Python':>12}  {'Peak RSS':>12}"
+    ]
+    for event in sorted(spans, key=lambda e: (e["pid"], e["ts"])):
+        peak_rss = event["args"].get("peak_rss")
+        lines.append(
+            f"{event['name']:<{name_width}}  {event['dur'] / 1e6:>8.3f}s  "
+            f"{convert_octets(event['args']['peak_traced']):>12}  "
+            f"{convert_octets(peak_rss) if peak_rss is not None else '-':>12}"
+            + (f"  (pid {event['pid']})" if len(processes) > 1 else "")
+        )
+    for event in events:
+        if event["name"] != TOP_ALLOCATIONS_EVENT:
+            continue
+        lines.append(f"Top allocation sites (pid {event['pid']}):")
+        for site, size in event["args"].items():
+            lines.append(f"  {convert_octets(size):>12}  {site}")
+    return "\n".join(lines)
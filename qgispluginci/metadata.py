@@ -0,0 +1,100 @@
+#! python3  # noqa E265
+
+"""
+Plugin metadata.txt model.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+from pathlib import Path
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class MetadataFile:
+    """
+    The metadata.txt of a plugin, parsed once and patched in memory.
+
+    Patching only touches the entries which are set, the rest of the file
+    (sections, comments, blank lines) is kept as is.
+    """
+
+    def __init__(self, content: str):
+        self._lines = content.splitlines(keepends=True)
+
+    @classmethod
+    def from_file(cls, path: Path | str) -> "MetadataFile":
+        return cls(Path(path).read_text(encoding="utf8"))
+
+    def values(self) -> dict[str, str]:
+        """Returns a dict of the keys and values found in the file."""
+        values = {}
+        for line in self._lines:
+            split = line.strip().split("=", 1)
+            if len(split) == 2:
+                values[split[0]] = split[1]
+        return values
+
+    def copy(self) -> "MetadataFile":
+        return MetadataFile(str(self))
+
+    def set(self, key: str, value: str) -> bool:
+        """
+        Set the value of a key already present in the file.
+        A multi-line value replaces the continuation lines of the previous one.
+        Returns False if the key is not in the file: plugins opt in for a stamp by declaring it.
+        """
+        span = self._entry_span(key)
+        if span is None:
+            return False
+        start, end = span
+        line = self._lines[start]
+        line_ending = line[len(line.rstrip("\r\n")) :] or "\n"
+        self._lines[start:end] = [f"{key}={value}{line_ending}"]
+        return True
+
+    def remove(self, key: str) -> bool:
+        """Remove a key and its continuation lines. Returns False if it is not in the file."""
+        span = self._entry_span(key)
+        if span is None:
+            return False
+        start, end = span
+        del self._lines[start:end]
+        return True
+
+    def to_bytes(self) -> bytes:
+        return str(self).encode("utf8")
+
+    def _entry_span(self, key: str) -> tuple[int, int] | None:
+        start = next(
+            (i for i, line in enumerate(self._lines) if line.startswith(f"{key}=")),
+            None,
+        )
+        if start is None:
+            return None
+        end = start + 1
+        # continuation lines are indented, as read by configparser
+        while (
+            end < len(self._lines)
+            and self._lines[end][:1] in (" ", "\t")
+            and self._lines[end].strip()
+        ):
+            end += 1
+        return start, end
+
+    def __str__(self) -> str:
+        return "".join(self._lines)
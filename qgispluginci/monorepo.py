@@ -0,0 +1,238 @@
+#! python3  # noqa E265
+
+"""
+Package the plugins of a repository holding several of them.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, NamedTuple
+
+# 3rd party
+import git
+
+# package
+from qgispluginci.cache import DEFAULT_CACHE_MAX_SIZE, FileCache
+from qgispluginci.git_metadata import GitMetadata, GitSnapshot
+from qgispluginci.memory import MemoryProfiler
+from qgispluginci.parameters import Parameters
+from qgispluginci.release import (
+    check_uncommitted_changes,
+    plugin_submodules,
+    release,
+    update_submodules,
+)
+from qgispluginci.tracing import Tracer, active_tracer, span, traced
+from qgispluginci.utils import convert_octets, file_sha256
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class PackageResult(NamedTuple):
+    plugin_path: str
+    archive_name: str
+    size: int
+    sha256: str
+    duration: float
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def package_plugins(
+    plugins: list[Parameters],
+    release_version: str,
+    workers: int = 0,
+    allow_uncommitted_changes: bool = False,
+    disable_submodule_update: bool = False,
+    cache_dir: str | None = None,
+    cache_max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    report_path: str | None = None,
+    **package_options: Any,
+) -> list[PackageResult]:
+    """
+    Package several plugins of the repository in parallel, one process per plugin.
+
+    The git state (uncommitted changes, tree, commit number…) is read once and
+    shared by all the plugins, the submodules of all the plugins are updated at once.
+
+    Parameters
+    ----------
+    plugins:
+        The parameters of each plugin
+
+    release_version:
+        The version to be released
+
+    workers:
+        The number of processes. 0 uses the number of CPUs.
+
+    report_path:
+        If given, the report of each archive is written next to this path,
+        suffixed with the plugin path (e.g. report.plugin_a.json)
+
+    package_options:
+        Other options of `release`, used for every plugin
+    """
+    check_plugins(plugins)
+    repo = git.Repo()
+    check_uncommitted_changes(repo, allow_uncommitted_changes)
+    with span("git snapshot", "git"):
+        git_snapshot = GitMetadata(
+            repo,
+            cache=(
+                FileCache(
+                    Path(cache_dir) / "git", max_size=cache_max_size, root=cache_dir
+                )
+                if cache_dir
+                else None
+            ),
+        ).snapshot()
+    if not disable_submodule_update:
+        update_submodules(
+            repo,
+            [
+                submodule
+                for plugin in plugins
+                for submodule in plugin_submodules(repo, plugin.plugin_path)
+            ],
+        )
+    repo.close()
+
+    # the spans of the worker processes are sent back to the tracer of this one
+    tracer = active_tracer()
+    workers = min(workers or os.cpu_count() or 1, len(plugins))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _package_plugin,
+                plugin,
+                release_version,
+                git_snapshot,
+                tracer is not None,
+                tracer is not None and tracer.memory is not None,
+                allow_uncommitted_changes=allow_uncommitted_changes,
+                disable_submodule_update=True,
+                cache_dir=cache_dir,
+                cache_max_size=cache_max_size,
+                report_path=(
+                    str(
+                        Path(report_path).with_suffix(
+                            f".{plugin.plugin_path.replace('/', '_')}.json"
+                        )
+                    )
+                    if report_path
+                    else None
+                ),
+                **package_options,
+            )
+            for plugin in plugins
+        ]
+        results = []
+        for future in futures:
+            result, events = future.result()
+            results.append(result)
+            if tracer is not None:
+                tracer.extend(events)
+
+    print_results(results)
+    return results
+
+
+def check_plugins(plugins: list[Parameters]) -> None:
+    """
+    Exit if the plugins cannot be packaged together: a plugin has no path,
+    or several plugins have the same path (they would write the same archive).
+    """
+    if not plugins:
+        logger.error("No plugin to package in the plugins list of the configuration")
+        sys.exit(1)
+    paths = set()
+    for index, plugin in enumerate(plugins, start=1):
+        if not plugin.plugin_path:
+            logger.error(
+                f"Plugin {index} of the plugins list of the configuration "
+                "has no plugin_path"
+            )
+            sys.exit(1)
+        path = os.path.normpath(plugin.plugin_path)
+        if path in paths:
+            logger.error(
+                f"Plugin {path} is listed several times in the plugins list "
+                "of the configuration"
+            )
+            sys.exit(1)
+        paths.add(path)
+
+
+def print_results(results: list[PackageResult]) -> None:
+    """Print the consolidated listing of the archives."""
+    name_width = max(len(result.archive_name) for result in results)
+    for result in results:
+        print(  # noqa: T201
+            f"{result.archive_name:<{name_width}}  "
+            f"{convert_octets(result.size):>10}  "
+            f"{result.duration:6.2f} s  "
+            f"sha256:{result.sha256}"
+        )
+
+
+def _package_plugin(
+    parameters: Parameters,
+    release_version: str,
+    git_snapshot: GitSnapshot,
+    trace: bool = False,
+    profile_memory: bool = False,
+    **package_options: Any,
+) -> tuple[PackageResult, list[dict[str, Any]]]:
+    """
+    Package a single plugin, run in a worker process.
+    Returns the result and, if traced, the events of the trace.
+    """
+    start = time.perf_counter()
+    tracer = Tracer(MemoryProfiler() if profile_memory else None) if trace else None
+    if tracer is not None:
+        tracer.start_memory_profiling()
+    try:
+        with (
+            traced(tracer),
+            span("package", plugin=parameters.plugin_path),
+        ):
+            archive_name = release(
+                parameters,
+                release_version,
+                git_snapshot=git_snapshot,
+                **package_options,
+            )
+    finally:
+        if tracer is not None:
+            tracer.stop_memory_profiling()
+    result = PackageResult(
+        plugin_path=parameters.plugin_path,
+        archive_name=archive_name,
+        size=os.path.getsize(archive_name),
+        sha256=file_sha256(archive_name),
+        duration=time.perf_counter() - start,
+    )
+    return result, tracer.events if tracer is not None else []
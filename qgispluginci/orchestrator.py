@@ -0,0 +1,134 @@
+#! python3  # noqa E265
+
+"""
+Concurrent run of the stages of a release, each one starting as soon as the stages
+it depends on are done.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, NamedTuple
+
+# package
+from qgispluginci.tracing import span
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# stages run at the same time: they mostly wait for the network or subprocesses
+STAGE_WORKERS = 4
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class Stage(NamedTuple):
+    name: str
+    function: Callable[..., Any]
+    # stages whose results are given to the function, as keyword arguments
+    requires: tuple[str, ...] = ()
+    # stages which only have to be done before
+    after: tuple[str, ...] = ()
+
+    @property
+    def dependencies(self) -> tuple[str, ...]:
+        return self.requires + self.after
+
+
+class Orchestrator:
+    """
+    Run stages on a pool of threads, each one as soon as its dependencies are done.
+
+    Stages are added after the stages they depend on, so that the dependencies cannot
+    form a cycle. If a stage fails (including with sys.exit), the stages not started yet
+    are cancelled, the running ones are waited for and the error is raised.
+    """
+
+    def __init__(self, workers: int = STAGE_WORKERS):
+        """
+        Parameters
+        ----------
+        workers:
+            The number of stages run at the same time
+        """
+        self.workers = max(1, workers)
+        self.stages: dict[str, Stage] = {}
+
+    def add(
+        self,
+        name: str,
+        function: Callable[..., Any],
+        requires: Iterable[str] = (),
+        after: Iterable[str] = (),
+    ) -> None:
+        """
+        Parameters
+        ----------
+        name:
+            The name of the stage, also the keyword of its result for the stages requiring it
+
+        function:
+            Called with the results of the required stages
+
+        requires:
+            The stages whose results are needed
+
+        after:
+            The stages which must be done before, without needing their results
+        """
+        stage = Stage(name, function, tuple(requires), tuple(after))
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already added")
+        unknown = [dep for dep in stage.dependencies if dep not in self.stages]
+        if unknown:
+            raise ValueError(
+                f"Stage {name} depends on stages not added yet: {', '.join(unknown)}"
+            )
+        self.stages[name] = stage
+
+    def run(self) -> dict[str, Any]:
+        """Run all the stages and return their results by name."""
+        results: dict[str, Any] = {}
+        pending = list(self.stages.values())
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="stage"
+        ) as pool:
+            running: dict[Future, str] = {}
+            try:
+                while pending or running:
+                    for stage in [
+                        stage
+                        for stage in pending
+                        if all(dep in results for dep in stage.dependencies)
+                    ]:
+                        pending.remove(stage)
+                        kwargs = {dep: results[dep] for dep in stage.requires}
+                        logger.debug(f"Starting stage {stage.name}")
+                        running[pool.submit(self._run_stage, stage, kwargs)] = (
+                            stage.name
+                        )
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)] = future.result()
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+        return results
+
+    @staticmethod
+    def _run_stage(stage: Stage, kwargs: dict[str, Any]) -> Any:
+        with span(f"stage {stage.name}", "stage"):
+            return stage.function(**kwargs)
@@ -33,6 +33,7 @@ from slugify import slugify
 
 # package
 from qgispluginci.exceptions import ConfigurationNotFound
+from qgispluginci.metadata import MetadataFile
 from qgispluginci.utils import set_datetime_zoneinfo
 
 
@@ -119,6 +120,20 @@ class Parameters:
         If True, the `project_slug` is used for the plugin directory name in the installation.
         Defaults to False
 
+    compression_profile: str
+        The compression of the archive: `fast`, `default` or `max`.
+        Defaults to `default`
+
+    compression_stored_extensions: list
+        Extensions of files stored without compression in the archive, in addition to
+        already compressed formats (images, compiled translations, archives…)
+
+    plugins: list
+        The plugins of a repository holding several of them (monorepo), packaged together.
+        Each item is a plugin path or the configuration of a plugin,
+        the other settings of the configuration being the default values.
+        Defaults to an empty list
+
     """
 
     @classmethod
@@ -193,6 +208,17 @@ class Parameters:
         self.plugin_path = definition.get("plugin_path")
         self.changelog_path = definition.get("changelog_path", "CHANGELOG.md")
 
+        # monorepo: one set of parameters per plugin
+        shared_definition = {k: v for k, v in definition.items() if k != "plugins"}
+        self.plugins: list[Parameters] = [
+            Parameters(
+                {**shared_definition, "plugin_path": plugin}
+                if isinstance(plugin, str)
+                else {**shared_definition, **plugin}
+            )
+            for plugin in definition.get("plugins", [])
+        ]
+
         if not self.plugin_path:
             # This tool can be used outside of a QGIS plugin to read a changelog file
             return
@@ -258,6 +284,15 @@ class Parameters:
         self.changelog_number_of_entries = definition.get(
             "changelog_number_of_entries", 3
         )
+        self.compression_profile = definition.get("compression_profile", "default")
+        compression_stored_extensions = definition.get(
+            "compression_stored_extensions", []
+        )
+        if isinstance(compression_stored_extensions, str):
+            compression_stored_extensions = compression_stored_extensions.split(",")
+        self.compression_stored_extensions = [
+            ext.strip() for ext in compression_stored_extensions if ext.strip()
+        ]
 
         # read from metadata
         self.about = get_metadata("about")
@@ -364,13 +399,9 @@ class Parameters:
         Returns a closure capturing a Dict of metadata, allowing to retrieve one
         value after the other while also iterating over the file once.
         """
-        metadata_file = f"{self.plugin_path}/metadata.txt"
-        metadata = {}
-        with open(metadata_file) as fh:
-            for line in fh:
-                split = line.strip().split("=", 1)
-                if len(split) == 2:
-                    metadata[split[0]] = split[1]
+        # kept to be patched when packaging, without parsing the file again
+        self.metadata_file = MetadataFile.from_file(f"{self.plugin_path}/metadata.txt")
+        metadata = self.metadata_file.values()
 
         def get_metadata(key: str, default_value: Any | None = None) -> Any:
             if not self.plugin_path:
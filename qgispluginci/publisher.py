@@ -0,0 +1,214 @@
+#! python3  # noqa E265
+
+"""
+Publication of the release assets on GitHub.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import logging
+import os
+import sys
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
+
+# 3rd party
+from github import Auth, Github, GithubException
+from github.GitRelease import GitRelease
+from github.GitReleaseAsset import GitReleaseAsset
+from github.Repository import Repository
+
+# package
+from qgispluginci.exceptions import (
+    GithubReleaseCouldNotUploadAsset,
+    GithubReleaseNotFound,
+)
+from qgispluginci.parameters import Parameters
+from qgispluginci.tracing import span
+from qgispluginci.utils import file_sha256
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# assets uploaded concurrently, also the size of the pool of connections
+UPLOAD_WORKERS = 4
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class GithubPublisher:
+    """
+    Publish assets on the GitHub release of a tag.
+
+    A single client is used for the whole run, so that its pool of connections is reused,
+    and the repository and the release are only looked up once.
+    """
+
+    def __init__(
+        self,
+        parameters: Parameters,
+        release_tag: str,
+        github_token: str,
+        workers: int = UPLOAD_WORKERS,
+    ):
+        """
+        Parameters
+        ----------
+        parameters:
+            The configuration parameters, giving the GitHub repository
+
+        release_tag:
+            The tag of the release
+
+        github_token:
+            The GitHub token
+
+        workers:
+            The number of assets uploaded concurrently
+        """
+        self.slug = f"{parameters.github_organization_slug}/{parameters.project_slug}"
+        self.release_tag = release_tag
+        self.workers = max(1, workers)
+        self._client = Github(auth=Auth.Token(github_token), pool_size=self.workers)
+
+    @cached_property
+    def repository(self) -> Repository:
+        try:
+            logger.debug(f"Getting GitHub repository: {self.slug}")
+            with span("github repository lookup", "network"):
+                return self._client.get_repo(self.slug)
+        except GithubException as exc:
+            logger.error(
+                f"Could not get repository details: {self.slug}. "
+                "Are you sure the user for the given token can access this repo?",
+                exc_info=exc,
+            )
+            sys.exit(1)
+
+    @cached_property
+    def release(self) -> GitRelease:
+        repository = self.repository
+        try:
+            logger.debug(f"Getting release on {self.slug}")
+            with span("github release lookup", "network"):
+                gh_release = repository.get_release(id=self.release_tag)
+        except GithubException as exc:
+            logger.error(
+                f"Release {self.release_tag} not found for {self.slug}",
+                exc_info=GithubReleaseNotFound(exc),
+            )
+            sys.exit(1)
+        logger.debug(
+            f"Release retrieved from GitHub: {gh_release}, "
+            f"{gh_release.tag_name}, "
+            f"{gh_release.upload_url}"
+        )
+        return gh_release
+
+    @property
+    def is_prerelease(self) -> bool:
+        return self.release.prerelease
+
+    def upload_asset(self, asset_path: str, asset_name: str | None = None) -> None:
+        self.upload_assets([(asset_path, asset_name)])
+
+    def upload_assets(self, assets: Iterable[tuple[str, str | None]]) -> None:
+        """
+        Upload files to the release concurrently, exit if one of them could not be uploaded.
+
+        An asset already on the release with the same name, size and SHA256 digest is
+        skipped (e.g. when a failed release job is run again), one with the same name but
+        another content is replaced.
+
+        Parameters
+        ----------
+        assets:
+            The path of each file and its name on the release (None to keep the file name)
+        """
+        assets = list(assets)
+        if not assets:
+            return
+        # looked up before the threads start
+        gh_release = self.release
+        with span("github assets listing", "network"):
+            existing = {asset.name: asset for asset in gh_release.get_assets()}
+        failure = None
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(assets))) as pool:
+            futures = {
+                pool.submit(
+                    self._upload,
+                    gh_release,
+                    asset_path,
+                    asset_name,
+                    existing.get(asset_name or os.path.basename(asset_path)),
+                ): asset_path
+                for asset_path, asset_name in assets
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except GithubException as exc:
+                    logger.warning(f"Could not upload {futures[future]}: {exc}")
+                    failure = failure or exc
+        if failure is not None:
+            logger.error(
+                f"Could not upload asset for release {self.release_tag} on {self.slug}. "
+                "Are you sure the user for the given token can upload asset to this repo?",
+                exc_info=GithubReleaseCouldNotUploadAsset(failure),
+            )
+            sys.exit(1)
+
+    @staticmethod
+    def _upload(
+        gh_release: GitRelease,
+        asset_path: str,
+        asset_name: str | None,
+        existing: GitReleaseAsset | None = None,
+    ) -> None:
+        assert os.path.exists(asset_path)
+        name = asset_name or os.path.basename(asset_path)
+        with span(
+            "github upload",
+            "network",
+            asset=name,
+            bytes=os.path.getsize(asset_path),
+        ) as upload_span:
+            if existing is not None:
+                if _same_content(existing, asset_path):
+                    logger.info(f"Asset {name} already uploaded, skipped")
+                    upload_span.add("skipped")
+                    return
+                logger.info(f"Asset {name} changed, replacing it")
+                existing.delete_asset()
+            if asset_name:
+                logger.debug(f"Uploading asset: {asset_path} as {asset_name}")
+                uploaded_asset = gh_release.upload_asset(
+                    path=asset_path, label=asset_name, name=asset_name
+                )
+            else:
+                logger.debug(f"Uploading asset: {asset_path}")
+                uploaded_asset = gh_release.upload_asset(asset_path)
+        logger.info(f"Asset successfully uploaded: {uploaded_asset.url}")
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _same_content(asset: GitReleaseAsset, asset_path: str) -> bool:
+    """If the asset on the release is the file, from the digest computed by GitHub."""
+    if asset.size != os.path.getsize(asset_path) or not asset.digest:
+        return False
+    return asset.digest == f"sha256:{file_sha256(asset_path)}"
@@ -6,49 +6,214 @@ import importlib.resources as importlib_resources
 import logging
 import os
 import re
-import shutil
 import sys
-import tarfile
 import xmlrpc.client
 import zipfile
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import closing, nullcontext
 from datetime import date, datetime, timezone
+from fnmatch import fnmatch
 from glob import glob
 from pathlib import Path
 from tempfile import mkstemp
-from typing import TYPE_CHECKING
+from typing import Any, NamedTuple
+from urllib.parse import urlsplit
 
 # 3rd party
 import git
-import pyqt5ac
 import requests
-from github import Github, GithubException
 
+from qgispluginci.archive import ArchiveSet, ArchiveWriter
+from qgispluginci.cache import DEFAULT_CACHE_MAX_SIZE, FileCache
 from qgispluginci.changelog import ChangelogParser
+from qgispluginci.compression import DEFAULT_STORED_EXTENSIONS, CompressionPolicy
 from qgispluginci.exceptions import (
     BuiltResourceInSources,
-    GithubReleaseCouldNotUploadAsset,
-    GithubReleaseNotFound,
     UncommitedChanges,
 )
+from qgispluginci.git_metadata import GitMetadata, GitSnapshot
+from qgispluginci.git_tree import (
+    LargeBlob,
+    TreeFile,
+    iter_submodules_files,
+    iter_tree_files,
+)
+from qgispluginci.http import HttpSession, SessionTransport
+from qgispluginci.orchestrator import Orchestrator
 from qgispluginci.parameters import Parameters
+from qgispluginci.publisher import GithubPublisher
+from qgispluginci.report import ArchiveReport
+from qgispluginci.resources import RESOURCE_FILE_MODE, compile_resources
+from qgispluginci.streaming import (
+    MultipartEncoder,
+    MultipartFile,
+    UploadProgress,
+    XmlRpcUploadBody,
+)
+from qgispluginci.tracing import span
 from qgispluginci.translation import Translation
 from qgispluginci.utils import (
     configure_file,
     convert_octets,
+    file_sha256,
     parse_tag,
-    replace_in_file,
     set_datetime_zoneinfo,
 )
 
 
-if TYPE_CHECKING:
-    from github.Repository import Repository
-
 # GLOBALS
 logger = logging.getLogger(__name__)
 
 QGIS_PLUGINS_REPO_URL = "https://plugins.qgis.org"
 
+# submodules updated and read concurrently
+SUBMODULE_WORKERS = 4
+# qrc files compiled concurrently
+RESOURCE_WORKERS = 4
+# earliest date of a ZIP member
+ZIP_MIN_DATE = (1980, 1, 1, 0, 0, 0)
+# files of this size or larger are streamed in chunks into the archive instead of being read
+STREAM_MIN_SIZE = 16 * 1024 * 1024
+
+
+class ContentTransform:
+    """
+    A transformation of the content of archive members, applied while they stream into the archive.
+
+    Subclasses implement `apply`. A transform only runs on members whose name matches
+    `file_pattern` (fnmatch syntax) and, if a `prefilter` is given, whose content contains it:
+    this cheap byte search lets other members pass through untouched.
+    """
+
+    def __init__(self, file_pattern: str = "*", prefilter: bytes | None = None):
+        self.file_pattern = file_pattern
+        self.prefilter = prefilter
+
+    def matches(self, name: str, data: bytes) -> bool:
+        if not fnmatch(name, self.file_pattern):
+            return False
+        return self.prefilter is None or self.prefilter in data
+
+    def apply(self, name: str, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class RegexTransform(ContentTransform):
+    """Substitute a regular expression (multi-line mode) in the content of members."""
+
+    def __init__(
+        self,
+        pattern: bytes,
+        replacement: bytes,
+        file_pattern: str = "*",
+        prefilter: bytes | None = None,
+    ):
+        super().__init__(file_pattern, prefilter)
+        self.pattern = re.compile(pattern, flags=re.M)
+        self.replacement = replacement
+
+    def apply(self, name: str, data: bytes) -> bytes:
+        return self.pattern.sub(self.replacement, data)
+
+
+class LineFilterTransform(ContentTransform):
+    """Remove the lines of members for which the predicate is False."""
+
+    def __init__(
+        self,
+        keep: Callable[[bytes], bool],
+        file_pattern: str = "*",
+        prefilter: bytes | None = None,
+    ):
+        super().__init__(file_pattern, prefilter)
+        self.keep = keep
+
+    def apply(self, name: str, data: bytes) -> bytes:
+        return b"".join(
+            line for line in data.splitlines(keepends=True) if self.keep(line)
+        )
+
+
+class TransformPipeline:
+    """Apply registered transforms in order to the members of an archive."""
+
+    def __init__(self, transforms: Iterable[ContentTransform] = ()):
+        self.transforms = list(transforms)
+
+    def register(self, transform: ContentTransform) -> None:
+        self.transforms.append(transform)
+
+    def applies_to(self, name: str) -> bool:
+        """Whether a transform might apply to a member, only looking at its name."""
+        return any(fnmatch(name, t.file_pattern) for t in self.transforms)
+
+    def apply(self, name: str, data: bytes) -> bytes:
+        """Returns the transformed content, or the very same object if no transform applied."""
+        for transform in self.transforms:
+            if transform.matches(name, data):
+                data = transform.apply(name, data)
+        return data
+
+
+# replace any DEBUG = True by DEBUG = False in all Python files
+DISABLE_DEBUG_TRANSFORM = RegexTransform(
+    rb"^DEBUG\s*=\s*True",
+    b"DEBUG = False",
+    file_pattern="*.py",
+    prefilter=b"DEBUG",
+)
+
+
+class ArchiveVariant(NamedTuple):
+    """An archive created along the main one, with different metadata."""
+
+    archive_name: str
+    experimental: bool = False
+    raise_min_version: str | None = None
+
+    @classmethod
+    def from_spec(
+        cls, spec: str, parameters: Parameters, release_version: str
+    ) -> "ArchiveVariant":
+        """
+        Parse a variant given as comma separated options: `experimental` and `qgis-min=X.Y`.
+        The archive is named after them, e.g. `experimental,qgis-min=3.34` gives
+        `plugin.1.0.0-experimental-qgis3.34.zip`.
+        """
+        experimental = False
+        raise_min_version = None
+        for option in spec.split(","):
+            key, _, value = option.strip().partition("=")
+            if key == "experimental" and not value:
+                experimental = True
+            elif key == "qgis-min" and value:
+                raise_min_version = value
+            else:
+                raise ValueError(
+                    f"Invalid variant option '{option}' in '{spec}', "
+                    "expected 'experimental' or 'qgis-min=X.Y'."
+                )
+        suffix = "-".join(
+            (["experimental"] if experimental else [])
+            + ([f"qgis{raise_min_version}"] if raise_min_version else [])
+        )
+        return cls(
+            parameters.archive_name(
+                parameters.plugin_path, f"{release_version}-{suffix}"
+            ),
+            experimental,
+            raise_min_version,
+        )
+
+
+class PreparedSources(NamedTuple):
+    """The inputs of an archive which depend neither on the translations nor on the release."""
+
+    repo: git.Repo
+    git_snapshot: GitSnapshot
+    submodules: list[git.Submodule]
+    resources: list[tuple[str, bytes]]
+
 
 def create_archive(
     parameters: Parameters,
@@ -60,27 +225,163 @@ def create_archive(
     raise_min_version: str = None,
     disable_submodule_update: bool = False,
     asset_paths: tuple[str] = (),
+    jobs: int = 1,
+    cache_dir: str | None = None,
+    cache_max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    transforms: Iterable[ContentTransform] = (),
+    reproducible: bool = False,
+    compression_profile: str | None = None,
+    git_snapshot: GitSnapshot | None = None,
+    variants: Iterable[ArchiveVariant] = (),
+    report_path: str | None = None,
 ):
+    """
+    Creates the plugin ZIP archive.
+
+    Parameters
+    ----------
+    transforms
+        Additional transforms applied to the content of the members of the archive
+
+    reproducible
+        If True, the build date is the commit date (or SOURCE_DATE_EPOCH) and the
+        permissions are normalised, so that the same sources give the same archive
+
+    compression_profile
+        The compression profile (`fast`, `default` or `max`), overrides the one of the configuration
+
+    git_snapshot
+        The git state, if already read (e.g. when packaging several plugins).
+        The uncommitted changes are then not checked again.
+
+    variants
+        Other archives to create in the same pass, differing by their metadata
+
+    report_path
+        If given, a JSON report of the composition of the archive is written to this path,
+        and a summary is printed
+    """
     repo = git.Repo()
+    if git_snapshot is None:
+        git_snapshot = snapshot_sources(
+            repo, allow_uncommitted_changes, cache_dir, cache_max_size
+        )
+    sources = PreparedSources(
+        repo,
+        git_snapshot,
+        prepare_submodules(repo, parameters.plugin_path, disable_submodule_update),
+        prepare_resources(parameters.plugin_path, cache_dir, cache_max_size),
+    )
+    write_archive(
+        parameters,
+        sources,
+        release_version,
+        archive_name,
+        add_translations=add_translations,
+        is_prerelease=is_prerelease,
+        raise_min_version=raise_min_version,
+        asset_paths=asset_paths,
+        jobs=jobs,
+        cache_dir=cache_dir,
+        cache_max_size=cache_max_size,
+        transforms=transforms,
+        reproducible=reproducible,
+        compression_profile=compression_profile,
+        variants=variants,
+        report_path=report_path,
+    )
 
-    top_tar_handle, top_tar_file = mkstemp(suffix=".tar")
 
-    # keep track of current state
-    initial_stash = None
-    diff_idx = repo.index.diff(None)
-    if diff_idx:
-        logger.info("There are uncommitted changes:")
-        for diff in diff_idx:
-            logger.info(diff)
-        if not allow_uncommitted_changes:
-            err_msg = (
-                "You have uncommitted changes. "
-                "Stash or commit them or use -c / --allow-uncommitted-changes option."
-            )
-            logger.error(err_msg, exc_info=UncommitedChanges())
-            sys.exit(1)
-        else:
-            initial_stash = repo.git.stash("create")
+def snapshot_sources(
+    repo: git.Repo,
+    allow_uncommitted_changes: bool = False,
+    cache_dir: str | None = None,
+    cache_max_size: int = DEFAULT_CACHE_MAX_SIZE,
+) -> GitSnapshot:
+    """Check the uncommitted changes, and read the git state to package."""
+    check_uncommitted_changes(repo, allow_uncommitted_changes)
+    with span("git snapshot", "git"):
+        return GitMetadata(
+            repo,
+            cache=(
+                FileCache(
+                    Path(cache_dir) / "git", max_size=cache_max_size, root=cache_dir
+                )
+                if cache_dir
+                else None
+            ),
+        ).snapshot()
+
+
+def prepare_submodules(
+    repo: git.Repo, plugin_path: str, disable_submodule_update: bool = False
+) -> list[git.Submodule]:
+    """The submodules of the plugin, initialized and updated unless disabled."""
+    submodules = plugin_submodules(repo, plugin_path)
+    if not disable_submodule_update:
+        update_submodules(repo, submodules)
+    return submodules
+
+
+def prepare_resources(
+    plugin_path: str,
+    cache_dir: str | None = None,
+    cache_max_size: int = DEFAULT_CACHE_MAX_SIZE,
+) -> list[tuple[str, bytes]]:
+    """Compile the qrc files, out of the source tree."""
+    resource_cache = (
+        FileCache(
+            Path(cache_dir) / "resources", max_size=cache_max_size, root=cache_dir
+        )
+        if cache_dir
+        else None
+    )
+    resources = compile_resources(
+        plugin_path, cache=resource_cache, workers=RESOURCE_WORKERS
+    )
+    if resource_cache is not None:
+        resource_cache.evict()
+    return resources
+
+
+def write_archive(
+    parameters: Parameters,
+    sources: PreparedSources,
+    release_version: str,
+    archive_name: str,
+    add_translations: bool = False,
+    is_prerelease: bool = False,
+    raise_min_version: str = None,
+    asset_paths: tuple[str] = (),
+    jobs: int = 1,
+    cache_dir: str | None = None,
+    cache_max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    transforms: Iterable[ContentTransform] = (),
+    reproducible: bool = False,
+    compression_profile: str | None = None,
+    variants: Iterable[ArchiveVariant] = (),
+    report_path: str | None = None,
+):
+    """
+    Write the plugin ZIP archive (and its variants) from the prepared sources,
+    the compiled translations and the assets. See create_archive for the parameters.
+    """
+    repo, git_snapshot = sources.repo, sources.git_snapshot
+
+    try:
+        compression_policy = CompressionPolicy(
+            profile=compression_profile or parameters.compression_profile,
+            stored_extensions=DEFAULT_STORED_EXTENSIONS.union(
+                parameters.compression_stored_extensions
+            ),
+        )
+    except ValueError as exc:
+        logger.error(str(exc), exc_info=exc)
+        sys.exit(1)
+
+    # metadata.txt is patched in memory and added to the archive in place of the one in sources
+    metadata_file_path = f"{parameters.plugin_path}/metadata.txt"
+    metadata = parameters.metadata_file.copy()
 
     # changelog
     if parameters.changelog_include:
@@ -94,213 +395,327 @@ def create_archive(
                     count=parameters.changelog_number_of_entries
                 )
                 if content:
-                    replace_in_file(
-                        f"{parameters.plugin_path}/metadata.txt",
-                        r"^changelog=.*$",
-                        f"changelog={content}",
-                    )
+                    metadata.set("changelog", content)
             except Exception as exc:
                 # Do not fail the release process if something is wrong when parsing the changelog
-                replace_in_file(
-                    f"{parameters.plugin_path}/metadata.txt",
-                    r"^changelog=.*$",
-                    "",
-                )
+                metadata.remove("changelog")
                 logger.warning(
                     f"An exception occurred while parsing the changelog file: {exc}",
                     exc_info=exc,
                 )
     else:
         # Remove the changelog line
-        replace_in_file(f"{parameters.plugin_path}/metadata.txt", r"^changelog=.*$", "")
+        metadata.remove("changelog")
 
     # set version in metadata
-    replace_in_file(
-        f"{parameters.plugin_path}/metadata.txt",
-        r"^version=.*$",
-        f"version={release_version}",
-    )
+    metadata.set("version", release_version)
 
     # Commit number
-    replace_in_file(
-        f"{parameters.plugin_path}/metadata.txt",
-        r"^commitNumber=.*$",
-        f"commitNumber={len(list(repo.iter_commits()))}",
-    )
+    metadata.set("commitNumber", str(git_snapshot.commit_number))
 
     # Git SHA1
-    replace_in_file(
-        f"{parameters.plugin_path}/metadata.txt",
-        r"^commitSha1=.*$",
-        f"commitSha1={repo.head.object.hexsha}",
-    )
+    metadata.set("commitSha1", git_snapshot.commit_sha1)
 
     # Date/time in UTC
-    date_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-    replace_in_file(
-        f"{parameters.plugin_path}/metadata.txt",
-        r"^dateTime=.*$",
-        f"dateTime={date_time}",
+    if reproducible:
+        build_date = datetime.fromtimestamp(
+            git_snapshot.source_date_epoch, timezone.utc
+        )
+    else:
+        build_date = datetime.now(timezone.utc)
+    metadata.set("dateTime", build_date.strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+    # the main archive and its variants only differ by their metadata and the transforms
+    # depending on it: the sources are read, and shared content compressed, once for all
+    variants = [ArchiveVariant(archive_name, is_prerelease, raise_min_version)] + [
+        variant._replace(
+            experimental=variant.experimental or is_prerelease,
+            raise_min_version=variant.raise_min_version or raise_min_version,
+        )
+        for variant in variants
+    ]
+    overlays = []
+    pipelines = []
+    for variant in variants:
+        variant_metadata = metadata.copy()
+        # set the plugin as experimental on a pre-release
+        if variant.experimental:
+            variant_metadata.set("experimental", str(True))
+        if variant.raise_min_version:
+            variant_metadata.set("qgisMinimumVersion", variant.raise_min_version)
+        overlays.append({metadata_file_path: variant_metadata.to_bytes()})
+
+        pipeline = TransformPipeline()
+        if not variant.experimental:
+            pipeline.register(DISABLE_DEBUG_TRANSFORM)
+        for transform in transforms:
+            pipeline.register(transform)
+        pipelines.append(pipeline)
+
+    # the tree to package is read from the object database with the patched files as an overlay:
+    # the working tree is never modified, so it does not need to be restored afterwards.
+    # A stash commit (which does not touch the working tree either) includes uncommitted changes.
+    treeish = git_snapshot.treeish
+
+    # create ZIP archives
+    archived_names = set()
+    compression_cache = (
+        FileCache(Path(cache_dir) / "zip", max_size=cache_max_size, root=cache_dir)
+        if cache_dir
+        else None
     )
-
-    # set the plugin as experimental on a pre-release
-    if is_prerelease:
-        replace_in_file(
-            f"{parameters.plugin_path}/metadata.txt",
-            r"^experimental=.*$",
-            f"experimental={True if is_prerelease else False}",
+    writers = [
+        ArchiveWriter(
+            variant.archive_name,
+            jobs=jobs,
+            # the first archive compresses the content shared by all of them
+            cache=compression_cache if i == 0 else None,
+            policy=compression_policy,
+            # ZIP dates cannot be before 1980
+            date_time=max(build_date.timetuple()[:6], ZIP_MIN_DATE)
+            if reproducible
+            else None,
         )
+        for i, variant in enumerate(variants)
+    ]
+    with ArchiveSet(writers) as zf:
+        logger.debug(f"Archive plugin from git tree: {treeish}")
+        with span("git tree", "git", treeish=treeish) as stage:
+            for file in iter_tree_files(
+                repo, treeish, parameters.plugin_path, stream_min_size=STREAM_MIN_SIZE
+            ):
+                _write_tree_file(
+                    zf, parameters, pipelines, file, overlays, origin="git tree"
+                )
+                archived_names.add(file.name)
+                stage.add("files")
+                stage.add("bytes", file.size)
+
+        # adding submodules
+        with span("submodules", "git", submodules=len(sources.submodules)) as stage:
+            for file in iter_submodules_files(
+                sources.submodules,
+                workers=SUBMODULE_WORKERS,
+                stream_min_size=STREAM_MIN_SIZE,
+            ):
+                _write_tree_file(zf, parameters, pipelines, file, origin="submodule")
+                archived_names.add(file.name)
+                stage.add("files")
+                stage.add("bytes", file.size)
+
+        # add LICENSE if not already in plugin path but available in its parent
+        if not Path(f"{parameters.plugin_path}/LICENSE").is_file():
+            parent_license = Path(f"{parameters.plugin_path}/../LICENSE")
+            if parent_license.is_file():
+                _write_zip_member(
+                    zf,
+                    parameters,
+                    f"{parameters.plugin_path}/LICENSE",
+                    parent_license.read_bytes(),
+                    parent_license.stat().st_mode,
+                    origin="license",
+                )
+
+        # add translation files
+        if add_translations:
+            logger.debug("Adding translations")
+            with span("translations", "archive") as stage:
+                for file in sorted(glob(f"{parameters.plugin_path}/i18n/*.qm")):
+                    logger.debug(f"  adding translation: {os.path.basename(file)}")
+                    _write_local_file(zf, parameters, file, origin="translation")
+                    stage.add("files")
+                    stage.add("bytes", os.path.getsize(file))
+
+        # qrc files compiled out of the source tree
+        for file, data in sources.resources:
+            if file in archived_names:
+                err_msg = (
+                    f"The file {file} is present in the sources and its name "
+                    "conflicts with a just built resource. "
+                    "You might want to remove it from the sources or "
+                    "setting export-ignore in .gitattributes config file."
+                )
+                logger.error(err_msg, exc_info=BuiltResourceInSources())
+                sys.exit(1)
+            logger.debug(f"\tAdding resource: {file}")
+            _write_zip_member(
+                zf, parameters, file, data, RESOURCE_FILE_MODE, origin="resource"
+            )
+
+        # Add assets
+        if asset_paths:
+            with span("assets", "archive") as stage:
+                for asset_path in asset_paths:
+                    for file in _iter_local_files(asset_path):
+                        _write_local_file(zf, parameters, file, origin="asset")
+                        stage.add("files")
+                        stage.add("bytes", os.path.getsize(file))
+
+    with span("debug listing", "archive"):
+        logger.debug("-" * 40)
+        logger.debug(f"Files in ZIP archive ({archive_name}):")
+        for member in writers[0].members:
+            logger.debug(f"{member.name} ({member.origin})")
+        logger.debug("-" * 40)
+
+    if report_path:
+        with span("report", "archive"):
+            report = ArchiveReport(archive_name, writers[0].members)
+            report.write_json(report_path)
+        print(report.table())  # noqa: T201
+        logger.info(f"Archive report written to {report_path}")
 
-    if raise_min_version:
-        replace_in_file(
-            f"{parameters.plugin_path}/metadata.txt",
-            r"^qgisMinimumVersion=.*$",
-            f"qgisMinimumVersion={raise_min_version}",
+    # print the result
+    for variant in variants:
+        print(  # noqa: T201
+            f"Plugin archive created: {variant.archive_name} "
+            f"({convert_octets(Path(variant.archive_name).stat().st_size)})"
         )
+        if reproducible:
+            logger.info(f"Archive SHA256: {file_sha256(variant.archive_name)}")
 
-    # replace any DEBUG=False in all Python files
-    if not is_prerelease:
-        for file in glob(f"{parameters.plugin_path}/**/*.py", recursive=True):
-            replace_in_file(file, r"^DEBUG\s*=\s*True", "DEBUG = False")
 
-    # keep track of current state
-    try:
-        stash = repo.git.stash("create")
-    except git.exc.GitCommandError:
-        stash = "HEAD"
-    if stash == "" or stash is None:
-        stash = "HEAD"
-    # create TAR archive
-    logger.debug(f"Git archive plugin with stash: {stash}")
-    repo.git.archive(stash, "-o", top_tar_file, parameters.plugin_path)
-    # adding submodules
+def check_uncommitted_changes(repo: git.Repo, allow_uncommitted_changes: bool) -> None:
+    """Log the uncommitted changes, and exit if they are not allowed."""
+    diff_idx = repo.index.diff(None)
+    if diff_idx:
+        logger.info("There are uncommitted changes:")
+        for diff in diff_idx:
+            logger.info(diff)
+        if not allow_uncommitted_changes:
+            err_msg = (
+                "You have uncommitted changes. "
+                "Stash or commit them or use -c / --allow-uncommitted-changes option."
+            )
+            logger.error(err_msg, exc_info=UncommitedChanges())
+            sys.exit(1)
+
+
+def plugin_submodules(repo: git.Repo, plugin_path: str) -> list[git.Submodule]:
+    """The submodules in the plugin source directory."""
+    submodules = []
     for submodule in repo.submodules:
-        _, sub_tar_file = mkstemp(suffix=".tar")
-        if submodule.path.split("/")[0] != parameters.plugin_path:
+        if submodule.path.split("/")[0] != plugin_path:
             logger.debug(
                 f"Skipping submodule not in plugin source directory: {submodule.name}"
             )
             continue
-        if not disable_submodule_update:
-            submodule.update(init=True)
-        sub_repo = submodule.module()
-        logger.info(f"Git archive submodule: {sub_repo}")
-        sub_repo.git.archive(
-            "HEAD", "--prefix", f"{submodule.path}/", "-o", sub_tar_file
-        )
-        with tarfile.open(top_tar_file, mode="a") as tt:
-            with tarfile.open(sub_tar_file, mode="r:") as st:
-                for m in st.getmembers():
-                    if not m.isfile():
-                        continue
-                    tt.add(m.name)
-
-    # add LICENSE if not already in plugin path but available in its parent
-    parent_folder_license_copied = False
-    if not Path(f"{parameters.plugin_path}/LICENSE").is_file():
-        parent_license = Path(f"{parameters.plugin_path}/../LICENSE")
-        if parent_license.is_file():
-            shutil.copy(parent_license, f"{parameters.plugin_path}/LICENSE")
-            parent_folder_license_copied = True
-            with tarfile.open(top_tar_file, mode="a") as tt:
-                tt.add(f"{parameters.plugin_path}/LICENSE")
-
-    # add translation files
-    if add_translations:
-        with tarfile.open(top_tar_file, mode="a") as tt:
-            logger.debug("Adding translations")
-            for file in glob(f"{parameters.plugin_path}/i18n/*.qm"):
-                logger.debug(f"  adding translation: {os.path.basename(file)}")
-                # https://stackoverflow.com/a/48462950/1548052
-                tt.add(file)
-
-    # compile qrc files
-    if list(Path(parameters.plugin_path).glob("*.qrc")):
-        pyqt5ac.main(
-            ioPaths=[
-                [
-                    f"{parameters.plugin_path}/*.qrc",
-                    f"{parameters.plugin_path}/%%FILENAME%%_rc.py",
-                ]
-            ]
+        submodules.append(submodule)
+    return submodules
+
+
+def update_submodules(repo: git.Repo, submodules: list[git.Submodule]) -> None:
+    """Initialize and update submodules, git fetches them concurrently."""
+    if not submodules:
+        return
+    with span("submodule update", "git", submodules=len(submodules)):
+        repo.git.submodule(
+            "update",
+            "--init",
+            "--jobs",
+            str(SUBMODULE_WORKERS),
+            "--",
+            *(submodule.path for submodule in submodules),
         )
-        for file in glob(f"{parameters.plugin_path}/*_rc.py"):
-            with tarfile.open(top_tar_file, mode="r:") as tt:
-                for n in tt.getnames():
-                    if n == file:
-                        err_msg = (
-                            f"The file {file} is present in the sources and its name "
-                            "conflicts with a just built resource. "
-                            "You might want to remove it from the sources or "
-                            "setting export-ignore in .gitattributes config file."
-                        )
-                        logger.error(err_msg, exc_info=BuiltResourceInSources())
-                        sys.exit(1)
-            with tarfile.open(top_tar_file, mode="a") as tt:
-                logger.debug(f"\tAdding resource: {file}")
-                # https://stackoverflow.com/a/48462950/1548052
-                tt.add(file)
-    # Add assets
-    if asset_paths:
-        with tarfile.open(top_tar_file, mode="a") as tt:
-            for asset_path in asset_paths:
-                tt.add(asset_path)
-
-    # converting to ZIP
-    # why using TAR before? because it provides the prefix and makes things easier
-    with zipfile.ZipFile(
-        file=archive_name, mode="w", compression=zipfile.ZIP_DEFLATED
-    ) as zf:
-        # adding the content of TAR archive
-        with tarfile.open(top_tar_file, mode="r:") as tt:
-            for m in tt.getmembers():
-                if m.isdir():
-                    continue
-                f = tt.extractfile(m)
-                fl = f.read()
-                fn = m.name
-                # Get permissions and add it to ZipInfo
-                st = os.stat(fn)
-
-                # fix directory structure if plugin path is not top level
-                # or if the plugin source directory is not distinctive (src, plugin, etc.)
-                # e.g. plugin/some_dir/metadata.txt => my_plugin/metadata.txt
-                fixed_path = fn.replace(
-                    parameters.plugin_path, parameters.plugin_zip_directory
-                )
-                info = zipfile.ZipInfo(fixed_path)
-
-                # Using flags as defined in python zipfile module
-                # code : https://github.com/python/cpython/blob/b885b8f4be9c74ef1ce7923dbf055c31e7f47735/Lib/zipfile.py#L545
-                # see https://stackoverflow.com/questions/434641/how-do-i-set-permissions-attributes-on-a-file-in-a-zip-file-using-pythons-zip/53008127#53008127
-                info.external_attr = (st[0] & 0xFFFF) << 16  # Unix attributes
-                info.compress_type = zf.compression
-                zf.writestr(info, fl)
-
-    if parent_folder_license_copied:
-        Path(f"{parameters.plugin_path}/LICENSE").unlink()
-
-    logger.debug("-" * 40)
-    logger.debug(f"Files in ZIP archive ({archive_name}):")
-    with zipfile.ZipFile(file=archive_name, mode="r") as zf:
-        for f in zf.namelist():
-            logger.debug(f)
-    logger.debug("-" * 40)
-
-    # checkout to reset changes
-    if initial_stash:
-        repo.git.reset("--hard", initial_stash)
-        repo.git.reset("HEAD^")
+
+
+def _resources_use_translations(plugin_path: str) -> bool:
+    """If a qrc file of the plugin lists compiled translations."""
+    return any(b".qm<" in qrc.read_bytes() for qrc in Path(plugin_path).glob("*.qrc"))
+
+
+def _iter_local_files(path: str) -> Iterator[str]:
+    """Yield the files of a path, recursively and sorted if it is a directory."""
+    if os.path.isdir(path):
+        for entry in sorted(os.listdir(path)):
+            yield from _iter_local_files(os.path.join(path, entry))
     else:
-        repo.git.checkout("--", ".")
+        yield path
 
-    # print the result
-    print(  # noqa: T201
-        f"Plugin archive created: {archive_name} "
-        f"({convert_octets(Path(archive_name).stat().st_size)})"
+
+def _write_local_file(
+    zf: ArchiveSet, parameters: Parameters, file: str, *, origin: str
+) -> None:
+    path = Path(file)
+    file_stat = path.stat()
+    if file_stat.st_size < STREAM_MIN_SIZE:
+        _write_zip_member(
+            zf,
+            parameters,
+            path.as_posix(),
+            path.read_bytes(),
+            file_stat.st_mode,
+            origin=origin,
+        )
+        return
+    info = _zip_info(parameters, path.as_posix(), file_stat.st_mode)
+    zf.add_stream(info, lambda: path.open("rb"), file_stat.st_size, origin)
+
+
+def _write_tree_file(
+    zf: ArchiveSet,
+    parameters: Parameters,
+    pipelines: list[TransformPipeline],
+    file: TreeFile,
+    overlays: list[dict[str, bytes]] | None = None,
+    *,
+    origin: str,
+) -> None:
+    """Write a file of a tree, transformed for each archive and replaced by its overlay if any."""
+    overlays = overlays or [{}] * len(pipelines)
+    data = file.data
+    if isinstance(data, LargeBlob):
+        if not any(
+            pipeline.applies_to(file.name) or file.name in overlay
+            for pipeline, overlay in zip(pipelines, overlays, strict=True)
+        ):
+            zf.add_stream(
+                _zip_info(parameters, file.name, file.mode),
+                data.open,
+                data.size,
+                origin,
+                # blobs are addressed by their content
+                key=data.sha,
+            )
+            return
+        # transforms need the whole content
+        data = data.read()
+    zf.add_variants(
+        _zip_info(parameters, file.name, file.mode),
+        [
+            pipeline.apply(file.name, overlay.get(file.name, data))
+            for pipeline, overlay in zip(pipelines, overlays, strict=True)
+        ],
+        origin,
     )
 
 
+def _write_zip_member(
+    zf: ArchiveSet,
+    parameters: Parameters,
+    name: str,
+    data: bytes,
+    mode: int,
+    *,
+    origin: str,
+) -> None:
+    zf.add(_zip_info(parameters, name, mode), data, origin)
+
+
+def _zip_info(parameters: Parameters, name: str, mode: int) -> zipfile.ZipInfo:
+    # fix directory structure if plugin path is not top level
+    # or if the plugin source directory is not distinctive (src, plugin, etc.)
+    # e.g. plugin/some_dir/metadata.txt => my_plugin/metadata.txt
+    fixed_path = name.replace(parameters.plugin_path, parameters.plugin_zip_directory)
+    info = zipfile.ZipInfo(fixed_path)
+
+    # Using flags as defined in python zipfile module
+    # code : https://github.com/python/cpython/blob/b885b8f4be9c74ef1ce7923dbf055c31e7f47735/Lib/zipfile.py#L545
+    # see https://stackoverflow.com/questions/434641/how-do-i-set-permissions-attributes-on-a-file-in-a-zip-file-using-pythons-zip/53008127#53008127
+    info.external_attr = (mode & 0xFFFF) << 16  # Unix attributes
+    return info
+
+
 def upload_asset_to_github_release(
     parameters: Parameters,
     asset_path: str,
@@ -308,52 +723,22 @@ def upload_asset_to_github_release(
     github_token: str,
     asset_name: str | None = None,
 ):
-    slug = f"{parameters.github_organization_slug}/{parameters.project_slug}"
-    repo = Github(github_token).get_repo(slug)
-    try:
-        logger.debug(
-            f"Getting release on {parameters.github_organization_slug}"
-            f"/{parameters.project_slug}"
-        )
-        gh_release = repo.get_release(id=release_tag)
-        logger.debug(
-            f"Release retrieved from GitHub: {gh_release}, "
-            f"{gh_release.tag_name}, "
-            f"{gh_release.upload_url}"
-        )
-    except GithubException as exc:
-        logger.error(
-            f"Release {release_tag} not found for {slug}",
-            exc_info=GithubReleaseNotFound(exc),
-        )
-        sys.exit(1)
-    try:
-        assert os.path.exists(asset_path)
-        if asset_name:
-            logger.debug(f"Uploading asset: {asset_path} as {asset_name}")
-
-            uploaded_asset = gh_release.upload_asset(
-                path=asset_path, label=asset_name, name=asset_name
-            )
-        else:
-            logger.debug(f"Uploading asset: {asset_path}")
-            uploaded_asset = gh_release.upload_asset(asset_path)
-        logger.info(f"Asset successfully uploaded: {uploaded_asset.url}")
-    except GithubException as exc:
-        logger.error(
-            f"Could not upload asset for release {release_tag} on {slug}. "
-            "Are you sure the user for the given token can upload asset to this repo?",
-            exc_info=GithubReleaseCouldNotUploadAsset(exc),
-        )
-        sys.exit(1)
+    """Upload a single asset, see GithubPublisher to upload several ones."""
+    GithubPublisher(parameters, release_tag, github_token).upload_asset(
+        asset_path, asset_name
+    )
 
 
 def release_is_prerelease(
     parameters: Parameters,
     release_tag: str,
     github_token: str,
+    publisher: GithubPublisher | None = None,
 ) -> bool:
-    """Check the tag name or the GitHub release if the version must be experimental or not."""
+    """
+    Check the tag name or the GitHub release if the version must be experimental or not.
+    The GitHub release is looked up with the publisher if given.
+    """
 
     if parse_tag(release_tag).is_prerelease:
         # The tag itself is a pre-release according to https://semver.org/
@@ -362,37 +747,8 @@ def release_is_prerelease(
     if not github_token:
         return False
 
-    slug = f"{parameters.github_organization_slug}/{parameters.project_slug}"
-
-    try:
-        logger.debug(f"Getting GitHub repository: {slug}")
-        gh_client: Github = Github(login_or_token=github_token)
-        repo: Repository = gh_client.get_repo(slug)
-    except GithubException as exc:
-        logger.error(
-            f"Could not get repository details: {slug}. "
-            "Are you sure the user for the given token can access this repo?",
-            exc_info=exc,
-        )
-        sys.exit(1)
-    try:
-        logger.debug(
-            f"Getting release on {parameters.github_organization_slug}"
-            f"/{parameters.project_slug}"
-        )
-        gh_release = repo.get_release(id=release_tag)
-        logger.debug(
-            f"Release retrieved from GitHub: {gh_release}, "
-            f"{gh_release.tag_name}, "
-            f"{gh_release.upload_url}"
-        )
-    except GithubException as exc:
-        logger.error(
-            f"Release {release_tag} not found. Trace: {exc}",
-            exc_info=GithubReleaseNotFound(),
-        )
-        sys.exit(1)
-    return gh_release.prerelease
+    publisher = publisher or GithubPublisher(parameters, release_tag, github_token)
+    return publisher.is_prerelease
 
 
 def create_plugin_repo(
@@ -456,14 +812,22 @@ def create_plugin_repo(
         download_url = f"{plugin_repo_url}{replace_dict['__PLUGINZIP__']}"
         xml_repo = "./plugins.xml"
     replace_dict["__DOWNLOAD_URL__"] = download_url
-    with importlib_resources.path(
-        "qgispluginci", "plugins.xml.template"
-    ) as xml_template:
+    with (
+        span("plugin repository", "release"),
+        importlib_resources.path(
+            "qgispluginci", "plugins.xml.template"
+        ) as xml_template,
+    ):
         configure_file(xml_template, xml_repo, replace_dict)
     return xml_repo
 
 
-def upload_plugin_to_osgeo_with_token(archive: str, package_name: str, token: str):
+def upload_plugin_to_osgeo_with_token(
+    archive: str,
+    package_name: str,
+    token: str,
+    session: HttpSession | None = None,
+):
     """
     Upload the plugin to QGIS repository using a token and a POST request
 
@@ -475,17 +839,34 @@ def upload_plugin_to_osgeo_with_token(archive: str, package_name: str, token: st
         The name of the package on the QGIS plugins website.
     token
         The token created on https://plugins.qgis.org
+    session
+        The HTTP session of the release, giving the timeouts, retries and deadline
     """
     post_url = f"{QGIS_PLUGINS_REPO_URL}/plugins/api/{package_name}/version/add/"
 
-    headers = {
-        "Authorization": f"Bearer {token}",
-    }
+    # the archive is read from the disk while it is sent
+    with (
+        nullcontext(session) if session else HttpSession() as session,
+        closing(MultipartEncoder({"package": MultipartFile(archive)})) as body,
+    ):
+        body.progress = UploadProgress(
+            f"Upload of {os.path.basename(archive)}", len(body)
+        )
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": body.content_type,
+        }
+
+        def payload() -> dict[str, Any]:
+            # read again from the start when the upload is retried
+            return {"data": body.rewind()}
 
-    with open(archive, "rb") as file:
         try:
             logger.debug(f"Uploading the archive on {post_url}")
-            response = requests.post(post_url, files={"package": file}, headers=headers)
+            with span("osgeo upload", "network", bytes=os.path.getsize(archive)):
+                # only retried if not processed: a version already published
+                # would be refused by the server
+                response = session.post(post_url, headers=headers, payload=payload)
             response.raise_for_status()
             logger.debug(
                 f"Upload to QGIS main repository : response HTTP {response.status_code}"
@@ -511,7 +892,11 @@ def upload_plugin_to_osgeo_with_token(archive: str, package_name: str, token: st
 
 
 def upload_plugin_to_osgeo_xml_rpc(
-    username: str, password: str, archive: str, server_url: str = None
+    username: str,
+    password: str,
+    archive: str,
+    server_url: str = None,
+    session: HttpSession | None = None,
 ):
     """
     Upload the plugin to QGIS repository using the XML RPC endpoint
@@ -526,6 +911,8 @@ def upload_plugin_to_osgeo_xml_rpc(
         The password
     archive
         The plugin archive file path to be uploaded
+    session
+        The HTTP session of the release, giving the timeouts, retries and deadline
     """
     if not server_url:
         server_url = f"{QGIS_PLUGINS_REPO_URL}:443/plugins/RPC2/"
@@ -534,17 +921,24 @@ def upload_plugin_to_osgeo_xml_rpc(
         "utf-8"
     )
 
-    server = xmlrpc.client.ServerProxy(
-        server_url,
-        verbose=(logger.getEffectiveLevel() <= 10),
-        headers=[("Authorization", f"Basic {encoded_auth_string}")],
-    )
+    # the call is marshalled while the archive is read, instead of in memory by ServerProxy
+    body = XmlRpcUploadBody("plugin.upload", archive)
+    body.progress = UploadProgress(f"Upload of {os.path.basename(archive)}", len(body))
 
     try:
         logger.debug(f"Start uploading {archive} to QGIS plugins repository.")
-        with open(archive, "rb") as handle:
-            plugin_id, version_id = server.plugin.upload(
-                xmlrpc.client.Binary(handle.read())
+        with (
+            nullcontext(session) if session else HttpSession() as session,
+            span("osgeo upload", "network", bytes=os.path.getsize(archive)),
+            closing(body),
+        ):
+            transport = SessionTransport(
+                session,
+                scheme=urlsplit(server_url).scheme,
+                headers=[("Authorization", f"Basic {encoded_auth_string}")],
+            )
+            plugin_id, version_id = transport.call(
+                server_url, body, verbose=(logger.getEffectiveLevel() <= 10)
             )
         logger.debug(f"Plugin ID: {plugin_id}")
         logger.debug(f"Version ID: {version_id}")
@@ -569,6 +963,9 @@ def upload_plugin_to_osgeo_xml_rpc(
         )
         logger.error(err_msg)
         sys.exit(2)
+    except requests.exceptions.RequestException as error:
+        logger.error(f"Request error {error}", exc_info=error)
+        sys.exit(2)
 
 
 def release(
@@ -586,8 +983,23 @@ def release(
     plugin_repo_url: str = None,
     disable_submodule_update: bool = False,
     asset_paths: tuple[str] = (),
-):
+    jobs: int = 1,
+    cache_dir: str | None = None,
+    cache_max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    reproducible: bool = False,
+    compression_profile: str | None = None,
+    git_snapshot: GitSnapshot | None = None,
+    raise_min_version: str | None = None,
+    variants: Iterable[str] = (),
+    report_path: str | None = None,
+    http_session: HttpSession | None = None,
+) -> str:
     """
+    Package the plugin and release it, returns the name of the archive.
+
+    The stages which do not depend on each other run concurrently: the Transifex download,
+    the GitHub release lookup, the git snapshot and submodules, the compilation of the
+    resources, and then the uploads once the archive is written.
 
     Parameters
     ----------
@@ -616,11 +1028,36 @@ def release(
         osgeo password to upload the plugin to official QGIS repository
     allow_uncommitted_changes
         If False, uncommitted changes are not allowed before packaging/releasing.
-        If True and some changes are detected, a hard reset on a stash create will be used to revert changes made by qgis-plugin-ci.
+        If True and some changes are detected, they are included in the archive.
+        The working tree is never modified by qgis-plugin-ci.
     disable_submodule_update
         If omitted, a git submodule is updated. If specified, git submodules will not be updated/initialized before packaging.
     asset_paths
         Additional asset to be packaged/released.
+    jobs
+        Number of threads used to compress the archive members. 0 uses the number of CPUs.
+    cache_dir
+        If set, compressed archive members are cached in this directory and reused by later builds.
+    cache_max_size
+        Size cap of the cache in megabytes, the least recently used entries are evicted first.
+    reproducible
+        If True, the archive only depends on the sources: its dates are the commit date
+        (or SOURCE_DATE_EPOCH) and its permissions are normalised.
+    compression_profile
+        The compression profile (`fast`, `default` or `max`).
+        If None, the one of the configuration is used.
+    git_snapshot
+        The git state, if already read (e.g. when packaging several plugins)
+    raise_min_version
+        If set, the qgisMinimumVersion of the metadata is replaced by this version.
+    variants
+        Other archives to create in the same pass, e.g. `experimental` or `qgis-min=3.34`
+        (see ArchiveVariant.from_spec). They are uploaded as assets of the GitHub release.
+    report_path
+        If given, a JSON report of the composition of the archive is written to this path.
+    http_session
+        The HTTP session used for the uploads to the QGIS plugins repository,
+        giving the timeouts, retries and deadline. If None, the default one is used.
     """
 
     if release_version == "latest":
@@ -635,41 +1072,77 @@ def release(
 
     release_tag = release_tag or release_version
 
-    if tx_api_token:
-        tr = Translation(parameters, create_project=False, tx_api_token=tx_api_token)
-        tr.pull()
-        tr.compile_strings()
+    if qgis_token and (osgeo_username or osgeo_password):
+        logger.error("Not possible to have both parameters OSGeo and QGIS token")
+        sys.exit(2)
 
     archive_name = parameters.archive_name(parameters.plugin_path, release_version)
+    try:
+        archive_variants = [
+            ArchiveVariant.from_spec(spec, parameters, release_version)
+            for spec in variants
+        ]
+    except ValueError as exc:
+        logger.error(str(exc), exc_info=exc)
+        sys.exit(1)
 
-    # check if the GitHub release is a regular or pre-release
-    is_prerelease = release_is_prerelease(
-        parameters, release_tag=release_tag, github_token=github_token
+    # a single client and release lookup for the whole run
+    publisher = (
+        GithubPublisher(parameters, release_tag, github_token)
+        if github_token is not None
+        else None
     )
+    repo = git.Repo()
 
-    if is_prerelease:
-        logger.info(f"{release_tag} is a pre-release.")
-    else:
-        logger.info(f"{release_tag} is a regular release.")
-
-    create_archive(
-        parameters,
-        release_version,
-        archive_name,
-        add_translations=bool(tx_api_token),
-        allow_uncommitted_changes=allow_uncommitted_changes,
-        is_prerelease=is_prerelease,
-        disable_submodule_update=disable_submodule_update,
-        asset_paths=asset_paths,
-    )
+    def pull_translations() -> Translation:
+        tr = Translation(parameters, create_project=False, tx_api_token=tx_api_token)
+        with span("transifex pull", "network"):
+            tr.pull()
+        return tr
 
-    if github_token is not None:
-        upload_asset_to_github_release(
+    def lookup_prerelease() -> bool:
+        # check if the GitHub release is a regular or pre-release
+        is_prerelease = release_is_prerelease(
             parameters,
-            asset_path=archive_name,
             release_tag=release_tag,
             github_token=github_token,
+            publisher=publisher,
         )
+        if is_prerelease:
+            logger.info(f"{release_tag} is a pre-release.")
+        else:
+            logger.info(f"{release_tag} is a regular release.")
+        return is_prerelease
+
+    def archive(
+        git_snapshot: GitSnapshot,
+        submodules: list[git.Submodule],
+        resources: list[tuple[str, bytes]],
+        is_prerelease: bool,
+    ) -> None:
+        with span("create archive", "archive", archive=archive_name):
+            write_archive(
+                parameters,
+                PreparedSources(repo, git_snapshot, submodules, resources),
+                release_version,
+                archive_name,
+                add_translations=bool(tx_api_token),
+                is_prerelease=is_prerelease,
+                asset_paths=asset_paths,
+                jobs=jobs,
+                cache_dir=cache_dir,
+                cache_max_size=cache_max_size,
+                reproducible=reproducible,
+                compression_profile=compression_profile,
+                raise_min_version=raise_min_version,
+                variants=archive_variants,
+                report_path=report_path,
+            )
+
+    def upload_github_assets(is_prerelease: bool) -> None:
+        assets = [(archive_name, None)] + [
+            (variant.archive_name, None) for variant in archive_variants
+        ]
         if upload_plugin_repo_github:
             xml_repo = create_plugin_repo(
                 parameters=parameters,
@@ -679,15 +1152,10 @@ def release(
                 archive=archive_name,
                 osgeo_username=osgeo_username,
             )
-            upload_asset_to_github_release(
-                parameters,
-                asset_path=xml_repo,
-                release_tag=release_tag,
-                github_token=github_token,
-                asset_name="plugins.xml",
-            )
+            assets.append((xml_repo, "plugins.xml"))
+        publisher.upload_assets(assets)
 
-    if plugin_repo_url:
+    def create_local_plugin_repo(is_prerelease: bool) -> None:
         xml_repo = create_plugin_repo(
             parameters=parameters,
             release_version=release_version,
@@ -699,22 +1167,84 @@ def release(
         )
         logger.info(f"Local XML repo file created : {xml_repo}")
 
-    if qgis_token and (osgeo_username or osgeo_password):
-        logger.error("Not possible to have both parameters OSGeo and QGIS token")
-        sys.exit(2)
+    def upload_to_osgeo() -> None:
+        if qgis_token is not None:
+            upload_plugin_to_osgeo_with_token(
+                archive=archive_name,
+                package_name=parameters.plugin_zip_directory,
+                token=qgis_token,
+                session=http_session,
+            )
+        else:
+            assert osgeo_password is not None
+            upload_plugin_to_osgeo_xml_rpc(
+                username=osgeo_username,
+                password=osgeo_password,
+                archive=archive_name,
+                server_url=alternative_repo_url,
+                session=http_session,
+            )
 
-    if qgis_token is not None:
-        upload_plugin_to_osgeo_with_token(
-            archive=archive_name,
-            package_name=parameters.plugin_zip_directory,
-            token=qgis_token,
+    # the network waits (Transifex, GitHub) and the local work which does not depend on
+    # them run concurrently, stages are only joined where their results are needed
+    orchestrator = Orchestrator()
+    translated = ()
+    if tx_api_token:
+        orchestrator.add("transifex_pull", pull_translations)
+        orchestrator.add(
+            "translations",
+            lambda transifex_pull: transifex_pull.compile_strings(),
+            requires=["transifex_pull"],
         )
-
-    if osgeo_username is not None:
-        assert osgeo_password is not None
-        upload_plugin_to_osgeo_xml_rpc(
-            username=osgeo_username,
-            password=osgeo_password,
-            archive=archive_name,
-            server_url=alternative_repo_url,
+        translated = ("translations",)
+    orchestrator.add("is_prerelease", lookup_prerelease)
+    # the pulled translations may change tracked files, which are checked and packaged
+    orchestrator.add(
+        "git_snapshot",
+        lambda: (
+            git_snapshot
+            or snapshot_sources(
+                repo, allow_uncommitted_changes, cache_dir, cache_max_size
+            )
+        ),
+        after=["transifex_pull"] if tx_api_token else [],
+    )
+    # after the check of the uncommitted changes, which includes the submodules
+    orchestrator.add(
+        "submodules",
+        lambda: prepare_submodules(
+            repo, parameters.plugin_path, disable_submodule_update
+        ),
+        after=["git_snapshot"],
+    )
+    orchestrator.add(
+        "resources",
+        lambda: prepare_resources(parameters.plugin_path, cache_dir, cache_max_size),
+        # unless they embed the compiled translations
+        after=translated if _resources_use_translations(parameters.plugin_path) else [],
+    )
+    orchestrator.add(
+        "archive",
+        archive,
+        requires=["git_snapshot", "submodules", "resources", "is_prerelease"],
+        after=translated,
+    )
+    if publisher is not None:
+        orchestrator.add(
+            "github_upload",
+            upload_github_assets,
+            requires=["is_prerelease"],
+            after=["archive"],
         )
+    if plugin_repo_url:
+        orchestrator.add(
+            "plugin_repo",
+            create_local_plugin_repo,
+            requires=["is_prerelease"],
+            after=["archive"],
+        )
+    if qgis_token is not None or osgeo_username is not None:
+        orchestrator.add("osgeo_upload", upload_to_osgeo, after=["archive"])
+    orchestrator.run()
+
+    return archive_name
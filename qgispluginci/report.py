@@ -0,0 +1,182 @@
+#! python3  # noqa E265
+
+"""
+Report of the composition of a plugin archive.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import json
+import logging
+import os
+import zipfile
+from collections import defaultdict
+from typing import Any
+
+# package
+from qgispluginci.archive import ArchiveMember
+from qgispluginci.utils import convert_octets
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# number of members and directories listed as the largest ones
+REPORT_TOP = 10
+# depth of the directories members are grouped by, below the plugin directory
+REPORT_DIRECTORY_DEPTH = 2
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class ArchiveReport:
+    """
+    Composition of an archive: every member with its sizes, origin and compression time,
+    the largest members and directories, and the members with a duplicated content.
+    """
+
+    def __init__(
+        self, archive_name: str, members: list[ArchiveMember], top: int = REPORT_TOP
+    ):
+        """
+        Parameters
+        ----------
+        archive_name:
+            The path of the archive
+
+        members:
+            The members written in the archive
+
+        top:
+            The number of members and directories listed as the largest ones
+        """
+        self.archive_name = archive_name
+        self.members = members
+        self.top = top
+
+    @property
+    def largest_members(self) -> list[ArchiveMember]:
+        return sorted(self.members, key=lambda m: m.compress_size, reverse=True)[
+            : self.top
+        ]
+
+    @property
+    def largest_directories(self) -> list[tuple[str, int, int]]:
+        """Directories with the total raw and compressed size of their members."""
+        sizes = defaultdict(lambda: [0, 0])
+        for member in self.members:
+            parts = member.name.split("/")[:-1][:REPORT_DIRECTORY_DEPTH]
+            if not parts:
+                continue
+            directory = "/".join(parts)
+            sizes[directory][0] += member.file_size
+            sizes[directory][1] += member.compress_size
+        directories = sorted(
+            ((name, *size) for name, size in sizes.items()),
+            key=lambda d: d[2],
+            reverse=True,
+        )
+        return directories[: self.top]
+
+    @property
+    def duplicates(self) -> list[list[ArchiveMember]]:
+        """Groups of non-empty members with the same content, i.e. the same CRC-32 and size."""
+        contents = defaultdict(list)
+        for member in self.members:
+            if member.file_size:
+                contents[(member.crc, member.file_size)].append(member)
+        return [group for group in contents.values() if len(group) > 1]
+
+    def to_dict(self) -> dict[str, Any]:
+        origins = defaultdict(lambda: {"count": 0, "file_size": 0, "compress_size": 0})
+        for member in self.members:
+            origins[member.origin]["count"] += 1
+            origins[member.origin]["file_size"] += member.file_size
+            origins[member.origin]["compress_size"] += member.compress_size
+        return {
+            "archive": self.archive_name,
+            "size": os.path.getsize(self.archive_name),
+            "file_size": sum(m.file_size for m in self.members),
+            "compress_size": sum(m.compress_size for m in self.members),
+            "members": [_member_dict(member) for member in self.members],
+            "origins": dict(origins),
+            "largest_members": [member.name for member in self.largest_members],
+            "largest_directories": [
+                {"name": name, "file_size": file_size, "compress_size": compress_size}
+                for name, file_size, compress_size in self.largest_directories
+            ],
+            "duplicates": [
+                [member.name for member in group] for group in self.duplicates
+            ],
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+    def table(self) -> str:
+        """Human readable summary: the largest members and directories, and the duplicates."""
+        name_width = max((len(m.name) for m in self.largest_members), default=4)
+        lines = [
+            f"Largest members of {self.archive_name}:",
+            f"  {'Name':<{name_width}}  {'Origin':<11}  {'Size':>10}  {'Compressed':>10}  {'Ratio':>6}  {'Time':>7}",
+        ]
+        for member in self.largest_members:
+            lines.append(
+                f"  {member.name:<{name_width}}  {member.origin:<11}  "
+                f"{convert_octets(member.file_size):>10}  "
+                f"{convert_octets(member.compress_size):>10}  "
+                f"{_ratio(member.file_size, member.compress_size):>6.1%}  "
+                f"{member.cpu_time:>6.3f}s"
+            )
+        lines.append("Largest directories:")
+        for name, file_size, compress_size in self.largest_directories:
+            lines.append(
+                f"  {name:<{name_width}}  {'':<11}  {convert_octets(file_size):>10}  "
+                f"{convert_octets(compress_size):>10}  "
+                f"{_ratio(file_size, compress_size):>6.1%}"
+            )
+        duplicates = self.duplicates
+        if duplicates:
+            lines.append("Duplicated content:")
+            for group in duplicates:
+                lines.append(
+                    f"  {convert_octets(group[0].file_size)}: "
+                    + ", ".join(member.name for member in group)
+                )
+        return "\n".join(lines)
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _ratio(file_size: int, compress_size: int) -> float:
+    """Compressed size relative to the raw size."""
+    return compress_size / file_size if file_size else 1.0
+
+
+def _member_dict(member: ArchiveMember) -> dict[str, Any]:
+    return {
+        "name": member.name,
+        "origin": member.origin,
+        "file_size": member.file_size,
+        "compress_size": member.compress_size,
+        "ratio": round(_ratio(member.file_size, member.compress_size), 4),
+        "compression": "stored"
+        if member.compress_type == zipfile.ZIP_STORED
+        else "deflated",
+        "crc": f"{member.crc:08x}",
+        "cpu_time": round(member.cpu_time, 6),
+    }
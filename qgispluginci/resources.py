@@ -0,0 +1,123 @@
+#! python3  # noqa E265
+
+"""
+Qt resources compilation.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import hashlib
+import logging
+import stat
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import version
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# 3rd party
+import pyqt5ac
+
+# package
+from qgispluginci.cache import FileCache
+from qgispluginci.tracing import span
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# permissions of the compiled modules in the archive
+RESOURCE_FILE_MODE = stat.S_IFREG | 0o644
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def compile_resources(
+    plugin_path: str, cache: FileCache | None = None, workers: int = 4
+) -> list[tuple[str, bytes]]:
+    """
+    Compile the *.qrc files at the top of the plugin directory, concurrently.
+    Returns the name and the content of the *_rc.py modules, sorted by name.
+    Nothing is written in the plugin directory.
+    """
+    qrc_files = sorted(Path(plugin_path).glob("*.qrc"))
+    if not qrc_files:
+        return []
+    with (
+        span("resources", "resources", files=len(qrc_files)),
+        ThreadPoolExecutor(max_workers=max(1, min(workers, len(qrc_files)))) as pool,
+    ):
+        compiled = pool.map(lambda qrc: compile_resource(qrc, cache), qrc_files)
+        resources = [
+            (f"{plugin_path}/{qrc.stem}_rc.py", content)
+            for qrc, content in zip(qrc_files, compiled, strict=True)
+            if content is not None
+        ]
+    return sorted(resources)
+
+
+def compile_resource(qrc_file: Path, cache: FileCache | None = None) -> bytes | None:
+    """
+    Compile a *.qrc file with pyrcc5 and return the module content.
+    If a cache is given, the module is reused as long as neither the *.qrc file
+    nor any of the files it lists has changed.
+    """
+    key = resource_key(qrc_file) if cache is not None else None
+    if key is not None:
+        content = cache.get(key)
+        if content is not None:
+            logger.debug(f"Resource {qrc_file} is up to date in the cache")
+            return content
+
+    with (
+        span(f"pyqt5ac {qrc_file.name}", "resources") as stage,
+        TemporaryDirectory() as output_dir,
+    ):
+        pyqt5ac.main(
+            ioPaths=[[str(qrc_file), f"{output_dir}/%%FILENAME%%_rc.py"]],
+            force=True,
+            initPackage=False,
+        )
+        output = Path(output_dir) / f"{qrc_file.stem}_rc.py"
+        if not output.is_file():
+            logger.warning(f"Resource {qrc_file} could not be compiled.")
+            return None
+        content = output.read_bytes()
+        stage.add("bytes", len(content))
+
+    if key is not None:
+        cache.put(key, content)
+    return content
+
+
+def resource_key(qrc_file: Path) -> str:
+    """Hash of a *.qrc file, of all the files it lists and of the compiler version."""
+    digest = hashlib.sha256(f"pyrcc5:{version('PyQt5')}:".encode())
+    digest.update(qrc_file.read_bytes())
+    for file in sorted(resource_files(qrc_file)):
+        digest.update(f"\0{file.relative_to(qrc_file.parent).as_posix()}\0".encode())
+        digest.update(file.read_bytes() if file.is_file() else b"\0missing")
+    return digest.hexdigest()
+
+
+def resource_files(qrc_file: Path) -> set[Path]:
+    """Files listed in a *.qrc file, relative to its directory."""
+    try:
+        root = ET.parse(qrc_file).getroot()
+    except ET.ParseError as exc:
+        logger.warning(f"Could not parse {qrc_file}: {exc}")
+        return set()
+    return {
+        qrc_file.parent / element.text.strip()
+        for element in root.iter("file")
+        if element.text and element.text.strip()
+    }
@@ -0,0 +1,311 @@
+#! python3  # noqa E265
+
+"""
+Request bodies streamed from the disk (multipart and XML-RPC), so that uploading an archive
+does not load it in memory, and the logging of the progress of an upload.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import base64
+import logging
+import math
+import mimetypes
+import os
+import time
+import uuid
+import xmlrpc.client
+from collections.abc import Iterator
+from typing import BinaryIO, NamedTuple
+
+# package
+from qgispluginci.utils import convert_octets
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# bytes read from the disk at once
+CHUNK_SIZE = 1024 * 1024
+# bytes encoded per line of base64 (76 characters, as xmlrpc.client does)
+BASE64_LINE = 57
+# seconds between two logs of the progress of an upload
+PROGRESS_INTERVAL = 5.0
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class UploadProgress:
+    """Log the bytes sent and the throughput of an upload, every PROGRESS_INTERVAL."""
+
+    def __init__(self, label: str, total: int, interval: float = PROGRESS_INTERVAL):
+        """
+        Parameters
+        ----------
+        label:
+            What is uploaded, for the logs
+
+        total:
+            Size of the upload in bytes
+
+        interval:
+            Seconds between two logs
+        """
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.sent = 0
+        self._start = self._last = time.monotonic()
+
+    def restart(self) -> None:
+        """The upload starts again from the beginning, e.g. for a retry."""
+        if self.sent:
+            logger.info(f"{self.label}: restarting the upload")
+        self.sent = 0
+        self._start = self._last = time.monotonic()
+
+    def update(self, count: int) -> None:
+        self.sent += count
+        now = time.monotonic()
+        if self.sent >= self.total or now - self._last >= self.interval:
+            self._last = now
+            logger.info(self.status(now))
+
+    def status(self, now: float | None = None) -> str:
+        elapsed = (now or time.monotonic()) - self._start
+        rate = self.sent / elapsed if elapsed > 0 else 0
+        percent = self.sent / self.total if self.total else 1.0
+        return (
+            f"{self.label}: {convert_octets(self.sent)} / {convert_octets(self.total)} "
+            f"({percent:.0%}) in {elapsed:.1f}s, {convert_octets(int(rate))}/s"
+        )
+
+
+class MultipartFile(NamedTuple):
+    """A file field of a multipart body, read from the disk when the body is sent."""
+
+    path: str
+    filename: str | None = None
+    content_type: str | None = None
+
+
+class StreamedBody:
+    """
+    A request body made of bytes and files, the files being read in chunks while it is sent.
+
+    requests sends it with a Content-Length (see `__len__`) and reads it piece by piece,
+    instead of building the whole body in memory.
+    The body can be sent again from the start after `rewind`.
+    """
+
+    def __init__(
+        self,
+        parts: list["bytes | _FilePart"],
+        progress: UploadProgress | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        parts:
+            The content of the body, in order
+
+        progress:
+            If given, updated with the bytes read
+        """
+        self.progress = progress
+        self._parts = parts
+        self._length = sum(
+            part.size if isinstance(part, _FilePart) else len(part) for part in parts
+        )
+        # position in the body: the part, and the offset in it
+        # (or in the last chunk read from the file)
+        self._index = 0
+        self._offset = 0
+        self._file: BinaryIO | None = None
+        self._pending = b""
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        while chunk := self.read(CHUNK_SIZE):
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes of the body, all the rest if negative."""
+        chunks = []
+        remaining = size if size is not None and size >= 0 else self._length
+        while remaining > 0 and self._index < len(self._parts):
+            chunk = self._read_part(remaining)
+            if not chunk:
+                self._next_part()
+                continue
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        data = b"".join(chunks)
+        if self.progress is not None and data:
+            self.progress.update(len(data))
+        return data
+
+    def rewind(self) -> "StreamedBody":
+        """Start reading the body from the beginning again."""
+        self.close()
+        self._index = 0
+        self._offset = 0
+        if self.progress is not None:
+            self.progress.restart()
+        return self
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._pending = b""
+
+    def _read_part(self, size: int) -> bytes:
+        part = self._parts[self._index]
+        if isinstance(part, _FilePart):
+            if self._offset >= len(self._pending):
+                if self._file is None:
+                    self._file = open(part.path, "rb")
+                self._pending = part.encode(self._file.read(part.chunk_size))
+                self._offset = 0
+            data = self._pending
+        else:
+            data = part
+        chunk = data[self._offset : self._offset + size]
+        self._offset += len(chunk)
+        return chunk
+
+    def _next_part(self) -> None:
+        self.close()
+        self._index += 1
+        self._offset = 0
+
+
+class MultipartEncoder(StreamedBody):
+    """A multipart/form-data body, the files being read from the disk while it is sent."""
+
+    def __init__(
+        self,
+        fields: dict[str, str | bytes | MultipartFile],
+        progress: UploadProgress | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        fields:
+            The value of each field: a string, bytes or a file to read from the disk
+
+        progress:
+            If given, updated with the bytes read
+        """
+        self.boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.extend(self._field(name, value))
+        parts.append(f"--{self.boundary}--\r\n".encode())
+        super().__init__(parts, progress)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _field(
+        self, name: str, value: str | bytes | MultipartFile
+    ) -> list["bytes | _FilePart"]:
+        disposition = f'form-data; name="{_quote(name)}"'
+        headers = ""
+        if isinstance(value, MultipartFile):
+            filename = value.filename or os.path.basename(value.path)
+            disposition += f'; filename="{_quote(filename)}"'
+            content_type = (
+                value.content_type
+                or mimetypes.guess_type(filename)[0]
+                or "application/octet-stream"
+            )
+            headers = f"Content-Type: {content_type}\r\n"
+            value = _FilePart(value.path)
+        elif isinstance(value, str):
+            value = value.encode()
+        head = (
+            f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n{headers}\r\n"
+        ).encode()
+        return [head, value, b"\r\n"]
+
+
+class XmlRpcUploadBody(StreamedBody):
+    """
+    The XML-RPC call of a method taking a file as its only (binary) argument,
+    base64 encoded while it is read from the disk.
+
+    The body is the same as the one marshalled by xmlrpc.client from the whole file.
+    """
+
+    def __init__(
+        self, method_name: str, path: str, progress: UploadProgress | None = None
+    ):
+        """
+        Parameters
+        ----------
+        method_name:
+            The remote method, e.g. plugin.upload
+
+        path:
+            The file sent as argument
+
+        progress:
+            If given, updated with the bytes read
+        """
+        # the call with an empty file, split where the base64 content goes
+        empty_call = xmlrpc.client.dumps((xmlrpc.client.Binary(b""),), method_name)
+        head, tail = empty_call.split("<base64>\n", 1)
+        super().__init__(
+            [
+                f"{head}<base64>\n".encode(),
+                _FilePart(path, base64=True),
+                tail.encode(),
+            ],
+            progress,
+        )
+
+
+class _FilePart(NamedTuple):
+    path: str
+    base64: bool = False
+
+    @property
+    def chunk_size(self) -> int:
+        # base64 lines encode 57 bytes, full lines are encoded as when encoding the whole file
+        return CHUNK_SIZE // BASE64_LINE * BASE64_LINE if self.base64 else CHUNK_SIZE
+
+    @property
+    def size(self) -> int:
+        """Size of the file once encoded."""
+        size = os.path.getsize(self.path)
+        if not self.base64:
+            return size
+        # 4 characters per 3 bytes, and a newline ending each line
+        return 4 * math.ceil(size / 3) + math.ceil(size / BASE64_LINE)
+
+    def encode(self, data: bytes) -> bytes:
+        return base64.encodebytes(data) if self.base64 else data
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def _quote(value: str) -> str:
+    """Escape a parameter of a Content-Disposition header, as browsers do."""
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r\n", "%0D%0A")
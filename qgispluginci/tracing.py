@@ -0,0 +1,211 @@
+#! python3  # noqa E265
+
+"""
+Timing of the stages of a release, written in the Chrome trace event format
+(to be opened in https://ui.perfetto.dev or chrome://tracing),
+and optionally their peak memory.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Any
+
+# package
+from qgispluginci.memory import TOP_ALLOCATIONS_EVENT, MemoryProfiler, memory_report
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+logger = logging.getLogger(__name__)
+
+# the tracer recording the spans, shared by all the threads; None when not tracing
+_active_tracer: "Tracer | None" = None
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class Span:
+    """A traced stage, its args (e.g. byte counts) are shown along its duration."""
+
+    def __init__(self, name: str, category: str, args: dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def add(self, key: str, value: int = 1) -> None:
+        """Increment a counter of the span."""
+        self.args[key] = self.args.get(key, 0) + value
+
+
+class Tracer:
+    """
+    Record spans as complete events ("X") of the Chrome trace event format, from any thread.
+
+    Timestamps are read from the monotonic clock, which is shared by the processes
+    of the machine: events recorded by other processes can be merged with `extend`.
+    With a memory profiler, spans also get their peak memory in their args.
+    """
+
+    def __init__(self, memory: MemoryProfiler | None = None):
+        self.events: list[dict[str, Any]] = []
+        self.memory = memory
+        self._threads = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = "release", **args: Any) -> Iterator[Span]:
+        span = Span(name, category, args)
+        token = self.memory.enter() if self.memory is not None else None
+        start = time.perf_counter_ns()
+        try:
+            yield span
+        finally:
+            end = time.perf_counter_ns()
+            if self.memory is not None:
+                span.args.update(self.memory.exit(token))
+            self.record(span, start, end)
+
+    def record(self, span: Span, start: int, end: int) -> None:
+        """Record a span which started and ended at these perf_counter_ns times."""
+        self._append(
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "args": span.args,
+            }
+        )
+
+    def start_memory_profiling(self) -> None:
+        if self.memory is not None:
+            self.memory.start()
+
+    def stop_memory_profiling(self) -> None:
+        """Stop profiling, the top allocation sites are recorded as an instant event."""
+        if self.memory is None:
+            return
+        self.memory.stop()
+        self._append(
+            {
+                "name": TOP_ALLOCATIONS_EVENT,
+                "cat": "memory",
+                "ph": "i",
+                "s": "p",
+                "ts": time.perf_counter_ns() / 1000,
+                "args": self.memory.top_allocations(),
+            }
+        )
+
+    def _append(self, event: dict[str, Any]) -> None:
+        pid = os.getpid()
+        thread = threading.current_thread()
+        event.update(pid=pid, tid=thread.ident)
+        with self._lock:
+            if (pid, thread.ident) not in self._threads:
+                self._threads.add((pid, thread.ident))
+                self.events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": pid,
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self.events.append(event)
+
+    def extend(self, events: list[dict[str, Any]]) -> None:
+        """Add the events recorded by another tracer, e.g. in a worker process."""
+        with self._lock:
+            self.events.extend(events)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            events = sorted(self.events, key=lambda e: (e["ph"] != "M", e.get("ts", 0)))
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+            f.write("\n")
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def active_tracer() -> Tracer | None:
+    return _active_tracer
+
+
+@contextmanager
+def traced(tracer: Tracer | None) -> Iterator[Tracer | None]:
+    """Record the spans run in the block, by any thread, with this tracer (if not None)."""
+    global _active_tracer
+    if tracer is None:
+        yield None
+        return
+    previous = _active_tracer
+    _active_tracer = tracer
+    try:
+        yield tracer
+    finally:
+        _active_tracer = previous
+
+
+@contextmanager
+def tracing(path: str | None, profile_memory: bool = False) -> Iterator[Tracer | None]:
+    """
+    Trace the block and write the trace to this path, even if the block fails.
+    If profile_memory is True, the peak memory of each span is recorded
+    and a report is printed at the end, with the top allocation sites.
+    Nothing is traced if there is no path and memory is not profiled.
+    """
+    if not path and not profile_memory:
+        yield None
+        return
+    tracer = Tracer(MemoryProfiler() if profile_memory else None)
+    tracer.start_memory_profiling()
+    try:
+        with traced(tracer):
+            yield tracer
+    finally:
+        tracer.stop_memory_profiling()
+        if path:
+            tracer.write_json(path)
+            logger.info(f"Trace written to {path}")
+        if profile_memory:
+            print(memory_report(tracer.to_dict()["traceEvents"]))  # noqa: T201
+
+
+def span(
+    name: str, category: str = "release", **args: Any
+) -> AbstractContextManager[Span]:
+    """
+    Time a stage, if tracing. The span can be given counters while it runs:
+
+        with span("git tree", "git") as stage:
+            stage.add("bytes", len(data))
+    """
+    tracer = _active_tracer
+    if tracer is None:
+        return nullcontext(Span(name, category, args))
+    return tracer.span(name, category, **args)
@@ -8,6 +8,7 @@ from qgispluginci.exceptions import (
     TranslationFailed,
 )
 from qgispluginci.parameters import Parameters
+from qgispluginci.tracing import span
 from qgispluginci.translation_clients.baseclient import TranslationConfig
 from qgispluginci.translation_clients.transifex import TransifexClient
 from qgispluginci.utils import touch_file
@@ -117,7 +118,8 @@ class Translation:
         cmd = [self.parameters.lrelease_path]
         for file in glob.glob(f"{self.parameters.plugin_path}/i18n/*.ts"):
             cmd.append(file)
-        output = subprocess.run(cmd, capture_output=True, text=True)
+        with span("lrelease", "translation", files=len(cmd) - 1):
+            output = subprocess.run(cmd, capture_output=True, text=True)
         if output.returncode != 0:
             logger.error(
                 f"Translation failed: {output.stderr}", exc_info=TranslationFailed()
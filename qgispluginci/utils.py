@@ -1,6 +1,7 @@
 #! python3
 
 # standard library
+import hashlib
 import logging
 import os
 import re
@@ -58,6 +59,15 @@ def convert_octets(octets: int) -> str:
     return f"{s} {size_name[i]}"
 
 
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hexadecimal SHA256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def touch_file(path: str, update_time: bool = False, create_dir: bool = True):
     basedir = os.path.dirname(path)
     if create_dir and not os.path.exists(basedir):
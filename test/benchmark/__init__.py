@@ -0,0 +1,3 @@
+"""
+Benchmarks of qgis-plugin-ci on generated repositories, run with `python -m test.benchmark`.
+"""
@@ -0,0 +1,141 @@
+#! python3  # noqa E265
+
+"""
+Run the benchmarks on a generated repository and print their throughput.
+
+    python -m test.benchmark --files 2000 --max-size 1048576 --submodules 4
+
+Store the results as a baseline, and check a later run against it:
+
+    python -m test.benchmark --json baseline.json
+    python -m test.benchmark --compare baseline.json
+"""
+
+# standard library
+import argparse
+import logging
+import sys
+
+# benchmark
+from test.benchmark.baseline import (
+    DEFAULT_TOLERANCES,
+    compare,
+    format_comparisons,
+    load_baseline,
+    save_baseline,
+)
+from test.benchmark.benchmarks import BENCHMARKS, BenchmarkResult, run_benchmarks
+from test.benchmark.generator import RepositorySpec
+
+
+def main(argv: list[str] | None = None) -> int:
+    defaults = RepositorySpec()
+    parser = argparse.ArgumentParser(
+        prog="python -m test.benchmark",
+        description="Benchmark qgis-plugin-ci on a generated repository.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    for field, value in defaults._asdict().items():
+        parser.add_argument(
+            f"--{field.replace('_', '-')}", type=type(value), default=value
+        )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs of each benchmark, the best is kept"
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=list(BENCHMARKS),
+        help="Only run this benchmark, can be specified multiple times",
+    )
+    parser.add_argument(
+        "--json", help="Write the results to this JSON file, e.g. to use as a baseline"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="Compare the results to a baseline written with --json, on a repository of "
+        "the same size, and exit with 1 if a benchmark regressed",
+    )
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCES["duration"],
+        help="Relative increase of the wall time allowed",
+    )
+    parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCES["peak_rss"],
+        help="Relative increase of the peak memory allowed",
+    )
+    parser.add_argument(
+        "--written-tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCES["written"],
+        help="Relative increase of the bytes written allowed",
+    )
+    args = parser.parse_args(argv)
+
+    # the test package logs everything
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.compare:
+        # the repository of the baseline is generated again
+        spec, baseline = load_baseline(args.compare)
+    else:
+        spec = RepositorySpec(
+            **{field: getattr(args, field) for field in defaults._fields}
+        )
+    results = run_benchmarks(spec, repeat=args.repeat, names=args.benchmark)
+    print(format_results(results))  # noqa: T201
+    if args.json:
+        save_baseline(args.json, spec, results)
+
+    if not args.compare:
+        return 0
+    comparisons = compare(
+        baseline,
+        results,
+        tolerances={
+            "duration": args.time_tolerance,
+            "peak_rss": args.memory_tolerance,
+            "written": args.written_tolerance,
+        },
+    )
+    print(f"\nCompared to {args.compare}:")  # noqa: T201
+    print(format_comparisons(comparisons))  # noqa: T201
+    regressions = [c for c in comparisons if c.regression]
+    if regressions:
+        print(  # noqa: T201
+            f"\n{len(regressions)} regression(s): "
+            + ", ".join(f"{c.benchmark} {c.metric}" for c in regressions)
+        )
+        return 1
+    return 0
+
+
+def format_results(results: list[BenchmarkResult]) -> str:
+    lines = [
+        f"{'Benchmark':<20}  {'Time':>9}  {'Files':>7}  {'MB':>8}  {'Files/s':>9}  "
+        f"{'MB/s':>8}  {'Written':>9}  {'Peak RSS':>9}"
+    ]
+    for result in results:
+        if result.skipped:
+            lines.append(f"{result.name:<20}  skipped: {result.skipped}")
+            continue
+        peak_rss = (
+            f"{result.peak_rss / 1024 / 1024:.1f} MB"
+            if result.peak_rss is not None
+            else "-"
+        )
+        lines.append(
+            f"{result.name:<20}  {result.duration:>8.3f}s  {result.files:>7}  "
+            f"{result.bytes / 1024 / 1024:>8.2f}  {result.files_per_second:>9.0f}  "
+            f"{result.mb_per_second:>8.1f}  {result.written / 1024 / 1024:>6.2f} MB  "
+            f"{peak_rss:>9}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#! python3  # noqa E265
+
+"""
+Benchmark results stored as a baseline, and the comparison of later runs against it.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import json
+from typing import Any, NamedTuple
+
+# benchmark
+from test.benchmark.benchmarks import BenchmarkResult
+from test.benchmark.generator import RepositorySpec
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+# relative increase allowed by default, per metric
+DEFAULT_TOLERANCES = {"duration": 0.2, "peak_rss": 0.1, "written": 0.02}
+# differences below these are noise whatever their relative value (seconds, bytes)
+MIN_DIFFERENCES = {"duration": 0.02, "peak_rss": 4 * 1024 * 1024, "written": 1024}
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class Comparison(NamedTuple):
+    benchmark: str
+    metric: str
+    baseline: float
+    current: float
+    tolerance: float
+
+    @property
+    def change(self) -> float:
+        """Relative change from the baseline."""
+        if not self.baseline:
+            return 0.0 if not self.current else float("inf")
+        return self.current / self.baseline - 1
+
+    @property
+    def regression(self) -> bool:
+        return (
+            self.change > self.tolerance
+            and self.current - self.baseline > MIN_DIFFERENCES[self.metric]
+        )
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def save_baseline(
+    path: str, spec: RepositorySpec, results: list[BenchmarkResult]
+) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "spec": spec._asdict(),
+                "results": [result._asdict() for result in results],
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def load_baseline(path: str) -> tuple[RepositorySpec, list[BenchmarkResult]]:
+    with open(path, encoding="utf-8") as f:
+        baseline: dict[str, Any] = json.load(f)
+    return (
+        RepositorySpec(**baseline["spec"]),
+        [BenchmarkResult(**result) for result in baseline["results"]],
+    )
+
+
+def compare(
+    baseline: list[BenchmarkResult],
+    results: list[BenchmarkResult],
+    tolerances: dict[str, float] | None = None,
+) -> list[Comparison]:
+    """
+    Compare the metrics of the benchmarks run in both, skipped ones are ignored.
+    The tolerances are the relative increases allowed per metric (see DEFAULT_TOLERANCES).
+    """
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    baseline_results = {result.name: result for result in baseline}
+    comparisons = []
+    for result in results:
+        reference = baseline_results.get(result.name)
+        if reference is None or reference.skipped or result.skipped:
+            continue
+        for metric, tolerance in tolerances.items():
+            reference_value = getattr(reference, metric)
+            value = getattr(result, metric)
+            if reference_value is None or value is None:
+                continue
+            comparisons.append(
+                Comparison(result.name, metric, reference_value, value, tolerance)
+            )
+    return comparisons
+
+
+def format_comparisons(comparisons: list[Comparison]) -> str:
+    lines = [
+        f"{'Benchmark':<20}  {'Metric':<9}  {'Baseline':>12}  {'Current':>12}  "
+        f"{'Change':>8}  {'Allowed':>8}"
+    ]
+    for comparison in comparisons:
+        lines.append(
+            f"{comparison.benchmark:<20}  {comparison.metric:<9}  "
+            f"{_format_value(comparison.metric, comparison.baseline):>12}  "
+            f"{_format_value(comparison.metric, comparison.current):>12}  "
+            f"{comparison.change:>+8.1%}  {comparison.tolerance:>+8.0%}"
+            + ("  REGRESSION" if comparison.regression else "")
+        )
+    return "\n".join(lines)
+
+
+def _format_value(metric: str, value: float) -> str:
+    if metric == "duration":
+        return f"{value:.3f}s"
+    return f"{value / 1024 / 1024:.2f} MB"
@@ -0,0 +1,233 @@
+#! python3  # noqa E265
+
+"""
+Benchmarks of the hot paths of qgis-plugin-ci, run in a generated repository.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import NamedTuple
+from unittest import mock
+from zipfile import ZipFile
+
+# project
+from qgispluginci.changelog import ChangelogParser
+from qgispluginci.parameters import Parameters
+from qgispluginci.release import create_archive, create_plugin_repo
+from qgispluginci.translation import Translation
+
+# benchmark
+from test.benchmark.generator import RepositorySpec, generate_repository
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+RELEASE_VERSION = "1.0.0"
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    # best wall time of the runs, in seconds
+    duration: float
+    # input processed by a run
+    files: int
+    bytes: int
+    # output written by a run
+    written: int = 0
+    # peak resident memory of the process running the benchmark, in bytes
+    peak_rss: int | None = None
+    # e.g. a missing tool
+    skipped: str | None = None
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.duration if self.duration else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / self.duration / 1024 / 1024 if self.duration else 0.0
+
+
+class Workload(NamedTuple):
+    """What a benchmark processes (files and bytes) and the bytes it writes."""
+
+    files: int
+    bytes: int
+    written: int = 0
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def run_benchmarks(
+    spec: RepositorySpec, repeat: int = 3, names: list[str] | None = None
+) -> list[BenchmarkResult]:
+    """
+    Generate a repository and run the benchmarks (all of them if names is None) in it.
+    Each benchmark runs in a new process, so that its peak memory is its own.
+    """
+    results = []
+    with TemporaryDirectory() as workspace:
+        repository = generate_repository(Path(workspace), spec)
+        for name in BENCHMARKS:
+            if names is not None and name not in names:
+                continue
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results.append(
+                    executor.submit(_run_isolated, repository, name, repeat).result()
+                )
+    return results
+
+
+def bench_parameters(parameters: Parameters) -> Workload:
+    Parameters.make_from(path_to_config_file=Path(".qgis-plugin-ci"))
+    return _workload([".qgis-plugin-ci", f"{parameters.plugin_path}/metadata.txt"])
+
+
+def bench_changelog(parameters: Parameters) -> Workload:
+    parser = ChangelogParser(changelog_path=parameters.changelog_path)
+    parser.latest_version()
+    parser.last_items(parameters.changelog_number_of_entries)
+    return _workload([parameters.changelog_path])
+
+
+def bench_create_archive(parameters: Parameters) -> Workload:
+    archive_name = parameters.archive_name(parameters.plugin_path, RELEASE_VERSION)
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_archive(parameters, RELEASE_VERSION, archive_name, jobs=0)
+    with ZipFile(archive_name) as zf:
+        infos = zf.infolist()
+    workload = Workload(
+        len(infos),
+        sum(info.file_size for info in infos),
+        os.path.getsize(archive_name),
+    )
+    os.remove(archive_name)
+    return workload
+
+
+def bench_create_plugin_repo(parameters: Parameters) -> Workload:
+    xml_repo = create_plugin_repo(
+        parameters,
+        RELEASE_VERSION,
+        RELEASE_VERSION,
+        archive=parameters.archive_name(parameters.plugin_path, RELEASE_VERSION),
+        osgeo_username=None,
+    )
+    workload = Workload(0, 0, os.path.getsize(xml_repo))
+    os.remove(xml_repo)
+    return workload
+
+
+def bench_compile_strings(parameters: Parameters) -> Workload:
+    # the client is only needed to pull and push, do not log in Transifex
+    with mock.patch("qgispluginci.translation.TransifexClient"):
+        translation = Translation(parameters, tx_api_token="", create_project=False)
+    translation.compile_strings()
+    ts_files = sorted(Path(parameters.plugin_path, "i18n").glob("*.ts"))
+    qm_files = sorted(Path(parameters.plugin_path, "i18n").glob("*.qm"))
+    workload = _workload(ts_files)._replace(
+        written=sum(os.path.getsize(file) for file in qm_files)
+    )
+    for qm_file in qm_files:
+        qm_file.unlink()
+    return workload
+
+
+def _workload(files: list[str | Path]) -> Workload:
+    return Workload(len(files), sum(os.path.getsize(file) for file in files))
+
+
+def _peak_rss() -> int | None:
+    """Peak resident memory of the process, in bytes (None if not available)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_isolated(repository: Path, name: str, repeat: int) -> BenchmarkResult:
+    """Run a benchmark in the repository, in a new process."""
+    # the test package logs everything
+    logging.getLogger().setLevel(logging.WARNING)
+    with _working_directory(repository):
+        parameters = Parameters.make_from(path_to_config_file=Path(".qgis-plugin-ci"))
+        return _run(name, BENCHMARKS[name], parameters, repeat)
+
+
+def _skip_reason(name: str, parameters: Parameters) -> str | None:
+    if name == "compile_strings" and not shutil.which(parameters.lrelease_path):
+        return f"{parameters.lrelease_path} not found"
+    return None
+
+
+def _run(
+    name: str,
+    benchmark: Callable[[Parameters], Workload],
+    parameters: Parameters,
+    repeat: int,
+) -> BenchmarkResult:
+    skipped = _skip_reason(name, parameters)
+    if skipped:
+        return BenchmarkResult(name, 0.0, 0, 0, skipped=skipped)
+    durations = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        workload = benchmark(parameters)
+        durations.append(time.perf_counter() - start)
+    return BenchmarkResult(
+        name,
+        min(durations),
+        workload.files,
+        workload.bytes,
+        workload.written,
+        _peak_rss(),
+    )
+
+
+@contextlib.contextmanager
+def _working_directory(path: Path) -> Iterator[None]:
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+BENCHMARKS: dict[str, Callable[[Parameters], Workload]] = {
+    "parameters": bench_parameters,
+    "changelog": bench_changelog,
+    "create_archive": bench_create_archive,
+    "create_plugin_repo": bench_create_plugin_repo,
+    "compile_strings": bench_compile_strings,
+}
@@ -0,0 +1,221 @@
+#! python3  # noqa E265
+
+"""
+Generator of throwaway git repositories holding a synthetic plugin of a configurable size.
+"""
+
+# ############################################################################
+# ########## Libraries #############
+# ##################################
+
+# standard library
+import math
+import random
+from pathlib import Path
+from typing import NamedTuple
+
+# 3rd party
+import git
+
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+PLUGIN_PATH = "bench_plugin"
+
+CONFIGURATION = """plugin_path: {plugin_path}
+github_organization_slug: qgis-plugin-ci
+project_slug: bench-plugin
+transifex_organization: qgis-plugin-ci
+translation_languages: [{languages}]
+create_date: 2020-01-01
+repository_url: https://github.com/qgis-plugin-ci/bench-plugin/
+changelog_number_of_entries: 10
+"""
+
+METADATA = """[general]
+name=Benchmark plugin
+qgisMinimumVersion=3.22
+description=A synthetic plugin to benchmark qgis-plugin-ci
+about=Generated by the benchmark suite of qgis-plugin-ci
+version=dev
+author=QGIS Plugin CI
+email=qgis-plugin-ci@example.org
+changelog=
+tags=benchmark
+tracker=https://github.com/qgis-plugin-ci/bench-plugin/issues
+homepage=https://github.com/qgis-plugin-ci/bench-plugin
+repository=https://github.com/qgis-plugin-ci/bench-plugin
+experimental=False
+icon=icons/icon_0_0.png
+"""
+
+LANGUAGES = ("fr", "de", "it", "es", "pt", "nl", "pl", "ja", "cs", "fi")
+
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class RepositorySpec(NamedTuple):
+    """Size of a generated repository."""
+
+    # files of the plugin, their sizes are log-uniformly distributed
+    files: int = 500
+    min_size: int = 512
+    max_size: int = 256 * 1024
+    # share of files with a random, incompressible, content
+    binary_ratio: float = 0.2
+    directories: int = 20
+    submodules: int = 2
+    submodule_files: int = 50
+    qrc_files: int = 1
+    icons_per_qrc: int = 10
+    # TS files, one per language
+    languages: int = 3
+    strings: int = 200
+    changelog_entries: int = 100
+    seed: int = 42
+
+
+# ############################################################################
+# ########## Functions #############
+# ################################
+
+
+def generate_repository(workspace: Path, spec: RepositorySpec) -> Path:
+    """
+    Generate a git repository with a plugin in `workspace/repository`,
+    its submodules are repositories next to it. Returns the path of the repository.
+    """
+    rng = random.Random(spec.seed)
+    path = workspace / "repository"
+    repo = _init_repo(path)
+    languages = LANGUAGES[: spec.languages]
+
+    (path / ".qgis-plugin-ci").write_text(
+        CONFIGURATION.format(plugin_path=PLUGIN_PATH, languages=", ".join(languages))
+    )
+    (path / "CHANGELOG.md").write_text(_changelog(spec.changelog_entries))
+    plugin = path / PLUGIN_PATH
+    plugin.mkdir()
+    (plugin / "metadata.txt").write_text(METADATA)
+    (plugin / "__init__.py").write_text(
+        "def classFactory(iface):\n    return None\n\n\nDEBUG = True\n"
+    )
+
+    for i in range(spec.files):
+        directory = plugin / f"package_{i % max(1, spec.directories)}"
+        size = _file_size(rng, spec.min_size, spec.max_size)
+        if rng.random() < spec.binary_ratio:
+            _write(directory / f"data_{i}.dat", rng.randbytes(size))
+        else:
+            _write(directory / f"module_{i}.py", _python_source(rng, size))
+
+    for i in range(spec.qrc_files):
+        icons = [f"icons/icon_{i}_{j}.png" for j in range(spec.icons_per_qrc)]
+        for icon in icons:
+            _write(plugin / icon, rng.randbytes(rng.randint(512, 4096)))
+        (plugin / f"resources_{i}.qrc").write_text(
+            '<RCC>\n  <qresource prefix="/plugins/bench_plugin">\n'
+            + "".join(f"    <file>{icon}</file>\n" for icon in icons)
+            + "  </qresource>\n</RCC>\n"
+        )
+
+    for language in languages:
+        _write(
+            plugin / "i18n" / f"bench_plugin_{language}.ts",
+            _ts_file(language, spec.strings).encode(),
+        )
+
+    repo.git.add(".")
+    repo.git.commit("-m", "Generate the plugin")
+
+    for i in range(spec.submodules):
+        sub_path = workspace / f"submodule_{i}"
+        sub_repo = _init_repo(sub_path)
+        for j in range(spec.submodule_files):
+            size = _file_size(rng, spec.min_size, spec.max_size)
+            _write(sub_path / f"lib_{i}" / f"module_{j}.py", _python_source(rng, size))
+        sub_repo.git.add(".")
+        sub_repo.git.commit("-m", "Generate the submodule")
+        sub_repo.close()
+        repo.git.execute(
+            [
+                "git",
+                "-c",
+                "protocol.file.allow=always",
+                "submodule",
+                "add",
+                str(sub_path),
+                f"{PLUGIN_PATH}/libs/submodule_{i}",
+            ]
+        )
+    if spec.submodules:
+        repo.git.commit("-m", "Add the submodules")
+    repo.close()
+    return path
+
+
+def _init_repo(path: Path) -> git.Repo:
+    repo = git.Repo.init(path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Benchmark")
+        config.set_value("user", "email", "benchmark@example.org")
+    return repo
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def _file_size(rng: random.Random, min_size: int, max_size: int) -> int:
+    """A size drawn from a log-uniform distribution: many small files, a few large ones."""
+    return int(math.exp(rng.uniform(math.log(min_size), math.log(max_size))))
+
+
+def _python_source(rng: random.Random, size: int) -> bytes:
+    """Python-like text of about this size, compressible as real sources are."""
+    lines = []
+    length = 0
+    while length < size:
+        n = rng.randrange(1_000_000)
+        line = rng.choice(
+            (
+                f"VALUE_{n} = {n}\n",
+                f"def function_{n}(argument):\n    return argument * {n}\n\n",
+                f"# comment about the value {n}\n",
+                f"message_{n} = self.tr('Message number {n}')\n",
+            )
+        )
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode()[:size]
+
+
+def _changelog(entries: int) -> str:
+    lines = ["# Changelog\n\n## Unreleased\n\n- Not released yet\n\n"]
+    for i in range(entries, 0, -1):
+        lines.append(f"## {i // 100}.{i // 10 % 10}.{i % 10} - 2024/01/01\n\n")
+        lines.extend(f"- Change {j} of the version {i}\n" for j in range(5))
+        lines.append("\n")
+    return "".join(lines)
+
+
+def _ts_file(language: str, strings: int) -> str:
+    messages = "".join(
+        "    <message>\n"
+        f'        <location filename="../module.py" line="{i}"/>\n'
+        f"        <source>Message number {i}</source>\n"
+        f"        <translation>Message {language} {i}</translation>\n"
+        "    </message>\n"
+        for i in range(strings)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE TS>\n'
+        f'<TS version="2.1" language="{language}">\n'
+        f"<context>\n    <name>BenchPlugin</name>\n{messages}</context>\n</TS>\n"
+    )
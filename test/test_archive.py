@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+
+# standard
+import hashlib
+import io
+import os
+import random
+import tracemalloc
+import unittest
+import zipfile
+from functools import partial
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+# Project
+from qgispluginci.archive import ArchiveSet, ArchiveWriter, compress
+from qgispluginci.cache import FileCache
+
+
+def sample_members() -> list[tuple[str, bytes]]:
+    members = [
+        ("plugin/metadata.txt", b"[general]\nname=Plugin\nversion=0.1.2\n"),
+        ("plugin/empty.py", b""),
+        ("plugin/data/random.bin", random.Random(42).randbytes(300_000)),
+    ]
+    for i in range(20):
+        members.append((f"plugin/module_{i}.py", f"VALUE = {i}\n".encode() * 500))
+    return members
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_archive(
+        self, file_name: str, jobs: int, cache: FileCache | None = None
+    ) -> bytes:
+        archive = self.tmp_path / file_name
+        with ArchiveWriter(str(archive), jobs=jobs, cache=cache) as writer:
+            for name, data in sample_members():
+                info = zipfile.ZipInfo(name)
+                info.external_attr = 0o100644 << 16
+                writer.add(info, data)
+        return archive.read_bytes()
+
+    def test_parallel_is_byte_identical(self):
+        serial = self.write_archive("serial.zip", jobs=1)
+        for jobs in (2, 4, 0):
+            with self.subTest(jobs=jobs):
+                self.assertEqual(serial, self.write_archive(f"{jobs}.zip", jobs=jobs))
+
+    def test_same_as_zipfile_writestr(self):
+        archive = self.tmp_path / "writestr.zip"
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, data in sample_members():
+                info = zipfile.ZipInfo(name)
+                info.external_attr = 0o100644 << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                zf.writestr(info, data)
+        self.assertEqual(archive.read_bytes(), self.write_archive("writer.zip", 4))
+
+        with zipfile.ZipFile(self.tmp_path / "writer.zip") as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(
+                dict(sample_members()), {n: zf.read(n) for n in zf.namelist()}
+            )
+
+    def test_unsupported_compression(self):
+        with self.assertRaisesRegex(ValueError, "bzip2"):
+            compress(b"data", zipfile.ZIP_BZIP2)
+
+    @mock.patch("qgispluginci.archive.STREAM_CHUNK_SIZE", 1000)
+    def test_stream(self):
+        reference = self.write_archive("reference.zip", jobs=1)
+        archive = self.tmp_path / "stream.zip"
+        with ArchiveWriter(str(archive), jobs=4) as writer:
+            for i, (name, data) in enumerate(sample_members()):
+                info = zipfile.ZipInfo(name)
+                info.external_attr = 0o100644 << 16
+                if i % 2:
+                    writer.add(info, data)
+                else:
+                    writer.add_stream(info, partial(io.BytesIO, data), len(data))
+        self.assertEqual(reference, archive.read_bytes())
+
+    def test_stream_memory(self):
+        size = 64 * 1024 * 1024
+        large_file = self.tmp_path / "large.bin"
+        with large_file.open("wb") as f:
+            chunk = random.Random(42).randbytes(1024 * 1024)
+            for _ in range(size // len(chunk)):
+                f.write(chunk)
+
+        tracemalloc.start()
+        try:
+            archive = self.tmp_path / "large.zip"
+            with ArchiveWriter(str(archive)) as writer:
+                writer.add_stream(
+                    zipfile.ZipInfo("large.bin"), partial(large_file.open, "rb"), size
+                )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 8 * 1024 * 1024)
+        with zipfile.ZipFile(archive) as zf:
+            self.assertEqual(size, zf.getinfo("large.bin").file_size)
+
+    def test_compression_cache(self):
+        reference = self.write_archive("reference.zip", jobs=1)
+        cache = FileCache(self.tmp_path / "cache")
+        self.assertEqual(reference, self.write_archive("cold.zip", 2, cache))
+        self.assertEqual(0, cache.hits)
+        self.assertGreater(cache.misses, 0)
+
+        misses = cache.misses
+        self.assertEqual(reference, self.write_archive("warm.zip", 2, cache))
+        self.assertEqual(misses, cache.hits)
+
+    @mock.patch("qgispluginci.archive.STREAM_CHUNK_SIZE", 1000)
+    def test_stream_compression_cache(self):
+        reference = self.write_archive("reference.zip", jobs=1)
+        cache = FileCache(self.tmp_path / "cache")
+
+        def write_streamed(file_name: str) -> bytes:
+            archive = self.tmp_path / file_name
+            with ArchiveWriter(str(archive), jobs=2, cache=cache) as writer:
+                for name, data in sample_members():
+                    info = zipfile.ZipInfo(name)
+                    info.external_attr = 0o100644 << 16
+                    key = hashlib.sha1(data).hexdigest()
+                    writer.add_stream(
+                        info, partial(io.BytesIO, data), len(data), key=key
+                    )
+            return archive.read_bytes()
+
+        self.assertEqual(reference, write_streamed("cold.zip"))
+        self.assertEqual(0, cache.hits)
+        misses = cache.misses
+        self.assertEqual(reference, write_streamed("warm.zip"))
+        self.assertEqual(misses, cache.hits)
+
+        # an entry which does not match the stream is compressed again
+        entries = list(cache.path.glob("*/*"))
+        for entry in entries:
+            entry.write_bytes(b"\xff" * 4 + entry.read_bytes()[4:])
+        with self.assertLogs("qgispluginci.archive", level="WARNING"):
+            self.assertEqual(reference, write_streamed("corrupted.zip"))
+        hits = cache.hits
+        self.assertEqual(reference, write_streamed("repaired.zip"))
+        self.assertEqual(hits + misses, cache.hits)
+
+    @mock.patch("qgispluginci.archive.STREAM_CHUNK_SIZE", 1000)
+    def test_stream_archive_set(self):
+        reference = self.write_archive("reference.zip", jobs=1)
+        opened = []
+
+        def open_stream(data: bytes) -> io.BytesIO:
+            opened.append(data)
+            return io.BytesIO(data)
+
+        for cache in (None, FileCache(self.tmp_path / "cache")):
+            with self.subTest(cache=cache is not None):
+                opened.clear()
+                archives = [self.tmp_path / f"{i}.zip" for i in range(3)]
+                writers = [
+                    ArchiveWriter(str(archive), jobs=2, cache=cache if i == 0 else None)
+                    for i, archive in enumerate(archives)
+                ]
+                with ArchiveSet(writers) as archive_set:
+                    for name, data in sample_members():
+                        info = zipfile.ZipInfo(name)
+                        info.external_attr = 0o100644 << 16
+                        key = hashlib.sha1(data).hexdigest()
+                        archive_set.add_stream(
+                            info, partial(open_stream, data), len(data), key=key
+                        )
+                for archive in archives:
+                    self.assertEqual(reference, archive.read_bytes())
+                # each stream is read and compressed once, for all the archives
+                self.assertEqual(len(sample_members()), len(opened))
+                self.assertGreater(writers[0].report.deflated, 0)
+                self.assertFalse(writers[1].report.deflated or writers[1].report.stored)
+
+    def test_cache_eviction(self):
+        cache = FileCache(self.tmp_path / "cache", max_size=1)
+        for i in range(3):
+            cache.put(f"{i:02d}key", bytes(400 * 1024))
+            os.utime(cache.path / f"{i:02d}" / f"{i:02d}key", (i, i))
+        cache.evict()
+        self.assertIsNone(cache.get("00key"))
+        self.assertIsNotNone(cache.get("01key"))
+        self.assertIsNotNone(cache.get("02key"))
+
+    def test_shared_cache_eviction(self):
+        root = self.tmp_path / "cache"
+        caches = [
+            FileCache(root / name, max_size=1, root=root) for name in ("zip", "git")
+        ]
+        for i in range(3):
+            cache = caches[i % 2]
+            cache.put(f"{i:02d}key", bytes(400 * 1024))
+            os.utime(cache.path / f"{i:02d}" / f"{i:02d}key", (i, i))
+        # the cap applies to both caches
+        caches[1].evict()
+        self.assertIsNone(caches[0].get("00key"))
+        self.assertIsNotNone(caches[1].get("01key"))
+        self.assertIsNotNone(caches[0].get("02key"))
+
+    def test_vanished_cache_entry(self):
+        cache = FileCache(self.tmp_path / "cache")
+        cache.put("00key", b"value")
+        # removed by a concurrent eviction while it is read
+        with mock.patch("os.utime", side_effect=FileNotFoundError):
+            self.assertEqual(b"value", cache.get("00key"))
+        # or while listing the entries
+        listed = [cache.path / "01" / "01key", *cache.path.glob("*/*")]
+        with mock.patch.object(Path, "glob", return_value=listed):
+            cache.evict()
+        self.assertEqual(b"value", cache.get("00key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
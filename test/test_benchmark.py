@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+
+# standard
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# Benchmark
+from test.benchmark.__main__ import format_results
+from test.benchmark.baseline import (
+    compare,
+    format_comparisons,
+    load_baseline,
+    save_baseline,
+)
+from test.benchmark.benchmarks import BENCHMARKS, BenchmarkResult, run_benchmarks
+from test.benchmark.generator import RepositorySpec
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmarks(self):
+        spec = RepositorySpec(
+            files=20,
+            max_size=4096,
+            directories=3,
+            submodules=1,
+            submodule_files=5,
+            languages=2,
+            changelog_entries=5,
+        )
+        results = {result.name: result for result in run_benchmarks(spec, repeat=1)}
+        self.assertEqual(list(BENCHMARKS), list(results))
+
+        archive = results["create_archive"]
+        # the files of the plugin and of the submodule, icons, qrc, ts, compiled resources
+        self.assertEqual(20 + 5 + 10 + 1 + 2 + 1 + 2, archive.files)
+        self.assertGreater(archive.bytes, 20 * spec.min_size)
+        self.assertGreater(archive.mb_per_second, 0)
+        self.assertLess(0, archive.written)
+        self.assertLess(archive.written, archive.bytes)
+        self.assertEqual(1, results["changelog"].files)
+        self.assertIn("create_archive", format_results(list(results.values())))
+
+    def test_compare(self):
+        mb = 1024 * 1024
+        baseline = [
+            BenchmarkResult("create_archive", 2.0, 100, 50 * mb, 10 * mb, 100 * mb),
+            BenchmarkResult("changelog", 0.010, 1, 1000, 0, 60 * mb),
+            BenchmarkResult("compile_strings", 0.0, 0, 0, skipped="lrelease not found"),
+        ]
+        results = [
+            # slower and more memory
+            BenchmarkResult("create_archive", 3.0, 100, 50 * mb, 10 * mb, 150 * mb),
+            # twice slower, but by a few milliseconds only
+            BenchmarkResult("changelog", 0.020, 1, 1000, 0, 60 * mb),
+            BenchmarkResult("compile_strings", 1.0, 3, 1000, 500, 60 * mb),
+        ]
+        comparisons = compare(baseline, results, tolerances={"peak_rss": 0.6})
+        self.assertEqual(
+            [("create_archive", "duration")],
+            [(c.benchmark, c.metric) for c in comparisons if c.regression],
+        )
+        self.assertNotIn("compile_strings", [c.benchmark for c in comparisons])
+        self.assertIn("REGRESSION", format_comparisons(comparisons))
+
+        with TemporaryDirectory() as tmp_dir:
+            path = str(Path(tmp_dir) / "baseline.json")
+            save_baseline(path, RepositorySpec(files=10), baseline)
+            self.assertEqual((RepositorySpec(files=10), baseline), load_baseline(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+
+# standard
+import random
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# Project
+from qgispluginci.archive import ArchiveWriter
+from qgispluginci.compression import STORED, CompressionPolicy
+
+
+TEXT = b"".join(f"VALUE_{i} = {i}\n".encode() for i in range(20_000))
+RANDOM = random.Random(42).randbytes(200_000)
+
+
+class TestCompression(unittest.TestCase):
+    def test_policy(self):
+        policy = CompressionPolicy(stored_extensions=[".png", "GPKG"])
+        self.assertEqual(STORED, policy.choose("plugin/icon.PNG", TEXT))
+        self.assertEqual(STORED, policy.choose("plugin/data.gpkg", TEXT))
+        self.assertEqual(STORED, policy.choose("plugin/random.bin", RANDOM))
+        self.assertEqual(
+            (zipfile.ZIP_DEFLATED, -1), policy.choose("plugin/module.py", TEXT)
+        )
+        # small members are not sampled
+        self.assertEqual(
+            zipfile.ZIP_DEFLATED,
+            policy.choose("plugin/small.bin", RANDOM[:1000]).compress_type,
+        )
+
+        no_sampling = CompressionPolicy(profile="max", sample=False)
+        self.assertEqual(
+            (zipfile.ZIP_DEFLATED, 9), no_sampling.choose("plugin/random.bin", RANDOM)
+        )
+
+        with self.assertRaises(ValueError):
+            CompressionPolicy(profile="ultra")
+
+    def test_archive_with_policy(self):
+        members = {
+            "plugin/module.py": TEXT,
+            "plugin/icon.png": TEXT[:5000],
+            "plugin/random.bin": RANDOM,
+        }
+        with TemporaryDirectory() as tmp_dir:
+            sizes = {}
+            for profile in ("fast", "max"):
+                archive = Path(tmp_dir) / f"{profile}.zip"
+                with ArchiveWriter(
+                    str(archive), jobs=2, policy=CompressionPolicy(profile)
+                ) as writer:
+                    for name, data in members.items():
+                        writer.add(zipfile.ZipInfo(name), data)
+                self.assertEqual(1, writer.report.deflated)
+                self.assertEqual(2, writer.report.stored)
+
+                with zipfile.ZipFile(archive) as zf:
+                    self.assertIsNone(zf.testzip())
+                    self.assertEqual(members, {n: zf.read(n) for n in zf.namelist()})
+                    self.assertEqual(
+                        [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED, zipfile.ZIP_STORED],
+                        [info.compress_type for info in zf.infolist()],
+                    )
+                    sizes[profile] = zf.getinfo("plugin/module.py").compress_size
+            self.assertLess(sizes["max"], sizes["fast"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+
+# standard
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+# 3rd party
+import git
+
+# Project
+from qgispluginci.cache import FileCache
+from qgispluginci.git_metadata import (
+    COMMIT_NUMBER_ENV_VAR,
+    SOURCE_DATE_EPOCH_ENV_VAR,
+    GitMetadata,
+)
+
+
+class TestGitMetadata(unittest.TestCase):
+    def setUp(self):
+        self.repo = git.Repo()
+
+    def test_commit_number(self):
+        git_metadata = GitMetadata(self.repo)
+        self.assertEqual(self.repo.head.object.hexsha, git_metadata.commit_sha1)
+        self.assertEqual(
+            len(list(self.repo.iter_commits())), git_metadata.commit_number
+        )
+
+    def test_commit_number_cache(self):
+        with TemporaryDirectory() as cache_dir:
+            cache = FileCache(cache_dir)
+            expected = GitMetadata(self.repo, cache=cache).commit_number
+            if self.repo.git.rev_parse("--is-shallow-repository") == "true":
+                self.skipTest("Commit numbers of shallow clones are not cached")
+            self.assertEqual(
+                expected, GitMetadata(self.repo, cache=cache).commit_number
+            )
+            self.assertEqual(1, cache.hits)
+
+    @mock.patch.dict(os.environ, {COMMIT_NUMBER_ENV_VAR: "1234"})
+    def test_commit_number_from_environment(self):
+        self.assertEqual(1234, GitMetadata(self.repo).commit_number)
+
+    def test_invalid_commit_number_from_environment(self):
+        for value in ("12a", "-1", "1.5"):
+            with (
+                self.subTest(value=value),
+                mock.patch.dict(os.environ, {COMMIT_NUMBER_ENV_VAR: value}),
+                self.assertLogs("qgispluginci.git_metadata", level="ERROR"),
+                self.assertRaises(SystemExit),
+            ):
+                _ = GitMetadata(self.repo).commit_number
+
+    def test_source_date_epoch_from_environment(self):
+        with mock.patch.dict(os.environ, {SOURCE_DATE_EPOCH_ENV_VAR: "1700000000"}):
+            self.assertEqual(1700000000, GitMetadata(self.repo).source_date_epoch)
+        with (
+            mock.patch.dict(os.environ, {SOURCE_DATE_EPOCH_ENV_VAR: "2023-11-14"}),
+            self.assertLogs("qgispluginci.git_metadata", level="ERROR"),
+            self.assertRaises(SystemExit),
+        ):
+            _ = GitMetadata(self.repo).source_date_epoch
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#! /usr/bin/env python
+
+# standard
+import io
+import stat
+import tarfile
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# 3rd party
+import git
+
+# Project
+from qgispluginci.git_tree import LargeBlob, iter_submodules_files, iter_tree_files
+
+
+PLUGIN_PATH = "qgis_plugin_CI_testing"
+
+
+def init_repo(path: Path) -> git.Repo:
+    repo = git.Repo.init(path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Test")
+        config.set_value("user", "email", "test@example.org")
+    return repo
+
+
+class TestGitTree(unittest.TestCase):
+    def setUp(self):
+        self.repo = git.Repo()
+
+    def test_same_as_git_archive(self):
+        archive = io.BytesIO(
+            self.repo.git.archive("HEAD", PLUGIN_PATH, stdout_as_string=False)
+        )
+        with tarfile.open(fileobj=archive, mode="r:") as tt:
+            # same files, with the permissions of a checkout (umask 022)
+            expected = [
+                (
+                    m.name,
+                    stat.S_IFREG | (0o755 if m.mode & 0o111 else 0o644),
+                    tt.extractfile(m).read(),
+                )
+                for m in tt.getmembers()
+                if m.isfile()
+            ]
+        self.assertEqual(
+            expected,
+            [tuple(f) for f in iter_tree_files(self.repo, "HEAD", PLUGIN_PATH)],
+        )
+
+    def test_large_blobs(self):
+        files = list(iter_tree_files(self.repo, "HEAD", PLUGIN_PATH))
+        streamed = list(
+            iter_tree_files(self.repo, "HEAD", PLUGIN_PATH, stream_min_size=1024)
+        )
+        self.assertEqual([f.name for f in files], [f.name for f in streamed])
+        large = [f for f in streamed if isinstance(f.data, LargeBlob)]
+        self.assertTrue(large)
+        for file, streamed_file in zip(files, streamed, strict=True):
+            data = streamed_file.data
+            if isinstance(data, LargeBlob):
+                self.assertGreaterEqual(data.size, 1024)
+                self.assertEqual(len(file.data), data.size)
+                data = data.read()
+            self.assertEqual(file.data, data)
+
+    def test_attributes_of_the_tree(self):
+        with TemporaryDirectory() as tmp_dir:
+            repo = init_repo(Path(tmp_dir))
+            plugin = Path(tmp_dir) / "plugin"
+            plugin.mkdir()
+            for name in ("kept.py", "dev.py", "test.py"):
+                (plugin / name).write_text(name)
+            (Path(tmp_dir) / ".gitattributes").write_text(
+                "plugin/dev.py export-ignore\n"
+            )
+            repo.git.add(".")
+            repo.git.commit("-m", "init")
+            # not committed: ignored by git archive HEAD
+            (Path(tmp_dir) / ".gitattributes").write_text(
+                "plugin/test.py export-ignore\n"
+            )
+
+            names = [f.name for f in iter_tree_files(repo, "HEAD", "plugin")]
+            archive = io.BytesIO(
+                repo.git.archive("HEAD", "plugin", stdout_as_string=False)
+            )
+            with tarfile.open(fileobj=archive, mode="r:") as tt:
+                expected = [m.name for m in tt.getmembers() if m.isfile()]
+            repo.close()
+        self.assertEqual(["plugin/kept.py", "plugin/test.py"], names)
+        self.assertEqual(expected, names)
+
+    def test_conversions(self):
+        with TemporaryDirectory() as tmp_dir:
+            repo = init_repo(Path(tmp_dir))
+            with repo.config_writer() as config:
+                config.set_value('filter "upper"', "smudge", "tr a-z A-Z")
+                config.set_value('filter "upper"', "clean", "cat")
+            plugin = Path(tmp_dir) / "plugin"
+            plugin.mkdir()
+            (plugin / "notes.txt").write_bytes(b"a\nb\n")
+            (plugin / "module.py").write_bytes(b"# $Id$\n")
+            (plugin / "filtered.md").write_bytes(b"lower\n")
+            (plugin / "version.cfg").write_bytes(b"commit=$Format:%H$\n")
+            (plugin / "data.bin").write_bytes(b"a\nb\n")
+            (Path(tmp_dir) / ".gitattributes").write_text(
+                "*.txt eol=crlf\n*.py ident\n*.md filter=upper\n*.cfg export-subst\n"
+            )
+            repo.git.add(".")
+            repo.git.commit("-m", "init")
+
+            files = {f.name: f.data for f in iter_tree_files(repo, "HEAD", "plugin")}
+            archive = io.BytesIO(
+                repo.git.archive("HEAD", "plugin", stdout_as_string=False)
+            )
+            with tarfile.open(fileobj=archive, mode="r:") as tt:
+                expected = {
+                    m.name: tt.extractfile(m).read()
+                    for m in tt.getmembers()
+                    if m.isfile()
+                }
+            commit = repo.head.commit.hexsha
+            repo.close()
+        self.assertEqual(expected, files)
+        self.assertEqual(b"a\r\nb\r\n", files["plugin/notes.txt"])
+        self.assertRegex(files["plugin/module.py"], rb"^# \$Id: [0-9a-f]{40} \$\n$")
+        self.assertEqual(b"LOWER\n", files["plugin/filtered.md"])
+        self.assertEqual(f"commit={commit}\n".encode(), files["plugin/version.cfg"])
+        self.assertEqual(b"a\nb\n", files["plugin/data.bin"])
+
+    def test_submodules(self):
+        with TemporaryDirectory() as tmp_dir:
+            tmp_path = Path(tmp_dir)
+            super_repo = init_repo(tmp_path / "super")
+            for i in range(3):
+                sub_repo = init_repo(tmp_path / f"sub{i}")
+                for j in range(5):
+                    (tmp_path / f"sub{i}" / f"file{j}.py").write_text(f"{i}{j}")
+                sub_repo.git.add(".")
+                sub_repo.git.commit("-m", "init")
+                super_repo.git.execute(
+                    [
+                        "git",
+                        "-c",
+                        "protocol.file.allow=always",
+                        "submodule",
+                        "add",
+                        str(tmp_path / f"sub{i}"),
+                        f"plugin/sub{i}",
+                    ]
+                )
+            super_repo.git.commit("-m", "add submodules")
+
+            files = list(iter_submodules_files(super_repo.submodules, workers=2))
+            self.assertEqual(
+                [f"plugin/sub{i}/file{j}.py" for i in range(3) for j in range(5)],
+                [f.name for f in files],
+            )
+            self.assertEqual(b"24", files[-1].data)
+            super_repo.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
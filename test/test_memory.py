@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+
+# standard
+import contextlib
+import io
+import tracemalloc
+import unittest
+from unittest import mock
+
+# Project
+from qgispluginci.memory import MemoryProfiler, current_rss
+from qgispluginci.tracing import span, tracing
+
+
+SIZE = 20 * 1024 * 1024
+
+
+class TestMemory(unittest.TestCase):
+    def test_profile_memory(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with tracing(None, profile_memory=True) as tracer:
+                with span("outer"):
+                    with span("inner"):
+                        data = bytearray(SIZE)
+                        del data
+                    with span("small"):
+                        data = bytearray(1024)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        events = tracer.to_dict()["traceEvents"]
+        spans = {e["name"]: e["args"] for e in events if e["ph"] == "X"}
+        self.assertGreaterEqual(spans["inner"]["peak_traced"], SIZE)
+        self.assertGreaterEqual(spans["outer"]["peak_traced"], SIZE)
+        self.assertLess(spans["small"]["peak_traced"], SIZE)
+        if current_rss() is not None:
+            self.assertGreater(spans["inner"]["peak_rss"], 0)
+
+        (allocations,) = [e["args"] for e in events if e["name"] == "top allocations"]
+        self.assertTrue(any(__file__ in site for site in allocations))
+        report = output.getvalue()
+        self.assertIn("Peak Python", report)
+        self.assertIn("Top allocation sites", report)
+
+    def test_snapshot_throttling(self):
+        profiler = MemoryProfiler()
+        profiler.start()
+        try:
+            with mock.patch(
+                "tracemalloc.take_snapshot", wraps=tracemalloc.take_snapshot
+            ) as take_snapshot:
+                # kept allocated, the next spans do not allocate much more
+                data = bytearray(1024 * 1024)
+                for _ in range(100):
+                    profiler.exit(profiler.enter())
+                self.assertEqual(1, take_snapshot.call_count)
+                del data
+        finally:
+            profiler.stop()
+        self.assertIsNotNone(profiler.snapshot)
+        self.assertEqual({}, profiler._peak_rss)
+
+
+if __name__ == "__main__":
+    unittest.main()
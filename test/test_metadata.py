@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+
+# standard
+import unittest
+
+# Project
+from qgispluginci.metadata import MetadataFile
+
+
+METADATA = """[general]
+name=My plugin
+version=dev
+changelog=
+ Version 0.1.0:
+ * first item
+
+# experimental flag
+experimental=False
+
+[tool:qgis-plugin-ci]
+commitNumber=
+"""
+
+
+class TestMetadata(unittest.TestCase):
+    def test_values(self):
+        metadata = MetadataFile(METADATA)
+        self.assertEqual("My plugin", metadata.values()["name"])
+        self.assertEqual("", metadata.values()["commitNumber"])
+
+    def test_set(self):
+        metadata = MetadataFile(METADATA)
+        self.assertTrue(metadata.set("version", "1.0.0"))
+        self.assertTrue(metadata.set("commitNumber", "42"))
+        self.assertFalse(metadata.set("commitSha1", "abcdef"))
+        self.assertTrue(metadata.set("changelog", "\n Version 1.0.0:\n * new\n"))
+
+        content = str(metadata)
+        self.assertIn("version=1.0.0\n", content)
+        self.assertIn("commitNumber=42\n", content)
+        self.assertNotIn("commitSha1", content)
+        # the previous multi-line value is replaced
+        self.assertNotIn("0.1.0", content)
+        self.assertIn(
+            "changelog=\n Version 1.0.0:\n * new\n\n\n# experimental", content
+        )
+
+        # the original is not modified by a copy
+        copy = metadata.copy()
+        copy.set("version", "2.0.0")
+        self.assertEqual("1.0.0", metadata.values()["version"])
+
+    def test_remove(self):
+        metadata = MetadataFile(METADATA)
+        self.assertTrue(metadata.remove("changelog"))
+        self.assertFalse(metadata.remove("changelog"))
+        self.assertTrue(
+            str(metadata).startswith(
+                "[general]\nname=My plugin\nversion=dev\n\n# experimental flag\n"
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
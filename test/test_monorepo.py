@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+
+# standard
+import json
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from zipfile import ZipFile
+
+# Project
+from qgispluginci.monorepo import package_plugins
+from qgispluginci.parameters import Parameters
+from qgispluginci.tracing import tracing
+
+# Tests
+from test.test_git_tree import init_repo
+
+
+PLUGIN_PATH = "qgis_plugin_CI_testing"
+
+
+class TestMonorepo(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = TemporaryDirectory()
+        repo = init_repo(Path(self.tmp_dir.name))
+        for plugin_path in ("plugin_a", "plugin_b"):
+            shutil.copytree(PLUGIN_PATH, Path(self.tmp_dir.name) / plugin_path)
+        repo.git.add(".")
+        repo.git.commit("-m", "init")
+        repo.close()
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_parameters(self):
+        parameters = Parameters(
+            {
+                "github_organization_slug": "opengisch",
+                "plugins": ["plugin_a", {"plugin_path": "plugin_b", "timezone": "CET"}],
+            }
+        )
+        self.assertIsNone(parameters.plugin_path)
+        self.assertEqual(
+            ["plugin_a", "plugin_b"], [p.plugin_path for p in parameters.plugins]
+        )
+        self.assertEqual(
+            ["opengisch", "opengisch"],
+            [p.github_organization_slug for p in parameters.plugins],
+        )
+        self.assertEqual(["UTC", "CET"], [p.timezone for p in parameters.plugins])
+
+    def test_invalid_plugins(self):
+        for plugins in (
+            [],
+            ["plugin_a", {"timezone": "CET"}],
+            ["plugin_a", "plugin_b", "plugin_a/"],
+        ):
+            with (
+                self.subTest(plugins=plugins),
+                self.assertLogs("qgispluginci.monorepo", level="ERROR"),
+                self.assertRaises(SystemExit),
+            ):
+                package_plugins(Parameters({"plugins": plugins}).plugins, "1.0.0")
+
+    def test_package_plugins(self):
+        parameters = Parameters({"plugins": ["plugin_a", "plugin_b"]})
+        with tracing("trace.json"):
+            results = package_plugins(parameters.plugins, "1.0.0", workers=2)
+        self.assertEqual(
+            ["plugin_a.1.0.0.zip", "plugin_b.1.0.0.zip"],
+            [result.archive_name for result in results],
+        )
+        for result in results:
+            with ZipFile(result.archive_name) as zf:
+                metadata = zf.read(f"{result.plugin_path}/metadata.txt").decode()
+            self.assertIn("version=1.0.0", metadata)
+            self.assertIn("commitNumber=1", metadata)
+            self.assertEqual(os.path.getsize(result.archive_name), result.size)
+
+        # spans of the worker processes are gathered in the trace
+        with open("trace.json") as f:
+            trace = json.load(f)["traceEvents"]
+        self.assertEqual(
+            ["plugin_a", "plugin_b"],
+            sorted(e["args"]["plugin"] for e in trace if e["name"] == "package"),
+        )
+        self.assertNotIn(
+            os.getpid(), [e["pid"] for e in trace if e["name"] == "package"]
+        )
+        self.assertIn(
+            os.getpid(), [e["pid"] for e in trace if e["name"] == "git snapshot"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
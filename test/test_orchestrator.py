@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+
+# standard
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Project
+from qgispluginci.orchestrator import Orchestrator
+from qgispluginci.parameters import Parameters
+from qgispluginci.release import release
+
+
+class TestOrchestrator(unittest.TestCase):
+    def test_dependencies(self):
+        # both stages only return if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        finished = []
+
+        def stage(value: int) -> int:
+            barrier.wait()
+            finished.append(value)
+            return value
+
+        orchestrator = Orchestrator()
+        orchestrator.add("a", lambda: stage(1))
+        orchestrator.add("b", lambda: stage(2))
+        orchestrator.add("c", lambda a, b: a + b, requires=["a", "b"])
+        orchestrator.add("d", lambda: len(finished), after=["a", "b"])
+        results = orchestrator.run()
+        self.assertEqual({"a": 1, "b": 2, "c": 3, "d": 2}, results)
+
+    def test_failure(self):
+        called = []
+
+        def fail() -> None:
+            raise SystemExit(1)
+
+        orchestrator = Orchestrator()
+        orchestrator.add("slow", lambda: time.sleep(0.1) or called.append("slow"))
+        orchestrator.add("fail", fail)
+        orchestrator.add("next", lambda: called.append("next"), after=["fail"])
+        with self.assertRaises(SystemExit):
+            orchestrator.run()
+        # the running stage is waited for, the next one never starts
+        self.assertEqual(["slow"], called)
+
+    def test_unknown_stage(self):
+        orchestrator = Orchestrator()
+        with self.assertRaises(ValueError):
+            orchestrator.add("a", lambda b: b, requires=["b"])
+        orchestrator.add("a", lambda: None)
+        with self.assertRaises(ValueError):
+            orchestrator.add("a", lambda: None)
+
+    def test_release(self):
+        parameters = Parameters.make_from(
+            path_to_config_file=Path("test/fixtures/.qgis-plugin-ci")
+        )
+        # the Transifex download and the GitHub lookup wait for each other
+        barrier = threading.Barrier(2, timeout=5)
+
+        def is_prerelease() -> bool:
+            barrier.wait()
+            return False
+
+        with (
+            mock.patch("qgispluginci.release.Translation") as translation,
+            mock.patch("qgispluginci.release.GithubPublisher") as publisher,
+        ):
+            translation.return_value.pull.side_effect = barrier.wait
+            type(publisher.return_value).is_prerelease = mock.PropertyMock(
+                side_effect=is_prerelease
+            )
+            archive = release(
+                parameters, "0.1.2", github_token="token", tx_api_token="token"
+            )
+
+        translation.return_value.compile_strings.assert_called_once()
+        publisher.return_value.upload_assets.assert_called_once_with([(archive, None)])
+        self.assertTrue(Path(archive).is_file())
+
+
+if __name__ == "__main__":
+    unittest.main()
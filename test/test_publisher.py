@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+
+# standard
+import hashlib
+import threading
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+# 3rd party
+from github import GithubException
+
+# Project
+from qgispluginci.parameters import Parameters
+from qgispluginci.publisher import GithubPublisher
+from qgispluginci.release import release_is_prerelease
+
+
+class TestPublisher(unittest.TestCase):
+    def setUp(self):
+        self.parameters = Parameters(
+            {
+                "plugin_path": "qgis_plugin_CI_testing",
+                "github_organization_slug": "opengisch",
+                "project_slug": "qgis-plugin-ci",
+            }
+        )
+        patcher = mock.patch("qgispluginci.publisher.Github")
+        self.github = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gh_release = self.github.return_value.get_repo.return_value.get_release
+        self.gh_release.return_value.prerelease = False
+        self.gh_release.return_value.get_assets.return_value = []
+
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.assets = []
+        for name in ("plugin.zip", "plugin-experimental.zip", "plugins.xml"):
+            path = Path(self.tmp_dir.name) / name
+            path.write_bytes(b"content")
+            self.assets.append(str(path))
+
+    def test_single_lookup(self):
+        publisher = GithubPublisher(self.parameters, "v1.0.0", "token")
+        self.assertFalse(
+            release_is_prerelease(
+                self.parameters, "v1.0.0", "token", publisher=publisher
+            )
+        )
+        publisher.upload_assets(
+            [(self.assets[0], None), (self.assets[1], None), (self.assets[2], "xml")]
+        )
+
+        self.github.assert_called_once()
+        self.github.return_value.get_repo.assert_called_once_with(
+            "opengisch/qgis-plugin-ci"
+        )
+        self.gh_release.assert_called_once_with(id="v1.0.0")
+        upload = self.gh_release.return_value.upload_asset
+        self.assertEqual(3, upload.call_count)
+        upload.assert_any_call(path=self.assets[2], label="xml", name="xml")
+
+    def test_concurrent_uploads(self):
+        running = 0
+        max_running = 0
+        lock = threading.Lock()
+
+        def upload(*args: object, **kwargs: object) -> mock.Mock:
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.1)
+            with lock:
+                running -= 1
+            return mock.Mock()
+
+        self.gh_release.return_value.upload_asset.side_effect = upload
+        publisher = GithubPublisher(self.parameters, "v1.0.0", "token", workers=3)
+        publisher.upload_assets((asset, None) for asset in self.assets)
+        self.assertEqual(3, max_running)
+
+    def test_upload_failure(self):
+        def upload(path: str, **kwargs: object) -> mock.Mock:
+            if path.endswith("plugins.xml"):
+                raise GithubException(403, "Forbidden")
+            return mock.Mock()
+
+        self.gh_release.return_value.upload_asset.side_effect = upload
+        publisher = GithubPublisher(self.parameters, "v1.0.0", "token")
+        with self.assertRaises(SystemExit):
+            publisher.upload_assets((asset, None) for asset in self.assets)
+        # the other assets are uploaded anyway
+        self.assertEqual(3, self.gh_release.return_value.upload_asset.call_count)
+
+    def test_existing_assets(self):
+        digest = f"sha256:{hashlib.sha256(b'content').hexdigest()}"
+        identical = mock.Mock(size=7, digest=digest)
+        identical.name = "plugin.zip"
+        changed = mock.Mock(size=7, digest=f"sha256:{'0' * 64}")
+        changed.name = "plugin-experimental.zip"
+        # uploaded before GitHub computed digests
+        no_digest = mock.Mock(size=7, digest=None)
+        no_digest.name = "xml"
+        self.gh_release.return_value.get_assets.return_value = [
+            identical,
+            changed,
+            no_digest,
+        ]
+
+        publisher = GithubPublisher(self.parameters, "v1.0.0", "token")
+        publisher.upload_assets(
+            [(self.assets[0], None), (self.assets[1], None), (self.assets[2], "xml")]
+        )
+
+        self.gh_release.return_value.get_assets.assert_called_once()
+        identical.delete_asset.assert_not_called()
+        changed.delete_asset.assert_called_once()
+        no_digest.delete_asset.assert_called_once()
+        upload = self.gh_release.return_value.upload_asset
+        self.assertEqual(2, upload.call_count)
+        upload.assert_any_call(self.assets[1])
+        upload.assert_any_call(path=self.assets[2], label="xml", name="xml")
+
+    def test_release_not_found(self):
+        self.gh_release.side_effect = GithubException(404, "Not Found")
+        publisher = GithubPublisher(self.parameters, "v1.0.0", "token")
+        with self.assertRaises(SystemExit):
+            publisher.is_prerelease  # noqa: B018
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,12 +7,15 @@ import os
 import re
 import unittest
 import urllib.request
+from datetime import timezone
 from itertools import product
 from pathlib import Path
 from tempfile import mkstemp
+from unittest import mock
 from zipfile import ZipFile
 
 # 3rd party
+import git
 import yaml
 from github import Github, GithubException
 
@@ -20,7 +23,14 @@ from github import Github, GithubException
 from qgispluginci.changelog import ChangelogParser
 from qgispluginci.exceptions import GithubReleaseNotFound
 from qgispluginci.parameters import DASH_WARNING, Parameters
-from qgispluginci.release import release
+from qgispluginci.release import (
+    DISABLE_DEBUG_TRANSFORM,
+    ArchiveVariant,
+    LineFilterTransform,
+    RegexTransform,
+    TransformPipeline,
+    release,
+)
 from qgispluginci.translation import Translation
 from qgispluginci.utils import replace_in_file
 
@@ -102,6 +112,99 @@ class TestRelease(unittest.TestCase):
             tx_api_token=self.tx_api_token,
         )
 
+    def test_reproducible_archive(self):
+        params = self.qgis_plugin_config_params
+        archive_name = params.archive_name(params.plugin_path, RELEASE_VERSION_TEST)
+        archives = []
+        for _ in range(2):
+            release(params, RELEASE_VERSION_TEST, reproducible=True)
+            archives.append(Path(archive_name).read_bytes())
+        self.assertEqual(archives[0], archives[1])
+
+        commit_date = git.Repo().head.object.committed_datetime
+        # ZIP dates have a 2 seconds resolution
+        *zip_date, seconds = commit_date.astimezone(timezone.utc).timetuple()[:6]
+        zip_date.append(seconds - seconds % 2)
+        with ZipFile(archive_name) as zf:
+            for info in zf.infolist():
+                self.assertEqual(tuple(zip_date), info.date_time)
+                self.assertIn(info.external_attr >> 16, (0o100644, 0o100755))
+
+        with mock.patch.dict(os.environ, {"SOURCE_DATE_EPOCH": "1700000000"}):
+            release(params, RELEASE_VERSION_TEST, reproducible=True)
+        with ZipFile(archive_name) as zf:
+            self.assertEqual((2023, 11, 14, 22, 13, 20), zf.infolist()[0].date_time)
+
+    def test_archive_variants(self):
+        params = self.qgis_plugin_config_params
+        # a debug flag to disable, and a stable plugin for the experimental variant to flag
+        sources = {}
+        for file_name, old, new in (
+            ("qgis_plugin_ci_testing_plugin.py", b"DEBUG = False", b"DEBUG = True"),
+            ("metadata.txt", b"experimental=True", b"experimental=False"),
+        ):
+            path = Path(params.plugin_path) / file_name
+            sources[path] = path.read_bytes()
+            self.addCleanup(path.write_bytes, sources[path])
+            self.assertIn(old, sources[path])
+            path.write_bytes(sources[path].replace(old, new))
+        # the metadata is read with the parameters
+        params = Parameters.make_from(
+            path_to_config_file=Path("test/fixtures/.qgis-plugin-ci")
+        )
+        release(
+            params,
+            RELEASE_VERSION_TEST,
+            allow_uncommitted_changes=True,
+            variants=["experimental", "qgis-min=3.34"],
+        )
+        archives = {}
+        for version in ("", "-experimental", "-qgis3.34"):
+            archive_name = params.archive_name(
+                params.plugin_path, f"{RELEASE_VERSION_TEST}{version}"
+            )
+            with ZipFile(archive_name) as zf:
+                archives[version] = {i.filename: i for i in zf.infolist()}
+                metadata = zf.read(f"{params.plugin_zip_directory}/metadata.txt")
+                plugin = zf.read(
+                    f"{params.plugin_zip_directory}/qgis_plugin_ci_testing_plugin.py"
+                )
+            # only the experimental variant is flagged, and keeps its debug flag
+            if version == "-experimental":
+                self.assertIn(b"experimental=True\n", metadata)
+                self.assertIn(b"\nDEBUG = True\n", plugin)
+            else:
+                self.assertIn(b"experimental=False\n", metadata)
+                self.assertIn(b"\nDEBUG = False\n", plugin)
+            if version == "-qgis3.34":
+                self.assertIn(b"qgisMinimumVersion=3.34\n", metadata)
+            else:
+                self.assertIn(b"qgisMinimumVersion=3.2\n", metadata)
+            if version:
+                os.remove(archive_name)
+
+        # members other than the metadata and the debug flag are the same in all variants
+        self.assertEqual(archives[""].keys(), archives["-experimental"].keys())
+        for name, info in archives[""].items():
+            if name.endswith("metadata.txt"):
+                continue
+            for version in ("-experimental", "-qgis3.34"):
+                if version == "-experimental" and name.endswith("_plugin.py"):
+                    continue
+                other = archives[version][name]
+                self.assertEqual(
+                    (info.CRC, info.compress_size), (other.CRC, other.compress_size)
+                )
+
+        self.assertEqual(
+            ArchiveVariant(
+                f"{params.plugin_path}.1.0.0-experimental-qgis3.34.zip", True, "3.34"
+            ),
+            ArchiveVariant.from_spec("experimental,qgis-min=3.34", params, "1.0.0"),
+        )
+        with self.assertRaises(ValueError):
+            ArchiveVariant.from_spec("qgis-max=4.0", params, "1.0.0")
+
     def test_zipname(self):
         """Tests about the zipname for the QGIS plugin manager.
 
@@ -222,6 +325,30 @@ class TestRelease(unittest.TestCase):
         # Commit sha1 not in the metadata.txt
         self.assertEqual(0, len(re.findall(r"commitSha1=\d+", str(data))))
 
+    def test_transform_pipeline(self):
+        pipeline = TransformPipeline([DISABLE_DEBUG_TRANSFORM])
+        pipeline.register(
+            LineFilterTransform(
+                lambda line: b"# dev-only" not in line, prefilter=b"# dev-only"
+            )
+        )
+        pipeline.register(RegexTransform(rb"^VERSION = .*$", b"VERSION = 2", "*.py"))
+
+        source = b"DEBUG = True\nimport pdb  # dev-only\nVERSION = 1\n"
+        self.assertEqual(
+            b"DEBUG = False\nVERSION = 2\n", pipeline.apply("plugin/a.py", source)
+        )
+        self.assertEqual(
+            b"DEBUG = True\n", pipeline.apply("plugin/a.txt", b"DEBUG = True\n")
+        )
+
+        # untouched content is passed through as is
+        untouched = b"nothing to transform\n"
+        self.assertIs(
+            untouched,
+            TransformPipeline([DISABLE_DEBUG_TRANSFORM]).apply("a.py", untouched),
+        )
+
     def test_release_version_valid_invalid(self):
         valid_tags = [
             "v1.1.1",
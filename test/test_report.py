@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+
+# standard
+import json
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# Project
+from qgispluginci.archive import ArchiveWriter
+from qgispluginci.report import ArchiveReport
+
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.archive = Path(self.tmp_dir.name) / "plugin.zip"
+        members = [
+            ("plugin/metadata.txt", b"[general]\nname=Plugin\n", "git tree"),
+            ("plugin/vendor/lib/big.py", b"x = 1\n" * 10_000, "submodule"),
+            ("plugin/vendor/lib/copy.py", b"x = 1\n" * 10_000, "submodule"),
+            ("plugin/resources_rc.py", b"qt_resource_data = b''\n", "resource"),
+            ("plugin/empty.py", b"", "git tree"),
+        ]
+        with ArchiveWriter(str(self.archive), jobs=2) as writer:
+            for name, data, origin in members:
+                writer.add(zipfile.ZipInfo(name), data, origin)
+        self.report = ArchiveReport(str(self.archive), writer.members, top=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_report(self):
+        report = self.report.to_dict()
+        self.assertEqual(self.archive.stat().st_size, report["size"])
+        self.assertEqual(5, len(report["members"]))
+        self.assertEqual(
+            {"git tree": 2, "submodule": 2, "resource": 1},
+            {origin: value["count"] for origin, value in report["origins"].items()},
+        )
+        self.assertEqual(
+            ["plugin/vendor/lib/big.py", "plugin/vendor/lib/copy.py"],
+            report["largest_members"],
+        )
+        self.assertEqual("plugin/vendor", report["largest_directories"][0]["name"])
+        self.assertEqual(
+            [["plugin/vendor/lib/big.py", "plugin/vendor/lib/copy.py"]],
+            report["duplicates"],
+        )
+        big = report["members"][1]
+        self.assertEqual(60_000, big["file_size"])
+        self.assertLess(big["ratio"], 0.1)
+        self.assertEqual("deflated", big["compression"])
+
+        report_path = Path(self.tmp_dir.name) / "report.json"
+        self.report.write_json(str(report_path))
+        self.assertEqual(report, json.loads(report_path.read_text()))
+
+    def test_table(self):
+        table = self.report.table()
+        self.assertIn("plugin/vendor/lib/big.py", table)
+        self.assertIn("Duplicated content:", table)
+        self.assertNotIn("plugin/empty.py", table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+#! /usr/bin/env python
+
+# standard
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# Project
+from qgispluginci.cache import FileCache
+from qgispluginci.resources import compile_resources, resource_key
+
+
+PLUGIN_PATH = "qgis_plugin_CI_testing"
+
+
+class TestResources(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.plugin_path = Path(self.tmp_dir.name) / PLUGIN_PATH
+        shutil.copytree(PLUGIN_PATH, self.plugin_path)
+        self.qrc_file = self.plugin_path / "resources.qrc"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_compile_resources(self):
+        shutil.copy(self.qrc_file, self.plugin_path / "other.qrc")
+        resources = compile_resources(str(self.plugin_path), workers=2)
+        self.assertEqual(
+            [f"{self.plugin_path}/other_rc.py", f"{self.plugin_path}/resources_rc.py"],
+            [name for name, _ in resources],
+        )
+        self.assertIn(b"qt_resource_data", resources[0][1])
+        self.assertEqual([], list(self.plugin_path.glob("*_rc.py")))
+
+    def test_resource_key(self):
+        key = resource_key(self.qrc_file)
+        self.assertEqual(key, resource_key(self.qrc_file))
+        with (self.plugin_path / "icons" / "opengisch.png").open("ab") as icon:
+            icon.write(b"\0")
+        self.assertNotEqual(key, resource_key(self.qrc_file))
+
+    def test_cache(self):
+        with TemporaryDirectory() as cache_dir:
+            cache = FileCache(cache_dir)
+            expected = compile_resources(str(self.plugin_path), cache=cache)
+            self.assertEqual(expected, compile_resources(str(self.plugin_path), cache))
+            self.assertEqual(1, cache.hits)
+            self.assertEqual(1, cache.misses)
+
+
+if __name__ == "__main__":
+    unittest.main()
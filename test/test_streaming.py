@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+
+# standard
+import threading
+import unittest
+import xmlrpc.client
+from email.parser import BytesParser
+from email.policy import HTTP
+from functools import partial
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+# Project
+from qgispluginci import release
+from qgispluginci.streaming import (
+    MultipartEncoder,
+    MultipartFile,
+    UploadProgress,
+    XmlRpcUploadBody,
+)
+from test.utils import LocalServer
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict[str, tuple[str, bytes]]:
+    """The filename and content of each field of a multipart body."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): (
+            part.get_filename(),
+            part.get_payload(decode=True),
+        )
+        for part in message.iter_parts()
+    }
+
+
+class TestMultipartEncoder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.archive = Path(self.tmp_dir.name) / "plugin.0.1.0.zip"
+        self.content = bytes(range(256)) * 5000
+        self.archive.write_bytes(self.content)
+
+    def test_body(self):
+        encoder = MultipartEncoder(
+            {"package": MultipartFile(str(self.archive)), "comment": "first"}
+        )
+        body = encoder.read()
+        self.assertEqual(len(encoder), len(body))
+        self.assertEqual(b"", encoder.read())
+        fields = parse_multipart(encoder.content_type, body)
+        self.assertEqual(("plugin.0.1.0.zip", self.content), fields["package"])
+        self.assertEqual((None, b"first"), fields["comment"])
+
+    def test_chunks(self):
+        encoder = MultipartEncoder({"package": MultipartFile(str(self.archive))})
+        body = encoder.read()
+        for size in (1, 1000, 16384):
+            with self.subTest(size=size):
+                encoder.rewind()
+                chunks = iter(partial(encoder.read, size), b"")
+                self.assertEqual(body, b"".join(chunks))
+        # the file is closed once read
+        self.assertIsNone(encoder._file)
+
+    def test_progress(self):
+        progress = UploadProgress("Upload", len(self.content), interval=3600)
+        encoder = MultipartEncoder(
+            {"package": MultipartFile(str(self.archive))}, progress=progress
+        )
+        progress.total = len(encoder)
+        with self.assertLogs("qgispluginci.streaming", level="INFO") as logs:
+            for _ in encoder:
+                pass
+        # only the end is logged with a long interval
+        self.assertEqual(1, len(logs.output))
+        self.assertIn("(100%)", logs.output[0])
+        self.assertIn("/s", logs.output[0])
+
+    def test_upload_with_token(self):
+        server = LocalServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        server.responses = [(503, b"Service Unavailable", 0)]
+
+        with (
+            mock.patch.object(release, "QGIS_PLUGINS_REPO_URL", server.url),
+            mock.patch("qgispluginci.http.BACKOFF_FACTOR", 0.01),
+        ):
+            release.upload_plugin_to_osgeo_with_token(
+                str(self.archive), "plugin", "token"
+            )
+        self.assertEqual(2, len(server.requests))
+        # the body is sent again in full on the retry
+        for _, headers, body in server.requests:
+            self.assertEqual("Bearer token", headers["Authorization"])
+            self.assertEqual(str(len(body)), headers["Content-Length"])
+            fields = parse_multipart(headers["Content-Type"], body)
+            self.assertEqual(("plugin.0.1.0.zip", self.content), fields["package"])
+
+    def test_upload_not_retried(self):
+        server = LocalServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        # the version may have been published
+        server.responses = [(502, b"Bad Gateway", 0)]
+
+        with (
+            mock.patch.object(release, "QGIS_PLUGINS_REPO_URL", server.url),
+            self.assertRaises(SystemExit) as context,
+        ):
+            release.upload_plugin_to_osgeo_with_token(
+                str(self.archive), "plugin", "token"
+            )
+        self.assertEqual(2, context.exception.code)
+        self.assertEqual(1, len(server.requests))
+
+
+class TestXmlRpcUploadBody(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.archive = Path(self.tmp_dir.name) / "plugin.0.1.0.zip"
+
+    def test_same_as_marshalled(self):
+        # small chunks, to encode several of them and a partial last line
+        with mock.patch("qgispluginci.streaming.CHUNK_SIZE", 200):
+            for size in (0, 1, 56, 57, 58, 171, 399, 1000):
+                with self.subTest(size=size):
+                    content = bytes(range(256)) * 4
+                    self.archive.write_bytes(content[:size])
+                    body = XmlRpcUploadBody("plugin.upload", str(self.archive))
+                    expected = xmlrpc.client.dumps(
+                        (xmlrpc.client.Binary(content[:size]),), "plugin.upload"
+                    ).encode()
+                    self.assertEqual(len(expected), len(body))
+                    self.assertEqual(
+                        expected, b"".join(iter(partial(body.read, 7), b""))
+                    )
+
+    def test_upload_xml_rpc(self):
+        content = bytes(range(256)) * 5000
+        self.archive.write_bytes(content)
+        server = LocalServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        server.responses = [
+            (503, b"", 0),
+            (200, xmlrpc.client.dumps(((12, 34),), methodresponse=True).encode(), 0),
+        ]
+
+        with mock.patch("qgispluginci.http.BACKOFF_FACTOR", 0.01):
+            release.upload_plugin_to_osgeo_xml_rpc(
+                "user",
+                "password",
+                str(self.archive),
+                server_url=f"{server.url}/plugins/RPC2/",
+            )
+        self.assertEqual(2, len(server.requests))
+        # the body is sent again in full on the retry
+        for _, headers, body in server.requests:
+            self.assertEqual("Basic dXNlcjpwYXNzd29yZA==", headers["Authorization"])
+            params, method = xmlrpc.client.loads(body)
+            self.assertEqual("plugin.upload", method)
+            self.assertEqual(content, params[0].data)
+
+    def test_fault(self):
+        self.archive.write_bytes(b"zip")
+        server = LocalServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        fault = xmlrpc.client.Fault(1, "Version already exists")
+        server.responses = [
+            (200, xmlrpc.client.dumps(fault, methodresponse=True).encode(), 0)
+        ]
+        with self.assertRaises(SystemExit) as context:
+            release.upload_plugin_to_osgeo_xml_rpc(
+                "user", "password", str(self.archive), server_url=server.url
+            )
+        self.assertEqual(2, context.exception.code)
+
+
+if __name__ == "__main__":
+    unittest.main()
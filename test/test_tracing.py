@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+
+# standard
+import json
+import threading
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+# Project
+from qgispluginci.parameters import Parameters
+from qgispluginci.release import release
+from qgispluginci.tracing import Tracer, active_tracer, span, traced, tracing
+
+
+class TestTracing(unittest.TestCase):
+    def test_tracer(self):
+        # not tracing: spans are no-op
+        with span("nothing") as stage:
+            stage.add("bytes", 10)
+        self.assertIsNone(active_tracer())
+
+        tracer = Tracer()
+        with traced(tracer):
+            with span("outer", "test", plugin="a") as stage:
+                stage.add("files")
+                stage.add("files")
+                thread = threading.Thread(target=self._inner, name="worker")
+                thread.start()
+                thread.join()
+        self.assertIsNone(active_tracer())
+
+        trace = tracer.to_dict()["traceEvents"]
+        spans = {e["name"]: e for e in trace if e["ph"] == "X"}
+        self.assertEqual({"outer", "inner"}, set(spans))
+        self.assertEqual({"plugin": "a", "files": 2}, spans["outer"]["args"])
+        self.assertEqual({"bytes": 1024}, spans["inner"]["args"])
+        self.assertNotEqual(spans["outer"]["tid"], spans["inner"]["tid"])
+        self.assertLessEqual(spans["outer"]["ts"], spans["inner"]["ts"])
+        self.assertGreaterEqual(spans["outer"]["dur"], spans["inner"]["dur"])
+        self.assertIn(
+            "worker",
+            [e["args"]["name"] for e in trace if e["name"] == "thread_name"],
+        )
+
+    @staticmethod
+    def _inner():
+        with span("inner", "test", bytes=1024):
+            pass
+
+    def test_release_trace(self):
+        parameters = Parameters.make_from(
+            path_to_config_file=Path("test/fixtures/.qgis-plugin-ci")
+        )
+        with TemporaryDirectory() as tmp_dir:
+            trace_path = Path(tmp_dir) / "trace.json"
+            with tracing(str(trace_path)):
+                release(parameters, "0.1.2")
+            trace = json.loads(trace_path.read_text())["traceEvents"]
+
+        spans = {e["name"]: e for e in trace if e["ph"] == "X"}
+        for name in (
+            "create archive",
+            "git tree",
+            "close archive",
+            "resources",
+            "pyqt5ac resources.qrc",
+        ):
+            self.assertIn(name, spans)
+        self.assertGreater(spans["git tree"]["args"]["files"], 0)
+        self.assertGreater(spans["close archive"]["args"]["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
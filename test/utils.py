@@ -1,4 +1,6 @@
 import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 def can_skip_test_github():
@@ -30,3 +32,41 @@ def can_skip_test_transifex():
         return True
 
     return False
+
+
+class LocalServer(ThreadingHTTPServer):
+    """Answers the requests with the queued (status, body, delay), then 200."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.responses: list[tuple[int, bytes, float]] = []
+        self.requests: list[tuple[str, dict[str, str], bytes]] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self._answer()
+
+    def do_POST(self) -> None:
+        self._answer()
+
+    def _answer(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        self.server.requests.append(
+            (self.command, dict(self.headers), self.rfile.read(length))
+        )
+        status, body, delay = (
+            self.server.responses.pop(0) if self.server.responses else (200, b"", 0)
+        )
+        time.sleep(delay)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass